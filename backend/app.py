@@ -52,8 +52,8 @@ def create_app():
         museum_set_api_key, config_set_vector_db
     )
     
-    # Skip heavy models in production to save memory
-    if config.FLASK_ENV == 'production':
+    # Skip heavy models in production to save memory (unless VECTOR_DB_ENABLED)
+    if not config.VECTOR_DB_ENABLED:
         print("   Mode: Production (lightweight)")
         print("   AI Models: Using Gemini API only")
         print("   Vector DB: Disabled (uses Wikipedia API)")
@@ -61,7 +61,7 @@ def create_app():
         config_set_vector_db(None, None)
     else:
         # Only load heavy modules in development
-        from utils.vector_utils import load_vector_db
+        from utils.vector_utils import load_vector_db, load_lexical_index
         from utils.ai_utils import get_embeddings_model
         
         embeddings_model = get_embeddings_model(config.EMBEDDING_MODEL)
@@ -70,24 +70,43 @@ def create_app():
         
         vector_index, text_map = load_vector_db(
             config.FAISS_INDEX_FILE,
-            config.TEXT_MAP_FILE
+            config.TEXT_MAP_FILE,
+            mmap=config.VECTOR_DB_MMAP
         )
         
         if vector_index and text_map:
-            vector_status = f"Loaded ({vector_index.ntotal} vectors)"
+            vector_status = f"Loaded ({vector_index.ntotal} vectors{', memory-mapped' if config.VECTOR_DB_MMAP else ''})"
         else:
             vector_status = "Empty (will use online sources)"
         print(f"   Vector Database: {vector_status}")
         
-        qa_set_vector_db(vector_index, text_map)
+        lexical_index = None
+        if vector_index and text_map and 'lexical' in config.SEARCH_RETRIEVERS:
+            lexical_index = load_lexical_index(config.FAISS_INDEX_FILE, text_map)
+            print(f"   Lexical Index: {'Loaded (' + str(len(lexical_index)) + ' documents)' if lexical_index else 'Unavailable'}")
+        
+        if vector_index and text_map and config.RERANK_ENABLED:
+            # Passages keep their index order until the cross-encoder is ready
+            from utils.reranker import start_reranker_load
+            
+            start_reranker_load(config.RERANK_MODEL, config.RERANK_MAX_LENGTH)
+            print(f"   Re-ranker: Loading in background ({config.RERANK_MODEL})")
+        
+        qa_set_vector_db(vector_index, text_map, lexical_index)
         config_set_vector_db(vector_index, text_map)
     
     # Configure AI if API key is available
-    from utils.ai_utils import setup_gemini
-    gemini_key = config.GEMINI_API_KEY
-    if gemini_key:
-        ai_configured = setup_gemini(gemini_key)
-        ai_status = "Configured" if ai_configured else "Configuration failed"
+    from utils.ai_utils import setup_gemini, add_api_keys, start_gemini_setup
+    gemini_keys = ([config.GEMINI_API_KEY] if config.GEMINI_API_KEY else []) + config.GEMINI_API_KEYS
+    if gemini_keys and config.GEMINI_SETUP_BACKGROUND:
+        # Model discovery runs while the app starts serving; see /api/status
+        start_gemini_setup(gemini_keys[0].partition(':')[0], gemini_keys[1:])
+        ai_status = f"Setting up in background ({len(gemini_keys)} key(s))"
+    elif gemini_keys:
+        ai_configured = setup_gemini(gemini_keys[0].partition(':')[0])
+        if ai_configured and len(gemini_keys) > 1:
+            add_api_keys(gemini_keys[1:])
+        ai_status = f"Configured ({len(gemini_keys)} key(s))" if ai_configured else "Configuration failed"
     else:
         ai_status = "Not configured (use /configure endpoint)"
     print(f"   Gemini AI: {ai_status}")
@@ -122,6 +141,8 @@ def create_app():
                 'health': '/api/health',
                 'configure': '/api/configure',
                 'ask': '/api/ask',
+                'ask_stream': '/api/ask/stream',
+                'quick_facts': '/api/quick-facts',
                 'translate': '/api/translate',
                 'summarize': '/api/summarize',
                 'museum_search': '/api/museum/search',
@@ -150,6 +171,19 @@ def create_app():
             'message': 'An unexpected error occurred. Please try again.'
         }), 500
     
+    from utils.gemini_dispatcher import GeminiBusyError
+    
+    @app.errorhandler(GeminiBusyError)
+    def gemini_busy(error):
+        response = jsonify({
+            'error': 'AI service busy',
+            'message': str(error),
+            'retry_after': error.retry_after
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+    
     @app.errorhandler(400)
     def bad_request(error):
         return jsonify({
@@ -165,6 +199,27 @@ def create_app():
     
     return app
 
+def init_worker():
+    """
+    Reset process-local state in a freshly forked worker
+    
+    Called from the gunicorn post_fork hook when the app is preloaded in the
+    master. The memory-mapped index is shared safely, but thread pools,
+    pooled HTTP connections and gRPC channels created before the fork are
+    not usable in the child.
+    """
+    from routes.qa_routes import reset_retrieval_executor
+    from utils.ai_utils import reset_after_fork
+    from utils.http_client import reset_sessions
+    from utils.gemini_dispatcher import reset_dispatcher
+    from utils.reranker import reset_after_fork as reset_reranker_after_fork
+    
+    reset_retrieval_executor()
+    reset_sessions()
+    reset_dispatcher()
+    reset_after_fork()
+    reset_reranker_after_fork()
+
 # Create app instance for gunicorn
 app = create_app()
 
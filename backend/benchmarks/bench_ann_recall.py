@@ -0,0 +1,121 @@
+"""
+Benchmark: recall@k vs query latency for flat, HNSW and IVF indexes
+
+Uses the vectors of the existing index (./data/faiss_index.bin) or a
+synthetic clustered corpus, holds out perturbed copies as queries, computes
+exact ground truth with a flat index, then sweeps efSearch / nprobe.
+
+Usage:
+    python benchmarks/bench_ann_recall.py
+    python benchmarks/bench_ann_recall.py --synthetic 100000 --k 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from config import get_config
+from utils.vector_utils import build_index, make_search_params, read_index, train_and_add
+
+def load_vectors(index_path):
+    """Reconstruct all vectors stored in an existing index"""
+    index = read_index(index_path)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def synthetic_vectors(count, dimension, clusters=200):
+    """Clustered unit vectors, closer to real topic embeddings than uniform noise"""
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def make_queries(vectors, count):
+    """Perturbed corpus vectors, so each query has a real neighbourhood"""
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.integers(0, len(vectors), count)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+def time_queries(index, queries, k, params):
+    """Search one query at a time (like /api/ask) and return ids and latencies"""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, ids[i:i + 1] = index.search(queries[i:i + 1], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return ids, np.array(latencies)
+
+def recall_at_k(ids, truth):
+    """Fraction of true top-k neighbours that were retrieved"""
+    k = truth.shape[1]
+    return np.mean([len(set(ids[i]) & set(truth[i])) / k for i in range(len(truth))])
+
+def report(name, setting, build_s, ids, latencies, truth):
+    print(f"{name:<6}{setting:<16}{build_s:>9.1f}{recall_at_k(ids, truth):>12.3f}"
+          f"{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 95):>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=get_config().FAISS_INDEX_FILE)
+    parser.add_argument('--synthetic', type=int, default=0, help='Use a synthetic corpus of this size')
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--hnsw-m', type=int, nargs='+', default=[16, 32])
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[16, 32, 64, 128, 256])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+    
+    if args.synthetic or not os.path.exists(args.index):
+        vectors = synthetic_vectors(args.synthetic or 50000, args.dimension)
+        print(f"Synthetic corpus: {len(vectors)} x {args.dimension}")
+    else:
+        vectors = load_vectors(args.index)
+        print(f"Corpus from {args.index}: {len(vectors)} x {vectors.shape[1]}")
+    
+    queries = make_queries(vectors, args.queries)
+    dimension = vectors.shape[1]
+    
+    print("\n" + "="*63)
+    print(f"{'index':<6}{'setting':<16}{'build s':>9}{'recall@' + str(args.k):>12}{'p50 ms':>10}{'p95 ms':>10}")
+    print("-"*63)
+    
+    start = time.perf_counter()
+    flat = build_index(dimension, 'flat')
+    train_and_add(flat, vectors)
+    flat_build = time.perf_counter() - start
+    truth, latencies = time_queries(flat, queries, args.k, None)
+    report('flat', 'exact', flat_build, truth, latencies, truth)
+    
+    for m in args.hnsw_m:
+        start = time.perf_counter()
+        hnsw = build_index(dimension, 'hnsw', hnsw_m=m)
+        train_and_add(hnsw, vectors)
+        build_s = time.perf_counter() - start
+        for ef in args.ef_search:
+            ids, latencies = time_queries(hnsw, queries, args.k, make_search_params(hnsw, ef_search=ef))
+            report('hnsw', f"M={m} ef={ef}", build_s, ids, latencies, truth)
+    
+    start = time.perf_counter()
+    ivf = build_index(dimension, 'ivf', num_vectors=len(vectors))
+    train_and_add(ivf, vectors)
+    build_s = time.perf_counter() - start
+    nlist = faiss.extract_index_ivf(ivf).nlist
+    for nprobe in args.nprobe:
+        ids, latencies = time_queries(ivf, queries, args.k, make_search_params(ivf, nprobe=nprobe))
+        report('ivf', f"nlist={nlist} np={nprobe}", build_s, ids, latencies, truth)
+    print("="*63 + "\n")
+
+if __name__ == "__main__":
+    main()
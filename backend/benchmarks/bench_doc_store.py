@@ -0,0 +1,126 @@
+"""
+Benchmark: legacy JSON text map vs memory-mapped document store
+
+For growing corpus sizes, writes the same synthetic passages in both formats
+and measures open time, resident memory added by opening, random-read
+latency and file size. Each measurement runs in a fresh subprocess so RSS is
+not polluted by earlier rounds.
+
+Usage:
+    python benchmarks/bench_doc_store.py
+    python benchmarks/bench_doc_store.py --sizes 1000 5000 20000 --doc-words 300
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from utils.doc_store import DocStore
+
+WORDS = (
+    "empire dynasty battle treaty revolution king queen temple river trade "
+    "century ancient medieval colonial army capital monument museum war city"
+).split()
+
+def make_documents(count, doc_words):
+    """Generate reproducible synthetic passages"""
+    rng = random.Random(42)
+    return [
+        f"# Topic {i}\n\n" + " ".join(rng.choice(WORDS) for _ in range(doc_words))
+        for i in range(count)
+    ]
+
+def read_rss_kb():
+    """Resident set size of the current process (kB)"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+def measure(fmt, path, count, reads):
+    """Open one format and time random reads (runs in a subprocess)"""
+    baseline = read_rss_kb()
+    start = time.perf_counter()
+    if fmt == 'json':
+        with open(path, 'r', encoding='utf-8') as f:
+            store = json.load(f)
+        get = lambda i: store[str(i)]
+    else:
+        store = DocStore(path)
+        get = store.get
+    open_ms = (time.perf_counter() - start) * 1000
+    
+    rng = random.Random(7)
+    ids = [rng.randrange(count) for _ in range(reads)]
+    start = time.perf_counter()
+    for i in ids:
+        get(i)
+    read_us = (time.perf_counter() - start) * 1e6 / reads
+    
+    print(json.dumps({
+        'open_ms': open_ms,
+        'read_us': read_us,
+        'rss_mb': (read_rss_kb() - baseline) / 1024
+    }))
+
+def run_measurement(fmt, path, count, reads):
+    output = subprocess.check_output([
+        sys.executable, os.path.abspath(__file__), '--measure', fmt, path, str(count), str(reads)
+    ])
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 5000, 20000, 50000])
+    parser.add_argument('--doc-words', type=int, default=200)
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--measure', nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.measure:
+        fmt, path, count, reads = args.measure
+        measure(fmt, path, int(count), int(reads))
+        return
+    
+    workdir = tempfile.mkdtemp()
+    print("\n" + "="*84)
+    print(f"{'docs':>8}  {'format':<10}{'file MB':>10}{'open ms':>12}{'RSS +MB':>10}{'read us':>10}{'save ms':>12}")
+    print("-"*84)
+    for count in args.sizes:
+        documents = make_documents(count, args.doc_words)
+        
+        json_path = os.path.join(workdir, f'text_map_{count}.json')
+        start = time.perf_counter()
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({str(i): text for i, text in enumerate(documents)}, f, ensure_ascii=False, indent=2)
+        json_save_ms = (time.perf_counter() - start) * 1000
+        
+        store_path = os.path.join(workdir, f'docs_{count}')
+        store = DocStore()
+        store.extend(documents)
+        start = time.perf_counter()
+        store.save(store_path)
+        store_save_ms = (time.perf_counter() - start) * 1000
+        store.close()
+        
+        rows = (
+            ('json', json_path, os.path.getsize(json_path), json_save_ms),
+            ('docstore', store_path, os.path.getsize(store_path + '.idx') + os.path.getsize(store_path + '.dat'), store_save_ms)
+        )
+        for fmt, path, size, save_ms in rows:
+            result = run_measurement(fmt, path, count, args.reads)
+            print(f"{count:>8}  {fmt:<10}{size / 2**20:>10.1f}{result['open_ms']:>12.2f}"
+                  f"{result['rss_mb']:>10.1f}{result['read_us']:>10.1f}{save_ms:>12.1f}")
+    print("="*84)
+    print("save ms is a full write; appending a batch to a document store only writes the new records.\n")
+
+if __name__ == "__main__":
+    main()
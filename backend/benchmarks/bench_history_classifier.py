@@ -0,0 +1,111 @@
+"""
+Benchmark: substring keyword scan vs compiled single-regex classifier
+
+Times the previous is_historical_question (lowercase every keyword, test
+each as a substring, then re.search every time / query pattern) against
+the compiled HISTORICAL_REGEX, and compares their verdicts.
+
+The compiled matcher uses word boundaries, so the old version's substring
+false positives ("software" contains "war", "making" contains "king") are
+expected disagreements; they are listed with the keyword that caused them.
+
+Usage:
+    python benchmarks/bench_history_classifier.py
+    python benchmarks/bench_history_classifier.py --queries queries.txt --repeat 200
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.history_utils import (
+    HISTORICAL_QUERY_PATTERNS, HISTORY_KEYWORDS, TIME_PATTERNS,
+    is_historical_question
+)
+
+# Questions in the shape visitors ask them, historical and not
+QUERIES = [
+    "who was Napoleon Bonaparte", "tell me about the Roman Empire", "what caused World War 1",
+    "when was the Taj Mahal built", "who built the pyramids of Giza", "what is the Rosetta Stone",
+    "why did the Ottoman Empire collapse", "how did the Mughal dynasty begin", "Battle of Waterloo",
+    "who was Cleopatra", "explain the significance of the Magna Carta", "what happened in 1066",
+    "who ruled India before the British", "what is the history of the Silk Road",
+    "tell me about ancient Egyptian religion", "who was Genghis Khan", "Fall of Constantinople 1453",
+    "what was the Renaissance", "who painted the Sistine Chapel", "Meiji Restoration reforms",
+    "who was Mansa Musa", "when did the Berlin Wall fall", "French Revolution causes",
+    "Aztec Empire capital", "who was Nelson Mandela", "Industrial Revolution in Britain",
+    "what was the Cold War", "who was Ashoka the Great", "explain the importance of the printing press",
+    "what life was like in the middle ages", "the 5th century BC in Athens", "year 1492",
+    "early 1900s fashion", "what happened during the Black Death", "who founded the Maurya empire",
+    "what were the crusades about", "Vijayanagara architecture", "kings of medieval France",
+    "Greek philosophers", "how did the Inca build Machu Picchu", "Stonehenge purpose",
+    "quit india movement leaders", "salt march 1930", "who was Rani Lakshmibai",
+    "what is colonialism", "Hiroshima bombing", "D-Day landings in Normandy", "Boer War",
+    "art deco buildings in Mumbai", "impressionism painters", "Byzantine mosaics",
+    "what's the weather today", "how do I reset my password", "best pizza near me",
+    "how do I install this software", "recommend a good laptop", "what is 2 + 2",
+    "making bread at home", "translate hello into Spanish", "how far is the moon",
+    "python list comprehension", "stock price of apple", "how to bake a cake",
+    "what is machine learning", "football scores tonight", "how tall is mount everest",
+    "convert 10 km to miles", "what does this warning mean", "tips for a job interview",
+    "the maori haka", "awkward silence", "a bouquet of roses", "hospital opening hours",
+    "what time does the museum open", "is the exhibit wheelchair accessible"
+]
+
+def legacy_is_historical_question(question):
+    """is_historical_question as it was before the compiled matcher"""
+    question_lower = question.lower()
+    if any(keyword.lower() in question_lower for keyword in HISTORY_KEYWORDS):
+        return True
+    for pattern in TIME_PATTERNS:
+        if re.search(pattern, question_lower, re.IGNORECASE):
+            return True
+    for pattern in HISTORICAL_QUERY_PATTERNS:
+        if re.search(pattern, question_lower, re.IGNORECASE):
+            return True
+    return False
+
+def time_per_query(func, queries, repeat):
+    """Median microseconds per query over repeat passes"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        samples.append((time.perf_counter() - start) / len(queries) * 1e6)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', help='File with one query per line (default: built-in corpus)')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    queries = QUERIES
+    if args.queries:
+        with open(args.queries, encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    legacy = [legacy_is_historical_question(query) for query in queries]
+    compiled = [is_historical_question(query) for query in queries]
+
+    print(f"{len(queries)} queries, {args.repeat} passes\n")
+    legacy_us = time_per_query(legacy_is_historical_question, queries, args.repeat)
+    compiled_us = time_per_query(is_historical_question, queries, args.repeat)
+    print(f"{'matcher':<28}{'us/query':>10}{'speedup':>10}")
+    print(f"{'substring scan (legacy)':<28}{legacy_us:>10.2f}{1.0:>9.1f}x")
+    print(f"{'compiled regex':<28}{compiled_us:>10.2f}{legacy_us / compiled_us:>9.1f}x")
+
+    disagreements = [i for i, (old, new) in enumerate(zip(legacy, compiled)) if old != new]
+    print(f"\nLegacy vs compiled verdicts: {len(queries) - len(disagreements)}/{len(queries)} identical")
+    for i in disagreements:
+        hits = sorted(keyword for keyword in HISTORY_KEYWORDS if keyword.lower() in queries[i].lower())
+        reason = f"substring match on {', '.join(repr(hit) for hit in hits)}" if hits else "pattern"
+        print(f"  {queries[i]!r}: legacy={legacy[i]} compiled={compiled[i]} ({reason})")
+
+if __name__ == "__main__":
+    main()
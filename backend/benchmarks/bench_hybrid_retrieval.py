@@ -0,0 +1,160 @@
+"""
+Benchmark: dense-only vs BM25 vs hybrid (reciprocal rank fusion) retrieval
+
+Runs a labelled query set against the ingested knowledge base
+(./data/faiss_index.bin, its document store and faiss_index.bm25) and
+reports, per retriever, hit@k (a passage from a relevant article in the
+top k), MRR over the top k and per-query latency.
+
+A passage is relevant when its article title contains one of the query's
+labels (case-insensitive). The built-in set leans on the proper names
+(battles, treaties, rulers) that embeddings tend to place poorly; pass
+--queries with a JSONL file of {"query": ..., "relevant": [titles]} to use
+your own.
+
+Usage:
+    python benchmarks/bench_hybrid_retrieval.py
+    python benchmarks/bench_hybrid_retrieval.py --k 5 --depth 30 --show-diff
+    python benchmarks/bench_hybrid_retrieval.py --queries labelled.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import get_config
+from utils.ai_utils import get_embeddings_model
+from utils.vector_utils import hybrid_search, load_lexical_index, load_vector_db
+
+# (query, titles of articles that answer it), over the ingestion topic list
+LABELLED_QUERIES = [
+    ("Battle of Talikota", ["Vijayanagara", "Hampi"]),
+    ("Krishnadevaraya", ["Vijayanagara", "Hampi"]),
+    ("Rashtrakuta dynasty Kailasa temple", ["Ellora"]),
+    ("Chandragupta Maurya and Chanakya", ["Maurya", "Ashoka"]),
+    ("Kalinga war", ["Ashoka", "Maurya"]),
+    ("Samudragupta conquests", ["Gupta"]),
+    ("Harappa and Mohenjo-daro", ["Indus Valley"]),
+    ("Hammurabi's code", ["Mesopotamia"]),
+    ("Qutb-ud-din Aibak", ["Qutb Minar", "Delhi Sultanate"]),
+    ("Din-i Ilahi", ["Akbar", "Mughal"]),
+    ("Treaty of Purandar", ["Shivaji", "Maratha"]),
+    ("Mumtaz Mahal tomb", ["Taj Mahal"]),
+    ("Salt March to Dandi", ["Gandhi", "Indian independence"]),
+    ("Treaty of Versailles", ["World War I"]),
+    ("Battle of Stalingrad", ["World War II", "Stalin"]),
+    ("Battle of Waterloo", ["Napoleon"]),
+    ("Peace of Westphalia", ["Holy Roman Empire"]),
+    ("Suleiman the Magnificent", ["Ottoman"]),
+    ("Kublai Khan and the Yuan dynasty", ["Mongol", "Genghis Khan"]),
+    ("Tenochtitlan", ["Aztec"]),
+    ("Atahualpa and Pizarro", ["Inca", "Machu Picchu"]),
+    ("Jayavarman VII", ["Khmer", "Angkor"]),
+    ("Meroe pyramids", ["Kush"]),
+    ("Emancipation Proclamation", ["Lincoln", "American Civil War"]),
+    ("Storming of the Bastille", ["French Revolution"]),
+    ("Ninety-five Theses", ["Reformation"]),
+    ("Sputnik 1", ["Space Race"]),
+    ("Cuban Missile Crisis", ["Cold War", "Cuban Revolution"]),
+    ("Parthenon and Pericles", ["Acropolis", "Ancient Greece"]),
+    ("Long March", ["Mao Zedong", "Chinese"]),
+    ("why did the Roman Republic become an empire", ["Roman Empire", "Julius Caesar"]),
+    ("how did the plague spread through Europe", ["Black Death"]),
+    ("life of a medieval knight", ["Feudalism", "Medieval Europe"]),
+    ("what sparked the revolt of the thirteen colonies", ["American Revolution"])
+]
+
+MODES = [
+    ('dense', ['dense']),
+    ('bm25', ['lexical']),
+    ('hybrid (rrf)', ['dense', 'lexical'])
+]
+
+def load_queries(path):
+    """Labelled queries from a JSONL file of {"query": ..., "relevant": [...]}"""
+    queries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                queries.append((item['query'], item['relevant']))
+    return queries
+
+def first_relevant_rank(results, text_map, labels):
+    """1-based rank of the first passage from a relevant article (None if none)"""
+    labels = [label.lower() for label in labels]
+    for rank, (_, _, doc_id) in enumerate(results, start=1):
+        title = ((text_map.get_metadata(doc_id) or {}).get('title') or '').lower()
+        if any(label in title for label in labels):
+            return rank
+    return None
+
+def run_mode(queries, retrievers, index, text_map, lexical_index, args):
+    """Ranks of the first relevant passage and latencies (ms) per query"""
+    ranks, latencies = [], []
+    for query, labels in queries:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = hybrid_search(
+                query, index, text_map, lexical_index=lexical_index, k=args.k, retrievers=retrievers,
+                depth=args.depth, rrf_k=args.rrf_k, ef_search=args.ef_search, nprobe=args.nprobe
+            )
+            samples.append((time.perf_counter() - start) * 1000)
+        latencies.append(min(samples))
+        ranks.append(first_relevant_rank(results, text_map, labels))
+    return ranks, np.array(latencies)
+
+def main():
+    cfg = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=cfg.FAISS_INDEX_FILE)
+    parser.add_argument('--text-map', default=cfg.TEXT_MAP_FILE)
+    parser.add_argument('--queries', help='JSONL file of labelled queries (default: built-in set)')
+    parser.add_argument('--k', type=int, default=cfg.CONTEXT_TOP_K)
+    parser.add_argument('--depth', type=int, default=cfg.FUSION_DEPTH, help='Ranks per retriever before fusion')
+    parser.add_argument('--rrf-k', type=int, default=cfg.RRF_K)
+    parser.add_argument('--ef-search', type=int, default=cfg.HNSW_EF_SEARCH)
+    parser.add_argument('--nprobe', type=int, default=cfg.IVF_NPROBE)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query (fastest is kept)')
+    parser.add_argument('--show-diff', action='store_true', help='List queries where hybrid and dense disagree')
+    args = parser.parse_args()
+    
+    queries = load_queries(args.queries) if args.queries else LABELLED_QUERIES
+    
+    if get_embeddings_model(cfg.EMBEDDING_MODEL) is None:
+        sys.exit("Embeddings model unavailable; the dense retriever cannot run")
+    index, text_map = load_vector_db(args.index, args.text_map)
+    if index is None:
+        sys.exit(f"No vector database at {args.index}; run ingestion.py first")
+    lexical_index = load_lexical_index(args.index, text_map)
+    
+    # Warm up the embedding model and page in the index
+    hybrid_search(queries[0][0], index, text_map, lexical_index=lexical_index, k=args.k)
+    
+    print(f"\n{len(queries)} labelled queries, {len(text_map)} passages, k={args.k}, depth={args.depth}")
+    print("\n" + "="*66)
+    print(f"{'retriever':<14}{'hit@' + str(args.k):>10}{'mrr@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    print("-"*66)
+    all_ranks = {}
+    for name, retrievers in MODES:
+        ranks, latencies = run_mode(queries, retrievers, index, text_map, lexical_index, args)
+        all_ranks[name] = ranks
+        hits = sum(1 for rank in ranks if rank is not None)
+        mrr = sum(1.0 / rank for rank in ranks if rank is not None) / len(queries)
+        print(f"{name:<14}{hits / len(queries):>10.3f}{mrr:>10.3f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 95):>10.2f}{latencies.mean():>10.2f}")
+    print("="*66 + "\n")
+    
+    if args.show_diff:
+        for (query, _), dense, hybrid in zip(queries, all_ranks['dense'], all_ranks['hybrid (rrf)']):
+            if dense != hybrid:
+                print(f"  {query!r}: dense rank={dense} hybrid rank={hybrid}")
+
+if __name__ == "__main__":
+    main()
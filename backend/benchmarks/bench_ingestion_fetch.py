@@ -0,0 +1,163 @@
+"""
+Benchmark: sequential vs pooled, rate-limited Wikipedia fetching
+
+Starts a local stub of the Wikipedia REST summary and action=query
+endpoints with a fixed per-request latency, points utils.wikipedia_utils
+at it, and compares:
+
+  - the old pipeline: one topic at a time with a sleep between requests
+  - fetch_topics() with a bounded worker pool sharing a token bucket
+    (summary mode batches 20 titles per action=query request)
+
+The request count column is what the stub actually served.
+
+Usage:
+    python benchmarks/bench_ingestion_fetch.py
+    python benchmarks/bench_ingestion_fetch.py --topics 250 --latency 0.15 --workers 1 4 8 16 --rate 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingestion
+from utils import wikipedia_utils
+from utils.cache_utils import get_cache
+
+# Requests served by the stub (reset per strategy)
+request_count = [0]
+
+def make_handler(latency, error_rate):
+    """Build a stub handler with a fixed latency and optional 503s"""
+    
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+        
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def do_GET(self):
+            request_count[0] += 1
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self.send_json(503, {'error': 'unavailable'}, {'Retry-After': '1'})
+                return
+            
+            url = urlparse(self.path)
+            if url.path.startswith('/api/rest_v1/page/summary/'):
+                title = unquote(url.path.rsplit('/', 1)[-1]).replace('_', ' ')
+                self.send_json(200, {
+                    'title': title,
+                    'extract': f"{title} is a historical topic. " * 20,
+                    'description': 'Stub article'
+                })
+                return
+            
+            query = parse_qs(url.query)
+            titles = query.get('titles', ['Unknown'])[0].split('|')
+            pages = []
+            for title in titles:
+                if 'exintro' in query:
+                    extract = f"{title} is a historical topic. " * 20
+                else:
+                    extract = f"{title} lead.\n== History ==\n" + f"{title} happened long ago. " * 200
+                pages.append({
+                    'title': title,
+                    'extract': extract,
+                    'description': 'Stub article',
+                    'fullurl': f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+                })
+            self.send_json(200, {'query': {'pages': pages}})
+    
+    return StubHandler
+
+def start_stub_server(latency, error_rate):
+    """Run the stub server in a background thread and return its base URL"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(latency, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def run_sequential(topics, mode, delay):
+    """The pre-pool pipeline: fetch, sleep, repeat"""
+    start = time.perf_counter()
+    ok = 0
+    for i, topic in enumerate(topics, 1):
+        if ingestion.fetch_wikipedia_documents(topic, mode=mode):
+            ok += 1
+        if i < len(topics):
+            time.sleep(delay)
+    return ok, time.perf_counter() - start
+
+def run_pooled(topics, mode, workers, rate):
+    start = time.perf_counter()
+    ok = sum(1 for _, documents in ingestion.fetch_topics(
+        topics, mode=mode, workers=workers, requests_per_second=rate
+    ) if documents)
+    return ok, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--topics', type=int, default=120)
+    parser.add_argument('--mode', choices=ingestion.INGESTION_MODES, default='summary')
+    parser.add_argument('--latency', type=float, default=0.1, help='Stub response latency (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub responses that are 503s')
+    parser.add_argument('--delay', type=float, default=1.0, help='Sleep between requests in the sequential baseline')
+    parser.add_argument('--baseline-topics', type=int, default=10,
+                        help='Topics timed for the sequential baseline (it is linear, so a sample suffices)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--rate', type=float, default=10.0, help='Token bucket rate (requests/s, 0 = unlimited)')
+    args = parser.parse_args()
+    
+    server, base_url = start_stub_server(args.latency, args.error_rate)
+    wikipedia_utils.WIKIPEDIA_API_URL = f"{base_url}/w/api.php"
+    wikipedia_utils.WIKIPEDIA_REST_URL = f"{base_url}/api/rest_v1"
+    
+    topics = ingestion.HISTORICAL_TOPICS[:args.topics]
+    topics += [f"Topic {i}" for i in range(args.topics - len(topics))]
+    print(f"Stub server at {base_url} ({args.latency * 1000:.0f} ms latency), {len(topics)} topics, mode={args.mode}")
+    
+    rows = []
+    sample = topics[:args.baseline_topics]
+    request_count[0] = 0
+    get_cache('wikipedia').clear()  # Time cold fetches only
+    ok, elapsed = run_sequential(sample, args.mode, args.delay)
+    rows.append((f"sequential, {args.delay:g}s delay", len(sample), ok, elapsed, request_count[0]))
+    
+    strategies = [(workers, args.rate) for workers in args.workers] + [(max(args.workers), 0)]
+    for workers, rate in strategies:
+        request_count[0] = 0
+        get_cache('wikipedia').clear()
+        ok, elapsed = run_pooled(topics, args.mode, workers, rate)
+        label = f"{rate:g} req/s" if rate else "unlimited"
+        rows.append((f"pool x{workers}, {label}", len(topics), ok, elapsed, request_count[0]))
+    
+    baseline_rate = rows[0][1] / rows[0][3]
+    print("\n" + "="*88)
+    print(f"{'strategy':<28}{'topics':>8}{'ok':>6}{'requests':>10}{'seconds':>10}{'topics/s':>10}"
+          f"{'speedup':>9}{'5000 ETA':>10}")
+    print("-"*88)
+    for name, count, ok, elapsed, requests in rows:
+        rate = count / elapsed
+        print(f"{name:<28}{count:>8}{ok:>6}{requests:>10}{elapsed:>10.2f}{rate:>10.1f}"
+              f"{rate / baseline_rate:>8.1f}x{5000 / rate / 60:>9.1f}m")
+    print("="*88 + "\n")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
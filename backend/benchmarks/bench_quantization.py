@@ -0,0 +1,101 @@
+"""
+Benchmark: memory and recall of quantized vector indexes
+
+For each index type, reports the serialized index size (what each worker
+keeps resident), bytes per vector, and recall@k with and without exact
+re-ranking from the float16 side store. The side store is memory-mapped,
+so only the candidate rows touched by re-ranking are paged in.
+
+Usage:
+    python benchmarks/bench_quantization.py
+    python benchmarks/bench_quantization.py --synthetic 100000 --pq-m 96 --rerank-factor 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from config import get_config
+from bench_ann_recall import load_vectors, make_queries, recall_at_k, synthetic_vectors
+from utils.vector_utils import build_index, make_search_params, train_and_add
+
+def search(index, queries, k, rerank_factor, side_store, nprobe):
+    """Search each query, optionally re-ranking k * rerank_factor candidates exactly"""
+    params = make_search_params(index, nprobe=nprobe)
+    fetch_k = k * rerank_factor if side_store is not None else k
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i in range(len(queries)):
+        query = queries[i:i + 1]
+        start = time.perf_counter()
+        _, candidates = index.search(query, fetch_k, params=params)
+        candidates = candidates[0][candidates[0] != -1]
+        if side_store is not None:
+            distances = ((side_store[candidates].astype(np.float32) - query) ** 2).sum(axis=1)
+            candidates = candidates[np.argsort(distances)]
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids[i] = np.pad(candidates[:k], (0, max(0, k - len(candidates[:k]))), constant_values=-1)
+    return ids, np.array(latencies)
+
+def build_and_fill(dimension, vectors):
+    """Exact index used as ground truth"""
+    index = build_index(dimension, 'flat')
+    train_and_add(index, vectors)
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=get_config().FAISS_INDEX_FILE)
+    parser.add_argument('--synthetic', type=int, default=0, help='Use a synthetic corpus of this size')
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--pq-m', type=int, default=96)
+    parser.add_argument('--nprobe', type=int, default=16)
+    parser.add_argument('--rerank-factor', type=int, default=4)
+    parser.add_argument('--types', nargs='+', default=['flat', 'sq8', 'pq', 'ivf_sq8', 'ivf_pq'])
+    args = parser.parse_args()
+    
+    if args.synthetic or not os.path.exists(args.index):
+        vectors = synthetic_vectors(args.synthetic or 50000, args.dimension)
+        print(f"Synthetic corpus: {len(vectors)} x {args.dimension}")
+    else:
+        vectors = load_vectors(args.index)
+        print(f"Corpus from {args.index}: {len(vectors)} x {vectors.shape[1]}")
+    
+    queries = make_queries(vectors, args.queries)
+    dimension = vectors.shape[1]
+    side_store = vectors.astype(np.float16)
+    truth, _ = search(build_and_fill(dimension, vectors), queries, args.k, 1, None, args.nprobe)
+    flat_bytes = len(vectors) * dimension * 4
+    
+    print("\n" + "="*88)
+    print(f"{'index':<9}{'index MB':>10}{'B/vector':>10}{'vs flat':>9}{'recall':>9}"
+          f"{'+rerank':>9}{'p50 ms':>9}{'+rerank':>9}{'build s':>10}")
+    print("-"*88)
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_index(dimension, index_type, num_vectors=len(vectors), pq_m=args.pq_m)
+        train_and_add(index, vectors)
+        build_s = time.perf_counter() - start
+        
+        index_bytes = len(faiss.serialize_index(index))
+        plain_ids, plain_latency = search(index, queries, args.k, 1, None, args.nprobe)
+        rerank_ids, rerank_latency = search(index, queries, args.k, args.rerank_factor, side_store, args.nprobe)
+        
+        print(f"{index_type:<9}{index_bytes / 2**20:>10.1f}{index_bytes / len(vectors):>10.0f}"
+              f"{flat_bytes / index_bytes:>8.1f}x{recall_at_k(plain_ids, truth):>9.3f}"
+              f"{recall_at_k(rerank_ids, truth):>9.3f}{np.median(plain_latency):>9.3f}"
+              f"{np.median(rerank_latency):>9.3f}{build_s:>10.1f}")
+    print("-"*88)
+    print(f"float16 side store: {side_store.nbytes / 2**20:.1f} MB on disk "
+          f"({side_store.nbytes / len(vectors):.0f} B/vector, memory-mapped, not resident)")
+    print("="*88 + "\n")
+
+if __name__ == "__main__":
+    main()
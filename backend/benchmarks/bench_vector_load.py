@@ -0,0 +1,137 @@
+"""
+Benchmark: heap-loaded vs memory-mapped FAISS index across worker processes
+
+Forks N workers per load mode (the same way gunicorn forks workers), loads
+the index in each, and reports per-worker RSS/PSS plus cold (first query in
+the process) and warm (median of later queries) search latency. PSS splits
+shared pages between the processes mapping them, so it shows the real
+per-worker cost of the memory-mapped index.
+
+Usage:
+    python benchmarks/bench_vector_load.py                  # uses ./data/faiss_index.bin
+    python benchmarks/bench_vector_load.py --synthetic 50000 --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import get_config
+from utils.vector_utils import read_index
+
+def read_memory_kb():
+    """Read RSS and PSS (kB) of the current process from /proc"""
+    memory = {'rss_kb': 0, 'pss_kb': 0}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    memory['rss_kb'] = int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    memory['pss_kb'] = int(line.split()[1])
+    except OSError:
+        import resource
+        memory['rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return memory
+
+def build_synthetic_index(path, count, dimension):
+    """Write a flat index of random unit vectors"""
+    import faiss
+    
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    
+    index = faiss.IndexFlatL2(dimension)
+    index.add(vectors)
+    faiss.write_index(index, path)
+
+def worker(index_path, mmap, queries, k, results):
+    """Load the index, then time one cold and several warm searches"""
+    baseline = read_memory_kb()
+    
+    start = time.perf_counter()
+    index = read_index(index_path, mmap=mmap)
+    load_ms = (time.perf_counter() - start) * 1000
+    
+    start = time.perf_counter()
+    index.search(queries[:1], k)
+    cold_ms = (time.perf_counter() - start) * 1000
+    
+    warm = []
+    for i in range(1, len(queries)):
+        start = time.perf_counter()
+        index.search(queries[i:i + 1], k)
+        warm.append((time.perf_counter() - start) * 1000)
+    
+    loaded = read_memory_kb()
+    results.put({
+        'load_ms': load_ms,
+        'cold_ms': cold_ms,
+        'warm_ms': statistics.median(warm) if warm else cold_ms,
+        'rss_mb': (loaded['rss_kb'] - baseline['rss_kb']) / 1024,
+        'pss_mb': (loaded['pss_kb'] - baseline['pss_kb']) / 1024
+    })
+    
+    # Keep the mapping alive until every worker has measured
+    time.sleep(1.0)
+
+def run_mode(index_path, mmap, workers, queries, k):
+    """Fork workers for one load mode and collect their measurements"""
+    ctx = mp.get_context('fork')
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(index_path, mmap, queries, k, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return measurements
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=get_config().FAISS_INDEX_FILE)
+    parser.add_argument('--synthetic', type=int, default=0, help='Build a random index with this many vectors')
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+    
+    index_path = args.index
+    if args.synthetic or not os.path.exists(index_path):
+        count = args.synthetic or 20000
+        index_path = os.path.join(tempfile.mkdtemp(), 'bench_index.bin')
+        print(f"Building synthetic index: {count} x {args.dimension}")
+        build_synthetic_index(index_path, count, args.dimension)
+    
+    size_mb = os.path.getsize(index_path) / (1024 * 1024)
+    print(f"Index file: {index_path} ({size_mb:.1f} MB)")
+    
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    
+    print("\n" + "="*78)
+    print(f"{'mode':<8}{'workers':>8}{'load ms':>10}{'cold ms':>10}{'warm ms':>10}"
+          f"{'RSS/worker':>14}{'PSS/worker':>14}")
+    print("-"*78)
+    for mode, mmap in (('memory', False), ('mmap', True)):
+        measurements = run_mode(index_path, mmap, args.workers, queries, args.k)
+        mean = lambda key: statistics.mean(m[key] for m in measurements)
+        print(f"{mode:<8}{args.workers:>8}{mean('load_ms'):>10.1f}{mean('cold_ms'):>10.2f}"
+              f"{mean('warm_ms'):>10.2f}{mean('rss_mb'):>11.1f} MB{mean('pss_mb'):>11.1f} MB")
+    print("="*78 + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark: two-call search + summary vs single generator=search query
+
+Times search_then_summarize (list=search, then the REST summary of the top
+hit) against search_and_summarize (one action=query with generator=search)
+for a set of questions, through a local stub server that adds a fixed
+round-trip latency.
+
+The stub can serve synthetic responses, or replay responses recorded from
+the live API:
+
+    python benchmarks/bench_wikipedia_search.py                          # synthetic
+    python benchmarks/bench_wikipedia_search.py --record responses.json  # proxy to Wikipedia, save
+    python benchmarks/bench_wikipedia_search.py --replay responses.json --latency 0.12
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import wikipedia_utils
+from utils.cache_utils import get_cache
+
+UPSTREAM = 'https://en.wikipedia.org'
+
+QUESTIONS = [
+    "tell me about the Roman Empire", "who was Genghis Khan", "what is the Silk Road",
+    "Battle of Waterloo", "who was Cleopatra", "what is the Renaissance",
+    "Taj Mahal history", "Ming dynasty porcelain", "who was Ashoka",
+    "what is the Rosetta Stone", "Fall of Constantinople", "Meiji Restoration reforms",
+    "who was Mansa Musa", "Great Wall of China construction", "French Revolution causes",
+    "Aztec Empire capital", "who was Nelson Mandela", "Industrial Revolution in Britain",
+    "what is the Magna Carta", "Apollo 11 moon landing"
+]
+
+def synthetic_response(url):
+    """Build a response shaped like the live API for a stub request"""
+    query = {key: values[0] for key, values in parse_qs(url.query).items()}
+    if url.path.startswith('/api/rest_v1/page/summary/'):
+        title = unquote(url.path.rsplit('/', 1)[-1]).replace('_', ' ')
+        return {'title': title, 'extract': f"{title} was important. " * 15, 'description': 'Stub article',
+                'thumbnail': {'source': f"https://upload.example/{title}.jpg"}}
+    
+    search = query.get('gsrsearch') or query.get('srsearch') or 'Unknown'
+    title = search.title()
+    if query.get('generator') == 'search':
+        return {'batchcomplete': True, 'query': {'pages': [{
+            'pageid': 1, 'ns': 0, 'title': title, 'index': 1,
+            'extract': f"{title} was important. " * 15, 'description': 'Stub article',
+            'thumbnail': {'source': f"https://upload.example/{title}.jpg"},
+            'fullurl': f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+        }]}}
+    return {'query': {'search': [{'ns': 0, 'title': title, 'snippet': f"{title} ..."}]}}
+
+def make_handler(latency, mode, recorded, request_count):
+    """Stub handler: synthetic, record (proxy upstream) or replay"""
+    
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+        
+        def do_GET(self):
+            request_count[0] += 1
+            if mode == 'record':
+                try:
+                    upstream = requests.get(UPSTREAM + self.path, headers=wikipedia_utils.HEADERS, timeout=15)
+                    recorded[self.path] = {'status': upstream.status_code, 'body': upstream.text}
+                    status, body = upstream.status_code, upstream.text
+                except requests.RequestException as e:
+                    status, body = 502, json.dumps({'error': str(e)})
+            else:
+                time.sleep(latency)
+                if mode == 'replay':
+                    entry = recorded.get(self.path, {'status': 404, 'body': '{}'})
+                    status, body = entry['status'], entry['body']
+                else:
+                    status, body = 200, json.dumps(synthetic_response(urlparse(self.path)))
+            
+            payload = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+    
+    return StubHandler
+
+def time_strategy(func, questions, request_count):
+    """Latency per question (ms), requests per question and hit count"""
+    latencies = []
+    hits = 0
+    request_count[0] = 0
+    get_cache('wikipedia').clear()  # Time cold lookups only
+    for question in questions:
+        start = time.perf_counter()
+        if func(question):
+            hits += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, request_count[0] / len(questions), hits
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.08, help='Stub round-trip latency (seconds)')
+    parser.add_argument('--record', metavar='FILE', help='Proxy to Wikipedia and save the responses')
+    parser.add_argument('--replay', metavar='FILE', help='Serve responses recorded with --record')
+    args = parser.parse_args()
+    
+    mode = 'record' if args.record else 'replay' if args.replay else 'synthetic'
+    recorded = {}
+    if args.replay:
+        with open(args.replay, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+    
+    request_count = [0]
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.latency, mode, recorded, request_count))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    wikipedia_utils.WIKIPEDIA_API_URL = f"{base_url}/w/api.php"
+    wikipedia_utils.WIKIPEDIA_REST_URL = f"{base_url}/api/rest_v1"
+    
+    latency_note = 'live upstream latency' if mode == 'record' else f"{args.latency * 1000:.0f} ms per round trip"
+    print(f"Stub server ({mode}, {latency_note}), {len(QUESTIONS)} questions")
+    
+    strategies = [
+        ('search + summary (2 calls)', wikipedia_utils.search_then_summarize),
+        ('generator=search (1 call)', wikipedia_utils.search_and_summarize)
+    ]
+    rows = [(name,) + time_strategy(func, QUESTIONS, request_count) for name, func in strategies]
+    
+    print("\n" + "="*78)
+    print(f"{'strategy':<30}{'req/q':>7}{'hits':>6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print("-"*78)
+    for name, latencies, requests_per_question, hits in rows:
+        print(f"{name:<30}{requests_per_question:>7.1f}{hits:>6}{statistics.mean(latencies):>10.1f}"
+              f"{percentile(latencies, 0.5):>10.1f}{percentile(latencies, 0.95):>10.1f}")
+    print("-"*78)
+    speedup = statistics.mean(rows[0][1]) / statistics.mean(rows[1][1])
+    print(f"Mean latency reduction: {speedup:.2f}x")
+    print("="*78 + "\n")
+    
+    if args.record:
+        with open(args.record, 'w', encoding='utf-8') as f:
+            json.dump(recorded, f)
+        print(f"Recorded {len(recorded)} responses to {args.record}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
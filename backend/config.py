@@ -25,28 +25,81 @@ class Config:
     
     # API Keys
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+    GEMINI_API_KEYS = [key.strip() for key in os.getenv('GEMINI_API_KEYS', '').split(',') if key.strip()]  # extra keys, "key" or "key:model"
     SMITHSONIAN_API_KEY = os.getenv('SMITHSONIAN_API_KEY', '')
     
     # Database and Cache
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     FAISS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', './data/faiss_index')
+    VECTOR_DB_ENABLED = os.getenv('VECTOR_DB_ENABLED', str(FLASK_ENV != 'production')).lower() == 'true'
+    VECTOR_DB_MMAP = os.getenv('VECTOR_DB_MMAP', 'True').lower() == 'true'
     
-    # Rate Limiting
+    # Vector index type: flat (exact), hnsw, ivf, or quantized sq8 / pq /
+    # ivf_sq8 / ivf_pq (trained during ingestion)
+    VECTOR_INDEX_TYPE = os.getenv('VECTOR_INDEX_TYPE', 'flat').lower()
+    HNSW_M = int(os.getenv('HNSW_M', 32))
+    HNSW_EF_CONSTRUCTION = int(os.getenv('HNSW_EF_CONSTRUCTION', 200))
+    HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', 64))
+    IVF_NLIST = int(os.getenv('IVF_NLIST', 0))  # 0 = sized from corpus
+    IVF_NPROBE = int(os.getenv('IVF_NPROBE', 8))
+    VECTOR_METRIC = os.getenv('VECTOR_METRIC', 'ip').lower()  # ip (cosine) or l2
+    PQ_M = int(os.getenv('PQ_M', 96))  # bytes per vector for pq / ivf_pq
+    RERANK_FACTOR = int(os.getenv('RERANK_FACTOR', 4))  # exact re-rank pool for quantized indexes
+    MIN_CONTEXT_SIMILARITY = float(os.getenv('MIN_CONTEXT_SIMILARITY', 0.3))  # cosine cut-off for prompt context
+    CONTEXT_TOP_K = int(os.getenv('CONTEXT_TOP_K', 3))  # passages per prompt
+    INFER_SEARCH_FILTERS = os.getenv('INFER_SEARCH_FILTERS', 'True').lower() == 'true'  # scope retrieval to a question's era
+    EXACT_FILTER_MAX = int(os.getenv('EXACT_FILTER_MAX', 2048))  # filtered searches this small skip the ANN index
+    SEARCH_RETRIEVERS = [name.strip() for name in os.getenv('SEARCH_RETRIEVERS', 'dense,lexical').split(',') if name.strip()]  # dense and/or lexical (BM25)
+    RRF_K = int(os.getenv('RRF_K', 60))  # reciprocal rank fusion constant
+    FUSION_DEPTH = int(os.getenv('FUSION_DEPTH', 20))  # ranks taken from each retriever before fusion
+    
+    # Cross-encoder re-ranking of retrieved passages (CPU, loaded in the background)
+    RERANK_ENABLED = os.getenv('RERANK_ENABLED', 'True').lower() == 'true'
+    RERANK_MODEL = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+    RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', 20))  # passages over-fetched for re-ranking
+    RERANK_BUDGET_MS = int(os.getenv('RERANK_BUDGET_MS', 150))  # past this, passages keep their index order
+    RERANK_BATCH_SIZE = int(os.getenv('RERANK_BATCH_SIZE', 16))
+    RERANK_MAX_LENGTH = int(os.getenv('RERANK_MAX_LENGTH', 256))  # tokens per (question, passage) pair
+    RERANK_MIN_SCORE = float(os.getenv('RERANK_MIN_SCORE')) if os.getenv('RERANK_MIN_SCORE') else None  # drop passages below
+    RERANK_CACHE_TTL = int(os.getenv('RERANK_CACHE_TTL', 24 * 3600))  # cached (question, passage) scores
+    
+    # Rate Limiting (also the per-key Gemini budget)
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', 50))
     RATE_LIMIT_PER_DAY = int(os.getenv('RATE_LIMIT_PER_DAY', 1500))
     
+    # Gemini backpressure: concurrent requests, bounded wait queue, 429/503 retries
+    GEMINI_MAX_IN_FLIGHT = int(os.getenv('GEMINI_MAX_IN_FLIGHT', 8))
+    GEMINI_MAX_QUEUE = int(os.getenv('GEMINI_MAX_QUEUE', 32))
+    GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', 10))  # seconds before 503
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+    GEMINI_BACKOFF_MAX = float(os.getenv('GEMINI_BACKOFF_MAX', 8))  # longer Retry-After is not waited for
+    GEMINI_KEY_EJECT_AFTER = int(os.getenv('GEMINI_KEY_EJECT_AFTER', 3))  # consecutive 429s before a pooled key is skipped
+    GEMINI_KEY_EJECT_SECONDS = float(os.getenv('GEMINI_KEY_EJECT_SECONDS', 60))
+    GEMINI_POOL_WORKERS = int(os.getenv('WEB_CONCURRENCY', 1))  # worker processes sharing each key's budget
+    GEMINI_MODEL_CACHE_FILE = os.getenv('GEMINI_MODEL_CACHE_FILE', './data/gemini_models.json')  # model found per key hash
+    GEMINI_MODEL_CACHE_TTL = int(os.getenv('GEMINI_MODEL_CACHE_TTL', 86400))  # 0 = probe on every start
+    GEMINI_SETUP_BACKGROUND = os.getenv('GEMINI_SETUP_BACKGROUND', 'True').lower() == 'true'
+    
     # Content Ingestion
     AUTO_POPULATE_FAISS = os.getenv('AUTO_POPULATE_FAISS', 'True').lower() == 'true'
     WIKIPEDIA_ARTICLES_LIMIT = int(os.getenv('WIKIPEDIA_ARTICLES_LIMIT', 5000))
+    INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', 8))
+    WIKIPEDIA_REQUESTS_PER_SECOND = float(os.getenv('WIKIPEDIA_REQUESTS_PER_SECOND', 10))
+    INGESTION_MODE = os.getenv('INGESTION_MODE', 'summary').lower()  # summary (one lead per topic) or passages
+    PASSAGE_MAX_WORDS = int(os.getenv('PASSAGE_MAX_WORDS', 180))
+    PASSAGE_OVERLAP_WORDS = int(os.getenv('PASSAGE_OVERLAP_WORDS', 40))
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 256))
     
     # File Paths
     DATA_DIR = './data'
     FAISS_INDEX_FILE = os.path.join(DATA_DIR, 'faiss_index.bin')
-    TEXT_MAP_FILE = os.path.join(DATA_DIR, 'faiss_text_map.json')
+    TEXT_MAP_FILE = os.path.join(DATA_DIR, 'faiss_text_map.json')  # Legacy; migrated to faiss_text_map.idx/.dat
     GENERATED_IMAGES_DIR = os.path.join(DATA_DIR, 'generated_images')
+    GAZETTEER_FILE = os.path.join(DATA_DIR, 'gazetteer_titles.json')  # titles learned at ingestion
     
     # AI Models
     EMBEDDING_MODEL = 'sentence-transformers/all-mpnet-base-v2'
+    EMBEDDING_DIMENSION = 768
     GEMINI_MODELS = [
         'gemini-1.5-pro',
         'gemini-1.5-flash',
@@ -58,7 +111,47 @@ class Config:
     ]
     
     # Performance
-    CACHE_TIMEOUT = 3600  # 1 hour
+    CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', 3600))  # 1 hour
+    CACHE_NEGATIVE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL', 120))  # lookups that found nothing
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 2048))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    
+    # Shared cache tier behind the in-process one: redis (REDIS_URL), sqlite
+    # (one file shared by the workers on this host), memory or none
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'none').lower()
+    CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', './data/cache.sqlite3')
+    CACHE_BACKEND_TIMEOUT = float(os.getenv('CACHE_BACKEND_TIMEOUT', 0.25))  # seconds per shared-cache call
+    CACHE_BACKEND_RETRY_INTERVAL = float(os.getenv('CACHE_BACKEND_RETRY_INTERVAL', 30))  # skip a failed backend this long
+    CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'pastportals')
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 6 * 3600))  # generated /api/ask answers
+    # Near-duplicate questions reuse answers (needs the embeddings model, i.e.
+    # VECTOR_DB_ENABLED); numbers and roman numerals must still match exactly
+    SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', str(VECTOR_DB_ENABLED)).lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.88))  # cosine similarity for a hit
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 1000))
+    SEMANTIC_CACHE_MAX_BYTES = int(os.getenv('SEMANTIC_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    # Opt-in cache for low-temperature generations (translate, detect-language,
+    # key-points): memory, disk (compressed files) or shared (CACHE_BACKEND)
+    GENERATION_CACHE_ENABLED = os.getenv('GENERATION_CACHE_ENABLED', 'True').lower() == 'true'
+    GENERATION_CACHE_STORAGE = os.getenv('GENERATION_CACHE_STORAGE', 'shared').lower()
+    GENERATION_CACHE_DIR = os.getenv('GENERATION_CACHE_DIR', './data/generation_cache')
+    GENERATION_CACHE_MAX_TEMPERATURE = float(os.getenv('GENERATION_CACHE_MAX_TEMPERATURE', 0.3))
+    GENERATION_CACHE_TTL = int(os.getenv('GENERATION_CACHE_TTL', 7 * 24 * 3600))
+    SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_WAIT_TIMEOUT', 30))  # followers then call upstream themselves
+    
+    # Upstream HTTP clients (Wikipedia, Smithsonian): pooled keep-alive sessions
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 16))  # connections kept per host
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))  # idempotent requests, 429/5xx and connection errors
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.3))
+    HTTP_MAX_RETRY_AFTER = float(os.getenv('HTTP_MAX_RETRY_AFTER', 5))  # longest Retry-After waited out, seconds
+    
+    # Retrieval deadlines for /api/ask context sources (seconds)
+    RETRIEVAL_WORKERS = int(os.getenv('RETRIEVAL_WORKERS', 8))
+    VECTOR_SEARCH_TIMEOUT = float(os.getenv('VECTOR_SEARCH_TIMEOUT', 1.5))
+    WIKIPEDIA_TIMEOUT = float(os.getenv('WIKIPEDIA_TIMEOUT', 4.0))
+    MUSEUM_TIMEOUT = float(os.getenv('MUSEUM_TIMEOUT', 3.0))
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     
 class DevelopmentConfig(Config):
@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for the PastPortals backend
+
+With preload_app the Flask app (and the read-only, memory-mapped FAISS
+index) is created once in the master before workers are forked, so the
+index pages are shared through the OS page cache. post_fork then resets
+the per-process state that cannot cross a fork.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', os.getenv('FLASK_PORT', 5000))}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 2))
+timeout = 120
+max_requests = 1000
+max_requests_jitter = 50
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+def post_fork(server, worker):
+    """Reset thread pools and gRPC clients inherited from the master"""
+    if preload_app:
+        from app import init_worker
+        init_worker()
@@ -2,16 +2,31 @@
 Content ingestion pipeline for populating FAISS vector database
 with worldwide historical content from Wikipedia and other sources
 """
-import requests
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from datetime import datetime
-from utils import (
+from utils.vector_utils import (
     create_vector_db,
     add_to_vector_db,
     save_vector_db,
     load_vector_db,
-    get_wikipedia_summary
+    rebuild_index,
+    backfill_tags,
+    get_index_type,
+    get_index_metric
 )
+from utils.wikipedia_utils import (
+    get_wikipedia_summary,
+    get_wikipedia_summaries,
+    get_wikipedia_plain_text,
+    WikipediaRequestError,
+    SUMMARY_BATCH_SIZE
+)
+from utils.rate_limit import TokenBucket
+from utils.chunking_utils import chunk_article
+from utils.gazetteer import get_gazetteer
 
 # Comprehensive list of historical topics to populate
 HISTORICAL_TOPICS = [
@@ -92,7 +107,23 @@ HISTORICAL_TOPICS = [
     "Renaissance humanism", "Existentialism"
 ]
 
-def fetch_wikipedia_content(topic, max_retries=3):
+INGESTION_MODES = ('summary', 'passages')
+
+# Exponential backoff for transient Wikipedia failures (seconds)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Delay before the next retry: Retry-After if the server sent one, else
+    exponential backoff with jitter so parallel workers do not retry in step
+    """
+    if retry_after:
+        return min(retry_after, BACKOFF_MAX)
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def fetch_wikipedia_content(topic, max_retries=4):
     """
     Fetch Wikipedia content for a topic
     
@@ -103,38 +134,195 @@ def fetch_wikipedia_content(topic, max_retries=3):
     Returns:
         str: Combined content or None if failed
     """
+    documents = fetch_wikipedia_documents(topic, mode='summary', max_retries=max_retries)
+    return documents[0][0] if documents else None
+
+def with_retries(fetch, label, max_retries=4, rate_limiter=None):
+    """
+    Call fetch(), retrying transient Wikipedia failures with backoff
+    
+    Args:
+        fetch: Zero-argument callable making one request
+        label: Name used in log messages
+        max_retries: Maximum number of attempts
+        rate_limiter: Optional TokenBucket, charged once per attempt
+        
+    Returns:
+        fetch() result or None if every attempt failed
+    """
     for attempt in range(max_retries):
         try:
-            # Get summary
-            summary = get_wikipedia_summary(topic)
-            
-            if not summary:
-                print(f"No summary found for: {topic}")
-                return None
-            
-            # Combine title and extract
-            content = f"# {summary['title']}\n\n{summary['extract']}"
-            
-            # Add description if available
-            if summary.get('description'):
-                content += f"\n\n**Description:** {summary['description']}"
-            
-            # Add source URL
-            content += f"\n\n**Source:** {summary['url']}"
-            
-            return content
+            if rate_limiter:
+                rate_limiter.acquire()
+            return fetch()
             
-        except Exception as e:
+        except WikipediaRequestError as e:
             if attempt < max_retries - 1:
-                print(f"Retry {attempt + 1}/{max_retries} for {topic}: {str(e)}")
-                time.sleep(2)  # Wait before retry
+                delay = backoff_delay(attempt, e.retry_after)
+                print(f"Retry {attempt + 1}/{max_retries} for {label} in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
             else:
-                print(f"Failed to fetch {topic} after {max_retries} attempts: {str(e)}")
-                return None
+                print(f"Failed to fetch {label} after {max_retries} attempts: {str(e)}")
     
     return None
 
-def populate_vector_database(topics, index_path, text_map_path, batch_size=50, delay=1.0):
+def summary_document(summary):
+    """Build the (text, metadata) document for a Wikipedia summary"""
+    # Combine title and extract
+    content = f"# {summary['title']}\n\n{summary['extract']}"
+    
+    # Add description if available
+    if summary.get('description'):
+        content += f"\n\n**Description:** {summary['description']}"
+    
+    # Add source URL
+    content += f"\n\n**Source:** {summary['url']}"
+    
+    metadata = {'title': summary['title'], 'section': 'Summary', 'url': summary['url']}
+    return content, metadata
+
+def fetch_wikipedia_documents(topic, mode='summary', max_retries=4, max_words=180, overlap_words=40,
+                              rate_limiter=None):
+    """
+    Fetch the documents to embed for a topic
+    
+    In summary mode a topic becomes one document (the REST summary lead);
+    in passages mode the full article is split into overlapping passages
+    along its sections. Rate limiting and server errors are retried with
+    exponential backoff; missing articles are not.
+    
+    Args:
+        topic: Topic name to fetch
+        mode: 'summary' or 'passages'
+        max_retries: Maximum number of attempts
+        max_words: Word budget per passage (passages mode)
+        overlap_words: Words shared by consecutive passages (passages mode)
+        rate_limiter: Optional TokenBucket shared by all fetchers
+        
+    Returns:
+        list: (text, metadata) tuples or None if failed
+    """
+    if mode == 'passages':
+        article = with_retries(
+            lambda: get_wikipedia_plain_text(topic, raise_errors=True),
+            topic, max_retries, rate_limiter
+        )
+        if not article:
+            print(f"No article text found for: {topic}")
+            return None
+        
+        return chunk_article(
+            article['title'], article['text'], article['url'],
+            max_words=max_words, overlap_words=overlap_words
+        ) or None
+    
+    summary = with_retries(
+        lambda: get_wikipedia_summary(topic, raise_errors=True),
+        topic, max_retries, rate_limiter
+    )
+    if not summary:
+        print(f"No summary found for: {topic}")
+        return None
+    
+    return [summary_document(summary)]
+
+def fetch_summary_documents(topics, max_retries=4, rate_limiter=None):
+    """
+    Fetch summary documents for a batch of topics in one request
+    
+    Args:
+        topics: Up to SUMMARY_BATCH_SIZE topic names
+        max_retries: Maximum number of attempts
+        rate_limiter: Optional TokenBucket shared by all fetchers
+        
+    Returns:
+        dict: topic -> [(text, metadata)] or None if not found
+    """
+    label = f"{len(topics)} summaries ({topics[0]}...)"
+    summaries = with_retries(
+        lambda: get_wikipedia_summaries(topics, raise_errors=True),
+        label, max_retries, rate_limiter
+    ) or {}
+    
+    documents = {}
+    for topic in topics:
+        summary = summaries.get(topic)
+        documents[topic] = [summary_document(summary)] if summary else None
+    return documents
+
+def fetch_topics(topics, mode='summary', workers=8, requests_per_second=10.0, max_words=180, overlap_words=40):
+    """
+    Fetch topics concurrently with a bounded worker pool
+    
+    All workers share one token bucket, so the pool never exceeds
+    requests_per_second against Wikipedia however many workers run.
+    Summary mode asks for SUMMARY_BATCH_SIZE topics per request.
+    
+    Args:
+        topics: List of topics to fetch
+        mode: 'summary' or 'passages'
+        workers: Maximum concurrent requests
+        requests_per_second: Sustained request rate (<= 0 disables limiting)
+        max_words: Word budget per passage (passages mode)
+        overlap_words: Words shared by consecutive passages (passages mode)
+        
+    Yields:
+        tuple: (topic, documents or None), in topic order
+    """
+    rate_limiter = TokenBucket(requests_per_second, capacity=max(1, workers))
+    
+    def fetch(topic):
+        return fetch_wikipedia_documents(
+            topic, mode=mode, max_words=max_words, overlap_words=overlap_words,
+            rate_limiter=rate_limiter
+        )
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='ingestion') as executor:
+        if mode == 'summary':
+            batches = [topics[i:i + SUMMARY_BATCH_SIZE] for i in range(0, len(topics), SUMMARY_BATCH_SIZE)]
+            fetch_batch = partial(fetch_summary_documents, rate_limiter=rate_limiter)
+            for batch, documents in zip(batches, executor.map(fetch_batch, batches)):
+                for topic in batch:
+                    yield topic, documents.get(topic)
+        else:
+            for topic, documents in zip(topics, executor.map(fetch, topics)):
+                yield topic, documents
+
+def save_batch(index, text_map, texts, metadatas, index_path, text_map_path, batch_size):
+    """
+    Embed a batch of documents into the in-memory index and persist it
+    
+    The index is loaded once and then grown in place, so each batch costs
+    one embedding pass plus an append to the document store instead of a
+    full reload. Documents are tagged with their entities (dates, people,
+    places, empires...) in their metadata first.
+    
+    Returns:
+        tuple: (index, text_map), unchanged if the batch failed
+    """
+    try:
+        get_gazetteer().tag_documents(texts, metadatas)
+        
+        if index is None:
+            index, text_map = load_vector_db(index_path, text_map_path)
+        
+        if index and text_map:
+            new_index, new_text_map = add_to_vector_db(index, text_map, texts, metadatas, batch_size=batch_size)
+        else:
+            new_index, new_text_map = create_vector_db(texts, metadatas=metadatas, batch_size=batch_size)
+        
+        if new_index and new_text_map and save_vector_db(new_index, new_text_map, index_path, text_map_path):
+            print(f"Saved {len(texts)} documents (Total: {new_index.ntotal} vectors)")
+            return new_index, new_text_map
+        
+    except Exception as e:
+        print(f"Failed to save batch: {str(e)}")
+    
+    return index, text_map
+
+def populate_vector_database(topics, index_path, text_map_path, batch_size=50, workers=8, requests_per_second=10.0,
+                             mode='summary', max_words=180, overlap_words=40, embedding_batch_size=256,
+                             gazetteer_path=None):
     """
     Populate FAISS vector database with historical content
     
@@ -143,87 +331,84 @@ def populate_vector_database(topics, index_path, text_map_path, batch_size=50, d
         index_path: Path to save FAISS index
         text_map_path: Path to save text mapping
         batch_size: Number of topics per batch
-        delay: Delay between requests (seconds)
+        workers: Concurrent Wikipedia requests
+        requests_per_second: Wikipedia request rate limit shared by all workers
+        mode: 'summary' (one lead per topic) or 'passages' (chunked full articles)
+        max_words: Word budget per passage (passages mode)
+        overlap_words: Words shared by consecutive passages (passages mode)
+        embedding_batch_size: Texts per embedding call
+        gazetteer_path: Where to save the topic and article titles learned
+            for entity tagging (optional)
         
     Returns:
         tuple: (success_count, failure_count)
     """
+    if mode not in INGESTION_MODES:
+        raise ValueError(f"Unknown ingestion mode: {mode} (expected one of {', '.join(INGESTION_MODES)})")
+    
     print("\n" + "="*60)
     print("CONTENT INGESTION PIPELINE")
     print("="*60)
     print(f"\nTotal topics to process: {len(topics)}")
+    print(f"Mode: {mode}")
     print(f"📦 Batch size: {batch_size}")
-    print(f"Delay between requests: {delay}s")
+    print(f"Workers: {workers} (max {requests_per_second:g} requests/s)")
     print(f"💾 Index will be saved to: {index_path}")
     print("\n" + "-"*60 + "\n")
     
-    all_texts = []
+    get_gazetteer().add_titles(topics)
+    
+    index, text_map = None, None
+    batch_texts = []
+    batch_metadatas = []
     success_count = 0
     failure_count = 0
+    document_count = 0
     start_time = datetime.now()
     
     # Fetch content for all topics
-    for i, topic in enumerate(topics, 1):
-        print(f"[{i}/{len(topics)}] Fetching: {topic}...", end=" ")
-        
-        content = fetch_wikipedia_content(topic)
+    fetched = fetch_topics(
+        topics, mode=mode, workers=workers, requests_per_second=requests_per_second,
+        max_words=max_words, overlap_words=overlap_words
+    )
+    for i, (topic, documents) in enumerate(fetched, 1):
+        rate = i / max((datetime.now() - start_time).total_seconds(), 1e-6)
         
-        if content:
-            all_texts.append(content)
+        if documents:
+            for text, metadata in documents:
+                batch_texts.append(text)
+                batch_metadatas.append(metadata)
+            document_count += len(documents)
             success_count += 1
-            print("OK")
+            status = f"OK ({len(documents)} passages)" if mode == 'passages' else "OK"
         else:
             failure_count += 1
-            print("FAIL")
-        
-        # Add delay to respect API rate limits
-        if i < len(topics):
-            time.sleep(delay)
+            status = "FAIL"
+        print(f"[{i}/{len(topics)}] {topic}: {status} | {rate:.1f} fetched/s")
         
         # Save intermediate results every batch_size items
         if i % batch_size == 0:
             print(f"\n💾 Intermediate save at {i} topics...")
-            if all_texts:
-                try:
-                    # Check if index exists
-                    try:
-                        index, text_map = load_vector_db(index_path, text_map_path)
-                        if index and text_map:
-                            # Add to existing index
-                            index, text_map = add_to_vector_db(index, text_map, all_texts)
-                        else:
-                            # Create new index
-                            index, text_map = create_vector_db(all_texts)
-                    except:
-                        # Create new index if load fails
-                        index, text_map = create_vector_db(all_texts)
-                    
-                    if index and text_map:
-                        save_vector_db(index, text_map, index_path, text_map_path)
-                        print(f"Saved {len(all_texts)} texts (Total: {index.ntotal} vectors)")
-                        all_texts = []  # Clear batch
-                except Exception as e:
-                    print(f"Failed to save batch: {str(e)}")
+            if batch_texts:
+                index, text_map = save_batch(
+                    index, text_map, batch_texts, batch_metadatas,
+                    index_path, text_map_path, embedding_batch_size
+                )
+                batch_texts, batch_metadatas = [], []
             print()
     
     # Final save for remaining texts
-    if all_texts:
+    if batch_texts:
         print("\n💾 Final save...")
-        try:
-            try:
-                index, text_map = load_vector_db(index_path, text_map_path)
-                if index and text_map:
-                    index, text_map = add_to_vector_db(index, text_map, all_texts)
-                else:
-                    index, text_map = create_vector_db(all_texts)
-            except:
-                index, text_map = create_vector_db(all_texts)
-            
-            if index and text_map:
-                save_vector_db(index, text_map, index_path, text_map_path)
-                print(f"Final save complete (Total: {index.ntotal} vectors)")
-        except Exception as e:
-            print(f"Failed final save: {str(e)}")
+        index, text_map = save_batch(
+            index, text_map, batch_texts, batch_metadatas,
+            index_path, text_map_path, embedding_batch_size
+        )
+        if index:
+            print(f"Final save complete (Total: {index.ntotal} vectors)")
+    
+    if gazetteer_path:
+        get_gazetteer().save_titles(gazetteer_path)
     
     # Print summary
     end_time = datetime.now()
@@ -234,13 +419,67 @@ def populate_vector_database(topics, index_path, text_map_path, batch_size=50, d
     print("="*60)
     print(f"Successful: {success_count}")
     print(f"Failed: {failure_count}")
+    print(f"Documents embedded: {document_count}")
     print(f"📈 Success rate: {(success_count/len(topics)*100):.1f}%")
     print(f"Total time: {duration:.1f}s ({duration/60:.1f} minutes)")
-    print(f"⚡ Average: {duration/len(topics):.2f}s per topic")
+    print(f"⚡ Throughput: {len(topics)/max(duration, 1e-6):.1f} topics/s")
     print("="*60 + "\n")
     
     return success_count, failure_count
 
+def train_vector_index(config):
+    """
+    Convert the ingested index to the configured ANN type and metric
+    
+    Batches are appended to a flat index during population; IVF needs the
+    full corpus to train its lists and HNSW is cheapest to build in one go,
+    so the conversion runs once at the end.
+    
+    Args:
+        config: Configuration object with paths and index settings
+        
+    Returns:
+        bool: True if the index was rebuilt and saved
+    """
+    index, text_map = load_vector_db(config.FAISS_INDEX_FILE, config.TEXT_MAP_FILE)
+    if not index or not text_map:
+        print("No vector database to train")
+        return False
+    
+    # Stores created before the tags column existed: tag them so filtered
+    # search can be used
+    tagged = backfill_tags(text_map)
+    
+    index_type = get_index_type(index)
+    same_metric = get_index_metric(index) == config.VECTOR_METRIC
+    if index_type == config.VECTOR_INDEX_TYPE and index_type in ('flat', 'hnsw') and same_metric:
+        print(f"Vector index is already {config.VECTOR_INDEX_TYPE} ({config.VECTOR_METRIC})")
+        if tagged:
+            save_vector_db(index, text_map, config.FAISS_INDEX_FILE, config.TEXT_MAP_FILE)
+        return False
+    
+    # Stores created before the vector column existed: backfill it from an
+    # exact index so quantized search can re-rank
+    if text_map.vector_count < index.ntotal and index_type in ('flat', 'hnsw'):
+        print(f"Backfilling {index.ntotal - text_map.vector_count} stored vectors...")
+        text_map.append_vectors(index.reconstruct_n(text_map.vector_count, index.ntotal - text_map.vector_count))
+    
+    print(f"\nTraining {config.VECTOR_INDEX_TYPE} index on {index.ntotal} vectors...")
+    start_time = time.perf_counter()
+    index = rebuild_index(
+        index,
+        config.VECTOR_INDEX_TYPE,
+        text_map=text_map,
+        nlist=config.IVF_NLIST or None,
+        hnsw_m=config.HNSW_M,
+        ef_construction=config.HNSW_EF_CONSTRUCTION,
+        pq_m=config.PQ_M,
+        metric=config.VECTOR_METRIC
+    )
+    saved = save_vector_db(index, text_map, config.FAISS_INDEX_FILE, config.TEXT_MAP_FILE)
+    print(f"Index training took {time.perf_counter() - start_time:.1f}s")
+    return saved
+
 def run_ingestion_pipeline(config):
     """
     Run the complete ingestion pipeline
@@ -264,11 +503,18 @@ def run_ingestion_pipeline(config):
         config.FAISS_INDEX_FILE,
         config.TEXT_MAP_FILE,
         batch_size=50,
-        delay=1.0  # 1 second delay to respect Wikipedia API
+        workers=config.INGESTION_WORKERS,
+        requests_per_second=config.WIKIPEDIA_REQUESTS_PER_SECOND,
+        mode=config.INGESTION_MODE,
+        max_words=config.PASSAGE_MAX_WORDS,
+        overlap_words=config.PASSAGE_OVERLAP_WORDS,
+        embedding_batch_size=config.EMBEDDING_BATCH_SIZE,
+        gazetteer_path=config.GAZETTEER_FILE
     )
     
     if success > 0:
         print(f"Ingestion complete! {success} topics successfully added to vector database.")
+        train_vector_index(config)
     else:
         print("Ingestion failed. No content was added.")
     
@@ -276,7 +522,20 @@ def run_ingestion_pipeline(config):
 
 if __name__ == "__main__":
     # Can be run standalone for testing
+    import argparse
     from config import get_config
     
+    parser = argparse.ArgumentParser(description='Populate the FAISS vector database')
+    parser.add_argument('--train-only', action='store_true',
+                        help='Only rebuild the existing index as VECTOR_INDEX_TYPE / VECTOR_METRIC')
+    parser.add_argument('--mode', choices=INGESTION_MODES,
+                        help='summary: one lead per topic; passages: chunked full articles (default: INGESTION_MODE)')
+    args = parser.parse_args()
+    
     config = get_config()
-    run_ingestion_pipeline(config)
+    if args.mode:
+        config.INGESTION_MODE = args.mode
+    if args.train_only:
+        train_vector_index(config)
+    else:
+        run_ingestion_pipeline(config)
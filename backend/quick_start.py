@@ -5,7 +5,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from ingestion import populate_vector_database
+from ingestion import populate_vector_database, train_vector_index
 from config import get_config
 
 # Essential topics for quick start (50 topics)
@@ -32,16 +32,24 @@ if __name__ == "__main__":
     print("QUICK START: Populating Vector Database")
     print("="*60)
     print(f"\nLoading {len(QUICK_START_TOPICS)} essential historical topics...")
-    print("This will take approximately 2-3 minutes...\n")
+    print("This will take less than a minute...\n")
     
     success, failure = populate_vector_database(
         QUICK_START_TOPICS,
         config.FAISS_INDEX_FILE,
         config.TEXT_MAP_FILE,
         batch_size=25,
-        delay=0.5  # Faster for quick start
+        workers=config.INGESTION_WORKERS,
+        requests_per_second=config.WIKIPEDIA_REQUESTS_PER_SECOND,
+        mode=config.INGESTION_MODE,
+        max_words=config.PASSAGE_MAX_WORDS,
+        overlap_words=config.PASSAGE_OVERLAP_WORDS,
+        embedding_batch_size=config.EMBEDDING_BATCH_SIZE
     )
     
+    if success:
+        train_vector_index(config)
+    
     print(f"\nQuick start complete!")
     print(f"   Successfully loaded: {success}/{len(QUICK_START_TOPICS)} topics")
     print(f"   You can now restart the backend server.\n")
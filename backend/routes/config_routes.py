@@ -29,6 +29,8 @@ def health():
             "ai_configured": true,
             "services": {
                 "gemini_ai": true,
+                "gemini_setup": "ready",
+                "gemini_model": "models/gemini-1.5-flash",
                 "wikipedia": true,
                 "embeddings": true,
                 "vector_db": true,
@@ -37,10 +39,11 @@ def health():
             "version": "2.0.0"
         }
     """
-    from utils.ai_utils import is_gemini_configured
+    from utils.ai_utils import is_gemini_configured, get_gemini_setup_status
     from config import get_config
     
     cfg = get_config()
+    gemini_setup = get_gemini_setup_status()
     vector_db_exists = vector_index is not None and text_map is not None
     vector_count = vector_index.ntotal if vector_db_exists else 0
     
@@ -53,6 +56,8 @@ def health():
         'ai_configured': is_gemini_configured(),
         'services': {
             'gemini_ai': is_gemini_configured(),
+            'gemini_setup': gemini_setup['state'],
+            'gemini_model': gemini_setup['model'],
             'wikipedia': True,
             'embeddings': embeddings_enabled,
             'vector_db': vector_db_exists,
@@ -66,24 +71,34 @@ def health():
 @config_bp.route('/configure', methods=['POST'])
 def configure_api():
     """
-    Configure Gemini AI API key
+    Configure Gemini AI API key(s)
+    
+    Keys are added to the key pool; a key configured earlier keeps serving
+    requests alongside the new one.
     
     Expected JSON:
         {
-            "api_key": "your-gemini-api-key"
+            "api_key": "your-gemini-api-key",
+            "api_keys": ["another-key", "key:model-name"]  (optional)
         }
         
     Returns:
         {
             "message": "API configured successfully",
-            "ai_enabled": true
+            "ai_enabled": true,
+            "pool_size": 2
         }
     """
-    from utils.ai_utils import setup_gemini
+    from utils.ai_utils import setup_gemini, add_api_keys
+    from utils.gemini_pool import get_key_pool
     
     try:
         data = request.get_json()
         api_key = data.get('api_key', '').strip()
+        extra_keys = [key for key in data.get('api_keys') or [] if isinstance(key, str) and key.strip()]
+        
+        if not api_key and extra_keys:
+            api_key, extra_keys = extra_keys[0].partition(':')[0].strip(), extra_keys[1:]
         
         if not api_key:
             return jsonify({'error': 'API key is required'}), 400
@@ -92,9 +107,12 @@ def configure_api():
         success = setup_gemini(api_key)
         
         if success:
+            if extra_keys:
+                add_api_keys(extra_keys)
             return jsonify({
                 'message': 'API configured successfully',
                 'ai_enabled': True,
+                'pool_size': len(get_key_pool()),
                 'timestamp': datetime.now().isoformat()
             })
         else:
@@ -116,8 +134,15 @@ def get_status():
     Returns:
         Comprehensive system status information
     """
-    from utils.vector_utils import get_vector_db_stats
-    from utils.ai_utils import get_embeddings_model, is_gemini_configured
+    from utils.vector_utils import get_vector_db_stats, get_retrieval_stats
+    from utils.ai_utils import get_embeddings_model, is_gemini_configured, get_gemini_setup_status
+    from utils.http_client import get_http_stats
+    from utils.cache_utils import get_cache_stats
+    from utils.singleflight import get_singleflight_stats
+    from utils.semantic_cache import get_semantic_cache_stats
+    from utils.gemini_dispatcher import get_dispatcher_stats
+    from utils.gemini_pool import get_key_pool_stats
+    from utils.reranker import get_rerank_stats
     
     try:
         vector_stats = get_vector_db_stats(vector_index, text_map) if vector_index else {
@@ -138,18 +163,26 @@ def get_status():
             },
             'ai': {
                 'gemini_configured': is_gemini_configured(),
+                'gemini_setup': get_gemini_setup_status(),
                 'embeddings_loaded': embeddings is not None,
-                'model': 'all-mpnet-base-v2' if embeddings else None
+                'model': 'all-mpnet-base-v2' if embeddings else None,
+                'gemini_dispatcher': get_dispatcher_stats(),
+                'key_pool': get_key_pool_stats()
             },
             'database': {
                 'vector_db': vector_stats,
-                'total_documents': vector_stats['text_entries']
+                'total_documents': vector_stats['text_entries'],
+                'retrieval': get_retrieval_stats(),
+                'rerank': get_rerank_stats()
             },
             'apis': {
                 'wikipedia': {'status': 'available', 'rate_limit': None},
                 'smithsonian': {'status': 'available', 'requires_key': False},
-                'europeana': {'status': 'requires_registration'}
+                'europeana': {'status': 'requires_registration'},
+                'connections': get_http_stats()
             },
+            'cache': {**get_cache_stats(), 'semantic': get_semantic_cache_stats()},
+            'coalescing': get_singleflight_stats(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -1,44 +1,366 @@
 """
 Q&A routes for historical questions
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from datetime import datetime
 import asyncio
+import json
+import time
 
 qa_bp = Blueprint('qa', __name__)
 
 # Global state (will be set by main app)
 vector_index = None
 text_map = None
+lexical_index = None
 smithsonian_api_key = None
+retrieval_executor = None
 
-def set_vector_db(index, t_map):
-    """Set vector database for this blueprint"""
-    global vector_index, text_map
+def set_vector_db(index, t_map, lexical=None):
+    """Set vector database (and its BM25 index) for this blueprint"""
+    global vector_index, text_map, lexical_index
     vector_index = index
     text_map = t_map
+    lexical_index = lexical
 
 def set_museum_api_key(key):
     """Set museum API key"""
     global smithsonian_api_key
     smithsonian_api_key = key
 
-async def get_ai_response(question):
+def get_retrieval_executor():
+    """Get the shared thread pool used for blocking retrieval calls"""
+    global retrieval_executor
+    if retrieval_executor is None:
+        from config import get_config
+        retrieval_executor = ThreadPoolExecutor(
+            max_workers=get_config().RETRIEVAL_WORKERS,
+            thread_name_prefix='retrieval'
+        )
+    return retrieval_executor
+
+def reset_retrieval_executor():
+    """Drop the retrieval thread pool (threads do not survive a fork)"""
+    global retrieval_executor
+    retrieval_executor = None
+
+def call_with_deadline(deadline, func, *args, **kwargs):
+    """Call func with its upstream HTTP requests bounded by deadline (time.monotonic())"""
+    from utils.http_client import request_deadline
+    
+    with request_deadline(deadline):
+        return func(*args, **kwargs)
+
+async def run_retrieval_stage(func, timeout, *args, **kwargs):
+    """
+    Run a blocking retrieval call in the thread pool under a deadline
+    
+    The deadline also bounds the call's upstream HTTP requests (timeout cut
+    to the time left, no retries), so a stage that timed out frees its
+    worker soon after instead of finishing a request nobody waits for, and
+    a stage that only starts after its deadline (pool saturated) returns
+    without sending one.
+    
+    Args:
+        func: Blocking callable returning the stage result
+        timeout: Deadline in seconds
+        
+    Returns:
+        tuple: (result or None, stage report dict)
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    result = None
+    
+    try:
+        call = partial(call_with_deadline, deadline, func, *args, **kwargs)
+        result = await asyncio.wait_for(loop.run_in_executor(get_retrieval_executor(), call), timeout=timeout)
+        status = 'ok' if result else 'empty'
+    except asyncio.TimeoutError:
+        status = 'timeout'
+    except Exception as e:
+        print(f"Retrieval stage {getattr(func, '__name__', func)} failed: {str(e)}")
+        status = 'error'
+    
+    return result, {
+        'used': status == 'ok',
+        'status': status,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        'timeout_ms': int(timeout * 1000)
+    }
+
+def get_search_params(overrides=None):
+    """
+    Merge per-request ANN search parameters over the configured defaults
+    
+    Args:
+        overrides: Optional dict with ef_search, nprobe and/or rerank_factor
+        
+    Returns:
+        dict: ef_search, nprobe and rerank_factor for search_vector_db
+    """
+    from config import get_config
+    
+    cfg = get_config()
+    params = {'ef_search': cfg.HNSW_EF_SEARCH, 'nprobe': cfg.IVF_NPROBE, 'rerank_factor': cfg.RERANK_FACTOR}
+    overrides = overrides if isinstance(overrides, dict) else {}
+    for key in params:
+        value = overrides.get(key)
+        if isinstance(value, int) and 0 < value <= (64 if key == 'rerank_factor' else 4096):
+            params[key] = value
+    return params
+
+def get_min_score(overrides=None):
+    """Get the context similarity cut-off, optionally overridden per request"""
+    from config import get_config
+    
+    value = overrides.get('min_score') if isinstance(overrides, dict) else None
+    if isinstance(value, (int, float)) and -1.0 <= value <= 1.0:
+        return float(value)
+    return get_config().MIN_CONTEXT_SIMILARITY
+
+def format_passage(text, metadata):
+    """Label a retrieved passage with its source so the model can cite it"""
+    url = metadata.get('url')
+    if url and url not in text:
+        return f"{text}\nSource: {url}"
+    return text
+
+def get_retrievers(overrides=None):
+    """
+    Retrievers to use for a request
+    
+    Args:
+        overrides: Optional dict whose "retrievers" lists "dense" and/or "lexical"
+        
+    Returns:
+        list: Retriever names (SEARCH_RETRIEVERS unless overridden)
+    """
+    from config import get_config
+    from utils.vector_utils import RETRIEVERS
+    
+    value = overrides.get('retrievers') if isinstance(overrides, dict) else None
+    if isinstance(value, list):
+        retrievers = [name for name in value if name in RETRIEVERS]
+        if retrievers:
+            return retrievers
+    return get_config().SEARCH_RETRIEVERS
+
+def get_rerank_enabled(overrides=None):
+    """Whether to re-rank passages with the cross-encoder (RERANK_ENABLED unless overridden)"""
+    from config import get_config
+    
+    value = overrides.get('rerank') if isinstance(overrides, dict) else None
+    return value if isinstance(value, bool) else get_config().RERANK_ENABLED
+
+def get_search_filter(question, overrides=None):
+    """
+    Era / category filter for a question
+    
+    An explicit "filters" object in the request's search_params wins;
+    otherwise the filter is inferred from the dates, centuries or era words
+    in the question (INFER_SEARCH_FILTERS).
+    
+    Returns:
+        tuple: (filter or None, whether it was inferred)
+    """
+    from config import get_config
+    from utils.doc_filters import filter_from_request, infer_filter
+    
+    if isinstance(overrides, dict) and 'filters' in overrides:
+        return filter_from_request(overrides['filters']), False
+    if get_config().INFER_SEARCH_FILTERS:
+        return infer_filter(question), True
+    return None, False
+
+def search_knowledge_base(question, search_params=None):
+    """
+    Search the knowledge base and join the best passages into one context block
+    
+    Dense and BM25 results are fused (see hybrid_search); the request's
+    search_params can choose the retrievers. With re-ranking on,
+    RERANK_CANDIDATES passages are fetched and the cross-encoder keeps the
+    best CONTEXT_TOP_K within RERANK_BUDGET_MS.
+    """
+    from config import get_config
+    from utils.reranker import rerank
+    from utils.vector_utils import hybrid_search
+    
+    cfg = get_config()
+    use_rerank = get_rerank_enabled(search_params)
+    fetch_k = max(cfg.CONTEXT_TOP_K, cfg.RERANK_CANDIDATES) if use_rerank else cfg.CONTEXT_TOP_K
+    search_filter, inferred = get_search_filter(question, search_params)
+    search = partial(
+        hybrid_search, question, vector_index, text_map, lexical_index=lexical_index, k=fetch_k,
+        retrievers=get_retrievers(search_params), min_score=get_min_score(search_params),
+        rrf_k=cfg.RRF_K, depth=cfg.FUSION_DEPTH, exact_filter_max=cfg.EXACT_FILTER_MAX,
+        **get_search_params(search_params)
+    )
+    results = search(filters=search_filter)
+    if search_filter and inferred and len(results) < cfg.CONTEXT_TOP_K:
+        # An inferred era is a hint, not a constraint: top up from the whole corpus
+        seen = {doc_id for _, _, doc_id in results}
+        results += [result for result in search() if result[2] not in seen][:fetch_k - len(results)]
+    if use_rerank:
+        results, _ = rerank(
+            question, results, cfg.CONTEXT_TOP_K, budget_ms=cfg.RERANK_BUDGET_MS,
+            batch_size=cfg.RERANK_BATCH_SIZE, min_score=cfg.RERANK_MIN_SCORE
+        )
+    if not results:
+        return None
+    
+    return "\n\n".join(format_passage(text, text_map.get_metadata(doc_id)) for text, _, doc_id in results)
+
+def search_museum_artifacts(question):
+    """Search museum collections, returning None when nothing was found"""
+    from utils.museum_utils import search_multiple_museums
+    
+    museum_results = search_multiple_museums(
+        question,
+        api_key=smithsonian_api_key,
+        limit_per_source=3
+    )
+    return museum_results if museum_results['total_count'] > 0 else None
+
+async def gather_context(question, search_params=None):
+    """
+    Fetch knowledge base, Wikipedia and museum context concurrently
+    
+    Each source runs under its own deadline; a source that misses it is
+    dropped from the prompt instead of holding up the answer.
+    
+    Args:
+        question: User's question string
+        search_params: Optional ANN overrides (ef_search, nprobe)
+        
+    Returns:
+        dict: relevant_context, wikipedia_info, museum_data, sources, retrieval_ms
+    """
+    from config import get_config
+    from utils.wikipedia_utils import search_and_summarize
+    
+    cfg = get_config()
+    start = time.perf_counter()
+    
+    stages = {
+        'wikipedia': run_retrieval_stage(search_and_summarize, cfg.WIKIPEDIA_TIMEOUT, question),
+        'museums': run_retrieval_stage(search_museum_artifacts, cfg.MUSEUM_TIMEOUT, question)
+    }
+    if vector_index and text_map:
+        stages['vector_db'] = run_retrieval_stage(
+            search_knowledge_base, cfg.VECTOR_SEARCH_TIMEOUT, question, search_params
+        )
+    
+    results = dict(zip(stages.keys(), await asyncio.gather(*stages.values())))
+    sources = {name: report for name, (_, report) in results.items()}
+    if 'vector_db' not in sources:
+        sources['vector_db'] = {'used': False, 'status': 'disabled', 'elapsed_ms': 0.0}
+    
+    return {
+        'relevant_context': results['vector_db'][0] if 'vector_db' in results else None,
+        'wikipedia_info': results['wikipedia'][0],
+        'museum_data': results['museums'][0],
+        'sources': sources,
+        'retrieval_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
+
+def run_async(coro):
+    """Run a coroutine to completion on a fresh event loop"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def format_sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Fields of a generated answer kept in the answer cache
+CACHED_ANSWER_FIELDS = ('response', 'source', 'wikipedia_info', 'museum_data', 'context_used', 'context_sources')
+
+def answer_cache_key(question, search_params=None):
+    """Answer cache key: whitespace/case-normalised question plus search overrides"""
+    normalized = ' '.join(question.lower().split())
+    return ('answer', normalized, json.dumps(search_params or {}, sort_keys=True))
+
+def get_cached_answer(question, search_params=None, bypass=False):
+    """
+    Look up a previously generated answer
+    
+    The exact answer cache (shared across workers) is tried first, then the
+    semantic cache for near-duplicate questions.
+    
+    Args:
+        question: User's question string
+        search_params: Request search overrides (answers are kept per overrides)
+        bypass: Skip both caches (the fresh answer is still stored)
+    
+    Returns:
+        dict: Cached result fields plus "cached" ("exact" or "semantic"), or None
+    """
+    from utils.cache_utils import MISSING, get_cache
+    from utils.semantic_cache import get_semantic_cache
+    
+    semantic_cache = get_semantic_cache()
+    if bypass:
+        if semantic_cache is not None:
+            semantic_cache.record_bypass()
+        return None
+    
+    cached = get_cache('answers').get(answer_cache_key(question, search_params))
+    if cached is not MISSING and cached:
+        return {**cached, 'cached': 'exact'}
+    
+    if semantic_cache is not None:
+        try:
+            payload, similarity = semantic_cache.get(question, partition=answer_cache_key('', search_params)[2])
+            if payload:
+                return {**payload, 'cached': 'semantic', 'similarity': round(similarity, 3)}
+        except Exception as e:
+            print(f"Semantic cache lookup error: {str(e)}")
+    return None
+
+def store_answer(question, search_params, result, generation_ms=0.0):
+    """Cache an AI-generated answer in both caches; fallback answers are not cached"""
+    from config import get_config
+    from utils.cache_utils import get_cache
+    from utils.semantic_cache import get_semantic_cache
+    
+    if result.get('source') != 'ai':
+        return
+    
+    entry = {field: result.get(field) for field in CACHED_ANSWER_FIELDS}
+    key = answer_cache_key(question, search_params)
+    get_cache('answers').set(key, entry, ttl=get_config().ANSWER_CACHE_TTL)
+    
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        try:
+            semantic_cache.set(question, entry, partition=key[2], generation_ms=generation_ms)
+        except Exception as e:
+            print(f"Semantic cache store error: {str(e)}")
+
+async def get_ai_response(question, search_params=None, bypass_cache=False):
     """
     Get comprehensive AI response for historical question
     
     Args:
         question: User's question string
+        search_params: Optional ANN overrides (ef_search, nprobe)
+        bypass_cache: Generate a fresh answer even if one is cached
         
     Returns:
         dict: Response with answer, source, and metadata
     """
     # Import only when function is called
-    from utils.history_utils import is_historical_question, generate_history_prompt
-    from utils.vector_utils import search_vector_db
-    from utils.wikipedia_utils import search_and_summarize
-    from utils.museum_utils import search_multiple_museums
-    from utils.ai_utils import is_gemini_configured, generate_content
+    from utils.history_utils import is_historical_question, generate_history_prompt, generate_fallback_response
+    from utils.ai_utils import is_gemini_configured, generate_content, GeminiBusyError
     
     # Check if question is historical
     if not is_historical_question(question):
@@ -49,28 +371,16 @@ async def get_ai_response(question):
             'museum_data': None
         }
     
-    # Get context from vector database
-    relevant_context = None
-    if vector_index and text_map:
-        contexts = search_vector_db(question, vector_index, text_map, k=3)
-        if contexts:
-            relevant_context = "\n\n".join(contexts)
-    
-    # Get Wikipedia information
-    wikipedia_info = search_and_summarize(question)
+    cached = get_cached_answer(question, search_params, bypass=bypass_cache)
+    if cached:
+        return {**cached, 'timings': {}}
     
-    # Get museum artifacts (optional, don't block on failure)
-    museum_data = None
-    try:
-        museum_results = search_multiple_museums(
-            question,
-            api_key=smithsonian_api_key,
-            limit_per_source=3
-        )
-        if museum_results['total_count'] > 0:
-            museum_data = museum_results
-    except Exception as e:
-        print(f"Museum search failed: {str(e)}")
+    # Get context from vector database, Wikipedia and museums in parallel
+    context = await gather_context(question, search_params)
+    relevant_context = context['relevant_context']
+    wikipedia_info = context['wikipedia_info']
+    museum_data = context['museum_data']
+    timings = {'retrieval_ms': context['retrieval_ms']}
     
     # Try AI response if configured
     if is_gemini_configured():
@@ -82,16 +392,24 @@ async def get_ai_response(question):
                 museum_data
             )
             
+            generation_start = time.perf_counter()
             ai_response = generate_content(prompt, temperature=0.7, max_tokens=2048)
+            timings['generation_ms'] = round((time.perf_counter() - generation_start) * 1000, 1)
             
             if ai_response:
-                return {
+                result = {
                     'response': ai_response,
                     'source': 'ai',
                     'wikipedia_info': wikipedia_info,
                     'museum_data': museum_data,
-                    'context_used': relevant_context is not None
+                    'context_used': relevant_context is not None,
+                    'context_sources': context['sources'],
+                    'timings': timings
                 }
+                store_answer(question, search_params, result, generation_ms=timings['generation_ms'])
+                return result
+        except GeminiBusyError:
+            raise
         except Exception as e:
             print(f" AI response error: {str(e)}")
     
@@ -102,9 +420,129 @@ async def get_ai_response(question):
         'source': 'fallback',
         'wikipedia_info': wikipedia_info,
         'museum_data': museum_data,
-        'context_used': relevant_context is not None
+        'context_used': relevant_context is not None,
+        'context_sources': context['sources'],
+        'timings': timings
     }
 
+def stream_ai_response(question, search_params=None, bypass_cache=False):
+    """
+    Stream the answer to a historical question as Server-Sent Events
+    
+    Sends a "context" event with the retrieved sources as soon as retrieval
+    finishes, "token" events as Gemini produces text, and a final "done"
+    event carrying the source and timing fields.
+    
+    Args:
+        question: User's question string
+        search_params: Optional ANN overrides (ef_search, nprobe)
+        bypass_cache: Generate a fresh answer even if one is cached
+        
+    Yields:
+        str: SSE-formatted messages
+    """
+    from utils.history_utils import is_historical_question, generate_history_prompt, generate_fallback_response
+    from utils.ai_utils import (
+        is_gemini_configured, generate_content_stream, GeminiBusyError, GenerationInterruptedError
+    )
+    
+    start = time.perf_counter()
+    
+    try:
+        if not is_historical_question(question):
+            result = run_async(get_ai_response(question))
+            yield format_sse('token', {'text': result['response']})
+            yield format_sse('done', {
+                'question': question,
+                'source': result['source'],
+                'timings': {'total_ms': round((time.perf_counter() - start) * 1000, 1)},
+                'timestamp': datetime.now().isoformat()
+            })
+            return
+        
+        cached = get_cached_answer(question, search_params, bypass=bypass_cache)
+        if cached:
+            yield format_sse('context', {
+                'question': question,
+                'wikipedia_info': cached['wikipedia_info'],
+                'museum_data': cached['museum_data'],
+                'context_used': cached['context_used'],
+                'context_sources': cached['context_sources']
+            })
+            yield format_sse('token', {'text': cached['response']})
+            yield format_sse('done', {
+                'question': question,
+                'source': cached['source'],
+                'cached': cached['cached'],
+                'timings': {'total_ms': round((time.perf_counter() - start) * 1000, 1)},
+                'timestamp': datetime.now().isoformat()
+            })
+            return
+        
+        context = run_async(gather_context(question, search_params))
+        relevant_context = context['relevant_context']
+        wikipedia_info = context['wikipedia_info']
+        timings = {'retrieval_ms': context['retrieval_ms']}
+        
+        yield format_sse('context', {
+            'question': question,
+            'wikipedia_info': wikipedia_info,
+            'museum_data': context['museum_data'],
+            'context_used': relevant_context is not None,
+            'context_sources': context['sources']
+        })
+        
+        source = 'fallback'
+        if is_gemini_configured():
+            prompt = generate_history_prompt(
+                question,
+                relevant_context,
+                wikipedia_info,
+                context['museum_data']
+            )
+            
+            generation_start = time.perf_counter()
+            chunks = []
+            for text in generate_content_stream(prompt, temperature=0.7, max_tokens=2048):
+                if source != 'ai':
+                    source = 'ai'
+                    timings['first_token_ms'] = round((time.perf_counter() - start) * 1000, 1)
+                chunks.append(text)
+                yield format_sse('token', {'text': text})
+            timings['generation_ms'] = round((time.perf_counter() - generation_start) * 1000, 1)
+            
+            if source == 'ai':
+                store_answer(question, search_params, {
+                    'response': ''.join(chunks),
+                    'source': source,
+                    'wikipedia_info': wikipedia_info,
+                    'museum_data': context['museum_data'],
+                    'context_used': relevant_context is not None,
+                    'context_sources': context['sources']
+                }, generation_ms=timings['generation_ms'])
+        
+        if source == 'fallback':
+            yield format_sse('token', {
+                'text': generate_fallback_response(question, relevant_context, wikipedia_info)
+            })
+        
+        timings['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        yield format_sse('done', {
+            'question': question,
+            'source': source,
+            'timings': timings,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except GeminiBusyError as e:
+        yield format_sse('error', {'error': str(e), 'retry_after': e.retry_after})
+    except GenerationInterruptedError as e:
+        # The tokens already sent are an incomplete answer; it is not cached
+        yield format_sse('error', {'error': str(e), 'partial': True})
+    except Exception as e:
+        print(f"Streaming question error: {str(e)}")
+        yield format_sse('error', {'error': f'Failed to process question: {str(e)}'})
+
 @qa_bp.route('/ask', methods=['POST'])
 def ask_question():
     """
@@ -112,7 +550,13 @@ def ask_question():
     
     Expected JSON:
         {
-            "question": "What was the significance of the Roman Empire?"
+            "question": "What was the significance of the Roman Empire?",
+            "search_params": {"ef_search": 128, "nprobe": 16, "min_score": 0.4,
+                              "filters": {"era": "medieval_period", "categories": ["wars_conflicts"],
+                                          "years": [1200, 1300]},
+                              "retrievers": ["dense", "lexical"], "rerank": true},  (optional; without "filters"
+                              the era is inferred from the question)
+            "bypass_cache": false  (optional; true always generates a fresh answer)
         }
         
     Returns:
@@ -122,9 +566,15 @@ def ask_question():
             "source": "ai|fallback|filter",
             "wikipedia_info": {...},
             "museum_data": {...},
+            "context_sources": {"wikipedia": {"used": true, "status": "ok", "elapsed_ms": 412.0}, ...},
+            "cached": false | "exact" | "semantic",
+            "similarity": null  (question similarity for semantic cache hits),
+            "timings": {"retrieval_ms": 415.2, "generation_ms": 5210.7},
             "timestamp": "..."
         }
     """
+    from utils.gemini_dispatcher import GeminiBusyError
+    
     try:
         data = request.get_json()
         question = data.get('question', '').strip()
@@ -132,14 +582,14 @@ def ask_question():
         if not question:
             return jsonify({'error': 'Question is required'}), 400
         
-        # Get AI response
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        search_params = data.get('search_params')
+        bypass_cache = bool(data.get('bypass_cache', False))
         
-        try:
-            result = loop.run_until_complete(get_ai_response(question))
-        finally:
-            loop.close()
+        if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return sse_response(question, search_params, bypass_cache)
+        
+        # Get AI response
+        result = run_async(get_ai_response(question, search_params, bypass_cache))
         
         response = {
             'question': question,
@@ -148,15 +598,65 @@ def ask_question():
             'wikipedia_info': result.get('wikipedia_info'),
             'museum_data': result.get('museum_data'),
             'context_used': result.get('context_used', False),
+            'context_sources': result.get('context_sources', {}),
+            'cached': result.get('cached', False),
+            'similarity': result.get('similarity'),
+            'timings': result.get('timings', {}),
             'timestamp': datetime.now().isoformat()
         }
         
         return jsonify(response)
         
+    except GeminiBusyError:
+        raise  # 503 from the app error handler
     except Exception as e:
         print(f"Question processing error: {str(e)}")
         return jsonify({'error': f'Failed to process question: {str(e)}'}), 500
 
+@qa_bp.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """
+    Streaming question answering endpoint (Server-Sent Events)
+    
+    Same request body as /ask (also available as /ask?stream=1).
+    
+    Events:
+        context: {"wikipedia_info": {...}, "museum_data": {...}, "context_sources": {...}}
+        token:   {"text": "..."}  (repeated)
+        done:    {"source": "ai|fallback|filter", "cached": "exact|semantic" (cache hits only), "timings": {...}, "timestamp": "..."}
+        error:   {"error": "...", "retry_after": 3 (when Gemini is busy)}
+    """
+    data = request.get_json(silent=True) or {}
+    question = data.get('question', '').strip()
+    
+    if not question:
+        return jsonify({'error': 'Question is required'}), 400
+    
+    return sse_response(question, data.get('search_params'), bool(data.get('bypass_cache', False)))
+
+def sse_response(question, search_params=None, bypass_cache=False):
+    """Wrap the answer stream in an unbuffered text/event-stream response"""
+    return Response(
+        stream_with_context(stream_ai_response(question, search_params, bypass_cache)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+# Upper bound for POST /quick-facts
+MAX_BULK_TOPICS = 50
+
+def format_quick_facts(wikipedia_info):
+    """Quick-facts fields from a Wikipedia summary"""
+    return {
+        'summary': wikipedia_info.get('extract', ''),
+        'description': wikipedia_info.get('description', ''),
+        'thumbnail': wikipedia_info.get('thumbnail', ''),
+        'url': wikipedia_info.get('url', '')
+    }
+
 @qa_bp.route('/quick-facts/<topic>', methods=['GET'])
 def quick_facts(topic):
     """
@@ -169,6 +669,8 @@ def quick_facts(topic):
         Quick summary and key facts
     """
     try:
+        from utils.wikipedia_utils import search_and_summarize
+        
         # Get Wikipedia summary
         wikipedia_info = search_and_summarize(topic)
         
@@ -177,10 +679,53 @@ def quick_facts(topic):
         
         return jsonify({
             'topic': topic,
-            'summary': wikipedia_info.get('extract', ''),
-            'description': wikipedia_info.get('description', ''),
-            'thumbnail': wikipedia_info.get('thumbnail', ''),
-            'url': wikipedia_info.get('url', ''),
+            **format_quick_facts(wikipedia_info),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to retrieve facts: {str(e)}'}), 500
+
+@qa_bp.route('/quick-facts', methods=['POST'])
+def bulk_quick_facts():
+    """
+    Get quick facts for several topics at once
+    
+    Topics are looked up as page titles (following redirects) in batches
+    of 20 per Wikipedia request, instead of one search plus one summary
+    call per topic.
+    
+    Expected JSON:
+        {
+            "topics": ["Roman Empire", "Taj Mahal", ...]  (max 50)
+        }
+    
+    Returns:
+        Facts per topic, plus the topics that were not found
+    """
+    try:
+        from utils.wikipedia_utils import get_wikipedia_summaries
+        
+        data = request.get_json(silent=True) or {}
+        topics = data.get('topics')
+        
+        if not isinstance(topics, list) or not topics:
+            return jsonify({'error': 'topics must be a non-empty list'}), 400
+        
+        topics = [str(topic).strip() for topic in topics if str(topic).strip()]
+        if len(topics) > MAX_BULK_TOPICS:
+            return jsonify({'error': f'At most {MAX_BULK_TOPICS} topics per request'}), 400
+        
+        summaries = get_wikipedia_summaries(topics)
+        facts = {
+            topic: format_quick_facts(summary) if summary else None
+            for topic, summary in summaries.items()
+        }
+        
+        return jsonify({
+            'facts': facts,
+            'found': sum(1 for fact in facts.values() if fact),
+            'missing': [topic for topic, fact in facts.items() if not fact],
             'timestamp': datetime.now().isoformat()
         })
         
@@ -26,7 +26,7 @@ def summarize_text():
             "timestamp": "..."
         }
     """
-    from utils.ai_utils import is_gemini_configured, generate_content
+    from utils.ai_utils import is_gemini_configured, generate_content, GeminiBusyError
     
     try:
         data = request.get_json()
@@ -91,6 +91,8 @@ def summarize_text():
             'timestamp': datetime.now().isoformat()
         })
         
+    except GeminiBusyError:
+        raise  # 503 from the app error handler
     except Exception as e:
         print(f" Summarization error: {str(e)}")
         return jsonify({'error': f'Summarization failed: {str(e)}'}), 500
@@ -113,7 +115,7 @@ def extract_key_points():
             "timestamp": "..."
         }
     """
-    from utils.ai_utils import is_gemini_configured, generate_content
+    from utils.ai_utils import is_gemini_configured, generate_content, GeminiBusyError
     
     try:
         data = request.get_json()
@@ -146,7 +148,7 @@ def extract_key_points():
         Key Points:
         """
         
-        response = generate_content(prompt, temperature=0.3, max_tokens=512)
+        response = generate_content(prompt, temperature=0.3, max_tokens=512, cache=True)
         
         if not response:
             return jsonify({'error': 'Key point extraction failed'}), 500
@@ -162,6 +164,8 @@ def extract_key_points():
             'timestamp': datetime.now().isoformat()
         })
         
+    except GeminiBusyError:
+        raise  # 503 from the app error handler
     except Exception as e:
         print(f" Key point extraction error: {str(e)}")
         return jsonify({'error': f'Extraction failed: {str(e)}'}), 500
@@ -49,7 +49,7 @@ def translate_text():
             "timestamp": "..."
         }
     """
-    from utils.ai_utils import is_gemini_configured, generate_content
+    from utils.ai_utils import is_gemini_configured, generate_content, GeminiBusyError
     
     try:
         data = request.get_json()
@@ -101,7 +101,7 @@ def translate_text():
         """
         
         # Get translation from AI
-        translated = generate_content(prompt, temperature=0.3, max_tokens=2048)
+        translated = generate_content(prompt, temperature=0.3, max_tokens=2048, cache=True)
         
         if not translated:
             return jsonify({'error': 'Translation failed - empty response from AI'}), 500
@@ -113,6 +113,8 @@ def translate_text():
             'timestamp': datetime.now().isoformat()
         })
         
+    except GeminiBusyError:
+        raise  # 503 from the app error handler
     except Exception as e:
         print(f" Translation error: {str(e)}")
         return jsonify({'error': f'Translation failed: {str(e)}'}), 500
@@ -153,7 +155,7 @@ def detect_language():
             "confidence": "high|medium|low"
         }
     """
-    from utils.ai_utils import is_gemini_configured, generate_content
+    from utils.ai_utils import is_gemini_configured, generate_content, GeminiBusyError
     
     try:
         data = request.get_json()
@@ -175,7 +177,7 @@ def detect_language():
         Language:
         """
         
-        detected = generate_content(prompt, temperature=0.1, max_tokens=50)
+        detected = generate_content(prompt, temperature=0.1, max_tokens=50, cache=True)
         
         if detected:
             language_name = detected.strip()
@@ -187,6 +189,8 @@ def detect_language():
         
         return jsonify({'error': 'Failed to detect language'}), 500
         
+    except GeminiBusyError:
+        raise  # 503 from the app error handler
     except Exception as e:
         print(f" Language detection error: {str(e)}")
         return jsonify({'error': f'Detection failed: {str(e)}'}), 500
\ No newline at end of file
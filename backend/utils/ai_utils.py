@@ -3,7 +3,15 @@ Core AI utilities for Gemini integration and embeddings
 """
 import google.generativeai as genai
 from functools import lru_cache
+import hashlib
+import json
 import os
+import threading
+import time
+
+from .gemini_dispatcher import GeminiBusyError, get_dispatcher
+from .gemini_pool import get_key_pool
+from .singleflight import coalesced
 
 # Configure warnings
 os.environ['HF_HUB_DISABLE_SYMLINKS_WARNING'] = '1'
@@ -12,6 +20,22 @@ os.environ['HF_HUB_DOWNLOAD_TIMEOUT'] = '600'
 # Global AI state
 gemini_model = None
 api_key_configured = False
+configured_api_key = None
+generation_cache = None
+generation_cache_lock = threading.Lock()
+model_cache_lock = threading.Lock()
+gemini_setup = {'state': 'not_configured', 'model': None, 'source': None, 'seconds': None, 'error': None}
+pending_setup = None  # (api_key, extra_keys) while a background setup runs
+
+# Errors meaning a cached model name can no longer be used with its key
+STALE_MODEL_ERRORS = frozenset(['NotFound', 'PermissionDenied', 'Unauthenticated', 'InvalidArgument'])
+
+# Finish reasons of a stream that ended normally (MAX_TOKENS is the
+# caller's own limit)
+COMPLETE_FINISH_REASONS = frozenset(['STOP', 'MAX_TOKENS'])
+
+class GenerationInterruptedError(Exception):
+    """Raised when a stream stops early (error or safety stop) after some text was sent"""
 
 @lru_cache(maxsize=1)
 def get_embeddings_model(model_name="sentence-transformers/all-mpnet-base-v2"):
@@ -41,18 +65,33 @@ def get_embeddings_model(model_name="sentence-transformers/all-mpnet-base-v2"):
         print(" Note: App will still work using online sources")
         return None
 
-def setup_gemini(api_key, models_to_try=None):
+def setup_gemini(api_key, models_to_try=None, use_cache=True):
     """
     Setup Gemini API with automatic model detection
     
+    A key that works is also added to the key pool, so configuring another
+    key adds capacity rather than replacing the first one. The model found
+    for a key is remembered in GEMINI_MODEL_CACHE_FILE, so later starts skip
+    list_models() and the test generations until the entry expires.
+    
     Args:
         api_key: Google Gemini API key
         models_to_try: List of model names to attempt (optional)
+        use_cache: Use the model remembered for this key, if any
         
     Returns:
         bool: True if setup successful, False otherwise
     """
-    global gemini_model, api_key_configured
+    if use_cache:
+        model_name = load_cached_model(api_key)
+        if model_name:
+            try:
+                genai.configure(api_key=api_key)
+                use_model(api_key, genai.GenerativeModel(model_name), 'cache')
+                print(f" Using cached Gemini model: {model_name} (probe skipped)")
+                return True
+            except Exception as e:
+                print(f" Cached Gemini model unusable: {str(e)}, probing...")
     
     if not models_to_try:
         models_to_try = [
@@ -86,8 +125,8 @@ def setup_gemini(api_key, models_to_try=None):
                 
                 if test_response and test_response.text:
                     print(f" Successfully configured Gemini model: {model_name}")
-                    gemini_model = model
-                    api_key_configured = True
+                    use_model(api_key, model, 'probe')
+                    save_cached_model(api_key, model_name)
                     return True
         except Exception as e:
             print(f" Model detection failed: {str(e)}, trying fallback...")
@@ -101,20 +140,247 @@ def setup_gemini(api_key, models_to_try=None):
                 
                 if test_response and test_response.text:
                     print(f" Successfully configured Gemini model: {model_name}")
-                    gemini_model = model
-                    api_key_configured = True
+                    use_model(api_key, model, 'probe')
+                    save_cached_model(api_key, model_name)
                     return True
             except Exception as e:
                 print(f"{model_name} failed: {str(e)}")
                 continue
         
         print("No compatible Gemini models found")
+        setup_failed("No compatible Gemini models found")
         return False
         
     except Exception as e:
         print(f"Gemini API Configuration Error: {str(e)}")
+        setup_failed(str(e))
         return False
 
+def use_model(api_key, model, source):
+    """Make model the configured Gemini model and add its key to the pool"""
+    global gemini_model, api_key_configured, configured_api_key
+    
+    gemini_model = model
+    api_key_configured = True
+    configured_api_key = api_key
+    get_key_pool().add(api_key, model.model_name)
+    gemini_setup.update(state='ready', model=model.model_name, source=source, error=None)
+
+def setup_failed(error):
+    """Record a failed setup, unless an earlier key is still configured"""
+    if not api_key_configured:
+        gemini_setup.update(state='failed', model=None, source=None, error=error)
+
+def model_cache_key(api_key):
+    """The probe cache never stores keys, only their SHA-256"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def read_model_cache(path):
+    """
+    Read the probe cache file
+    
+    Args:
+        path: GEMINI_MODEL_CACHE_FILE
+    
+    Returns:
+        dict: Key hash -> {'model', 'probed_at'}, empty if missing or unreadable
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        return entries if isinstance(entries, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def load_cached_model(api_key):
+    """
+    Model found by an earlier probe with this key
+    
+    Returns:
+        str: Model name, or None if unknown or older than GEMINI_MODEL_CACHE_TTL
+    """
+    from config import get_config
+    
+    cfg = get_config()
+    if cfg.GEMINI_MODEL_CACHE_TTL <= 0:
+        return None
+    
+    entry = read_model_cache(cfg.GEMINI_MODEL_CACHE_FILE).get(model_cache_key(api_key))
+    if not isinstance(entry, dict) or time.time() - entry.get('probed_at', 0) > cfg.GEMINI_MODEL_CACHE_TTL:
+        return None
+    return entry.get('model')
+
+def save_cached_model(api_key, model_name):
+    """
+    Remember the model found for a key (model_name None forgets it)
+    
+    The file is replaced atomically, so workers reading it at the same time
+    never see a partial write.
+    """
+    from config import get_config
+    
+    cfg = get_config()
+    if cfg.GEMINI_MODEL_CACHE_TTL <= 0:
+        return
+    
+    path = cfg.GEMINI_MODEL_CACHE_FILE
+    with model_cache_lock:
+        now = time.time()
+        entries = {
+            key: entry for key, entry in read_model_cache(path).items()
+            if isinstance(entry, dict) and now - entry.get('probed_at', 0) <= cfg.GEMINI_MODEL_CACHE_TTL
+        }
+        if model_name:
+            entries[model_cache_key(api_key)] = {'model': model_name, 'probed_at': now}
+        else:
+            entries.pop(model_cache_key(api_key), None)
+        
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write Gemini model cache: {str(e)}")
+
+def validate_cached_model(api_key):
+    """
+    Check the cached model still exists for the key, re-probing if not
+    
+    Uses the model metadata endpoint, which costs no generation quota.
+    Network errors keep the cached model; only a definite rejection
+    (model gone, key revoked) drops it.
+    """
+    if not gemini_model:
+        return
+    
+    try:
+        genai.get_model(gemini_model.model_name)
+    except Exception as e:
+        if type(e).__name__ not in STALE_MODEL_ERRORS:
+            print(f"Gemini model validation skipped: {str(e)}")
+            return
+        print(f" Cached Gemini model {gemini_model.model_name} rejected ({type(e).__name__}), re-probing...")
+        save_cached_model(api_key, None)
+        setup_gemini(api_key, use_cache=False)
+
+def start_gemini_setup(api_key, extra_keys=()):
+    """
+    Configure Gemini in a background thread so startup does not wait for it
+    
+    Requests made before setup finishes are answered without AI, as when no
+    key is configured; get_gemini_setup_status() reports progress.
+    
+    Args:
+        api_key: Key to configure the model with
+        extra_keys: Further keys for the key pool (see add_api_keys)
+    
+    Returns:
+        threading.Thread: The setup thread
+    """
+    global pending_setup
+    
+    pending_setup = (api_key, list(extra_keys))
+    gemini_setup.update(state='pending', error=None)
+    thread = threading.Thread(target=run_gemini_setup, args=pending_setup, name='gemini-setup', daemon=True)
+    thread.start()
+    return thread
+
+def run_gemini_setup(api_key, extra_keys):
+    global pending_setup
+    
+    start = time.perf_counter()
+    try:
+        if setup_gemini(api_key):
+            if gemini_setup['source'] == 'cache':
+                validate_cached_model(api_key)
+            if extra_keys:
+                add_api_keys(extra_keys)
+    except Exception as e:
+        print(f"Gemini background setup error: {str(e)}")
+        setup_failed(str(e))
+    finally:
+        pending_setup = None
+        gemini_setup['seconds'] = round(time.perf_counter() - start, 2)
+        print(f" Gemini AI: {gemini_setup['state']} ({gemini_setup['model'] or 'no model'}) after {gemini_setup['seconds']}s")
+
+def get_gemini_setup_status():
+    """
+    State of the Gemini setup
+    
+    Returns:
+        dict: state (not_configured, pending, ready or failed), the resolved
+        model, whether it came from the probe cache or a probe, seconds taken
+        and the last error
+    """
+    return dict(gemini_setup)
+
+def add_api_keys(api_keys, model_name=None):
+    """
+    Add more API keys to the key pool
+    
+    Keys are not probed; one Gemini rejects as invalid is disabled on first
+    use.
+    
+    Args:
+        api_keys: Keys, each optionally as "key:model-name"
+        model_name: Model for keys without one (default: the configured model)
+        
+    Returns:
+        int: Number of keys added
+    """
+    model_name = model_name or (gemini_model.model_name if gemini_model else None)
+    added = 0
+    for entry in api_keys:
+        api_key, _, key_model = entry.strip().partition(':')
+        if not api_key or not (key_model or model_name):
+            continue
+        try:
+            if get_key_pool().add(api_key, key_model or model_name):
+                added += 1
+        except Exception as e:
+            print(f"Could not add Gemini key: {str(e)}")
+    return added
+
+def call_gemini(request):
+    """
+    Run request(model) with the pooled key that has the most budget left
+    
+    Args:
+        request: Function taking a GenerativeModel and calling Gemini
+    """
+    pool = get_key_pool()
+    if len(pool):
+        return pool.run(request)
+    return request(gemini_model)
+
+def reset_after_fork():
+    """
+    Recreate the Gemini client in a forked worker process
+    
+    gRPC channels opened before fork() cannot be used by the child, so the
+    worker reconfigures the SDK and rebuilds the model with the same key,
+    and every pooled key gets a new client. A setup still running in the
+    master is restarted in the worker.
+    """
+    global gemini_model
+    
+    if pending_setup and not gemini_model:
+        # The master's setup thread did not survive the fork
+        start_gemini_setup(*pending_setup)
+        return
+    
+    if not gemini_model or not configured_api_key:
+        return
+    
+    try:
+        genai.configure(api_key=configured_api_key)
+        gemini_model = genai.GenerativeModel(gemini_model.model_name)
+        get_key_pool().rebuild_clients()
+    except Exception as e:
+        print(f"Gemini re-initialisation after fork failed: {str(e)}")
+
 def get_gemini_model():
     """Get the configured Gemini model"""
     global gemini_model
@@ -125,7 +391,42 @@ def is_gemini_configured():
     global api_key_configured
     return api_key_configured
 
-def generate_content(prompt, temperature=0.7, max_tokens=2048):
+def get_generation_cache():
+    """
+    Cache for deterministic generations, stored per GENERATION_CACHE_STORAGE
+    
+    memory keeps entries in this process, disk in compressed files under
+    GENERATION_CACHE_DIR (shared by local workers, kept across restarts) and
+    shared in the configured shared cache backend (e.g. Redis).
+    """
+    global generation_cache
+    
+    if generation_cache is not None:
+        return generation_cache
+    
+    from config import get_config
+    from .cache_backends import CacheBackend, create_backend
+    from .cache_utils import get_cache
+    
+    with generation_cache_lock:
+        if generation_cache is None:
+            cfg = get_config()
+            storage = cfg.GENERATION_CACHE_STORAGE
+            if storage == 'disk':
+                backend = create_backend('disk', disk_path=cfg.GENERATION_CACHE_DIR)
+            elif storage == 'shared':
+                backend = None
+            else:
+                backend = CacheBackend()  # In-process only
+            generation_cache = get_cache('generation', backend=backend)
+        return generation_cache
+
+def generation_cache_key(prompt, model_name, temperature, max_tokens):
+    """Content-addressed key: SHA-256 of the model, settings and prompt"""
+    material = json.dumps([model_name, temperature, max_tokens, prompt], ensure_ascii=False)
+    return ('generate', hashlib.sha256(material.encode('utf-8')).hexdigest())
+
+def generate_content(prompt, temperature=0.7, max_tokens=2048, cache=False):
     """
     Generate content using Gemini
     
@@ -133,6 +434,9 @@ def generate_content(prompt, temperature=0.7, max_tokens=2048):
         prompt: Text prompt
         temperature: Creativity level (0.0-1.0)
         max_tokens: Maximum response length
+        cache: Reuse the result of an identical earlier call. Only honoured at
+            or below GENERATION_CACHE_MAX_TEMPERATURE, where output is
+            effectively deterministic
         
     Returns:
         str: Generated text or None if error
@@ -142,24 +446,144 @@ def generate_content(prompt, temperature=0.7, max_tokens=2048):
     if not gemini_model:
         return None
     
+    use_cache = False
+    if cache:
+        from config import get_config
+        from .cache_utils import MISSING
+        
+        cfg = get_config()
+        if cfg.GENERATION_CACHE_ENABLED and temperature <= cfg.GENERATION_CACHE_MAX_TEMPERATURE:
+            use_cache = True
+            # Entries are keyed by the model that served them; pooled keys
+            # may each use a different model, so try each one
+            for model_name in get_key_pool().model_names() or [gemini_model.model_name]:
+                cached = get_generation_cache().get(
+                    generation_cache_key(prompt, model_name, temperature, max_tokens)
+                )
+                if cached is not MISSING and cached:
+                    return cached
+    
+    text, model_name = request_generation(prompt, temperature, max_tokens)
+    if use_cache and text and model_name:
+        get_generation_cache().set(
+            generation_cache_key(prompt, model_name, temperature, max_tokens), text, ttl=cfg.GENERATION_CACHE_TTL
+        )
+    return text
+
+@coalesced('gemini', 'generate')
+def request_generation(prompt, temperature, max_tokens):
+    """
+    Send one generation request to Gemini
+    
+    Identical concurrent calls (same prompt and settings) share one request,
+    which runs through the Gemini dispatcher.
+    
+    Returns:
+        tuple: (generated text or None if error, name of the model that
+            served the request)
+        
+    Raises:
+        GeminiBusyError: The dispatcher could not admit the request
+    """
+    global gemini_model
+    
+    if not gemini_model:
+        return None, None
+    
+    served = {}
+    
+    def generate(model):
+        served['model'] = model.model_name  # The last attempt is the one that succeeded
+        return model.generate_content(prompt, generation_config=generation_config)
+    
     try:
         generation_config = {
             'temperature': temperature,
             'max_output_tokens': max_tokens,
         }
         
-        response = gemini_model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
+        response = get_dispatcher().call(call_gemini, generate)
         
         if response and response.text:
-            return response.text
-        return None
+            return response.text, served.get('model')
+        return None, None
         
+    except GeminiBusyError:
+        raise
     except Exception as e:
         print(f"Gemini generation error: {str(e)}")
+        return None, None
+
+def generate_content_stream(prompt, temperature=0.7, max_tokens=2048):
+    """
+    Stream content from Gemini as it is generated
+    
+    Args:
+        prompt: Text prompt
+        temperature: Creativity level (0.0-1.0)
+        max_tokens: Maximum response length
+        
+    Yields:
+        str: Text chunks in generation order (nothing if the request fails
+            before the first chunk)
+        
+    Raises:
+        GeminiBusyError: The dispatcher could not admit the request
+        GenerationInterruptedError: The stream failed or was stopped after
+            text was yielded, so the answer is incomplete
+    """
+    global gemini_model
+    
+    if not gemini_model:
+        return
+    
+    dispatcher = get_dispatcher()
+    streamed = False
+    finish_reason = None
+    try:
+        generation_config = {
+            'temperature': temperature,
+            'max_output_tokens': max_tokens,
+        }
+        
+        # The slot is held until the whole answer has streamed
+        with dispatcher.slot():
+            response = dispatcher.with_retries(
+                call_gemini,
+                lambda model: model.generate_content(prompt, generation_config=generation_config, stream=True)
+            )
+            
+            for chunk in response:
+                finish_reason = chunk_finish_reason(chunk) or finish_reason
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. a safety or finish marker)
+                    continue
+                if text:
+                    streamed = True
+                    yield text
+        
+    except GeminiBusyError:
+        raise
+    except Exception as e:
+        print(f"Gemini streaming error: {str(e)}")
+        if streamed:
+            raise GenerationInterruptedError(f"Answer interrupted: {str(e)}") from e
+        return
+    
+    if streamed and finish_reason and finish_reason not in COMPLETE_FINISH_REASONS:
+        print(f"Gemini stream stopped early: {finish_reason}")
+        raise GenerationInterruptedError(f"Answer interrupted ({finish_reason})")
+
+def chunk_finish_reason(chunk):
+    """Name of a stream chunk's finish reason, or None while generation continues"""
+    try:
+        reason = chunk.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
         return None
+    name = getattr(reason, 'name', None) or str(reason)
+    return None if not reason or name == 'FINISH_REASON_UNSPECIFIED' else name
 
 def generate_with_vision(prompt, image_data=None):
     """
@@ -179,14 +603,16 @@ def generate_with_vision(prompt, image_data=None):
     
     try:
         if image_data:
-            response = gemini_model.generate_content([prompt, image_data])
+            response = get_dispatcher().call(call_gemini, lambda model: model.generate_content([prompt, image_data]))
         else:
-            response = gemini_model.generate_content(prompt)
+            response = get_dispatcher().call(call_gemini, lambda model: model.generate_content(prompt))
         
         if response and response.text:
             return response.text
         return None
         
+    except GeminiBusyError:
+        raise
     except Exception as e:
         print(f"Gemini vision error: {str(e)}")
         return None
@@ -0,0 +1,415 @@
+"""
+Shared (L2) cache backends
+
+Values reach a backend already serialized, as bytes, under versioned string
+keys built by cache_utils. Every backend answers get/set/delete/clear and
+never raises: a backend that is down behaves like an empty cache, so the
+in-process L1 cache and the upstream APIs keep serving requests.
+
+Backends:
+    redis  - shared by every worker and host (REDIS_URL)
+    sqlite - shared by the workers on one host, for deployments without Redis
+    disk   - one file per entry, persistent across restarts
+    memory - process-local, for tests
+    none   - no shared tier (L1 only)
+"""
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+class CacheBackend:
+    """No-op backend (no shared tier) and base class for the others"""
+    
+    name = 'none'
+    
+    def __init__(self):
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Look up serialized bytes
+        
+        Returns:
+            bytes: Stored value, or None if absent, expired or unavailable
+        """
+        return None
+    
+    def set(self, key, data, ttl):
+        """Store serialized bytes for ttl seconds"""
+        pass
+    
+    def delete(self, key):
+        pass
+    
+    def clear(self, prefix):
+        """Delete every key starting with prefix"""
+        pass
+    
+    def available(self):
+        return False
+    
+    def stats(self):
+        with self._stats_lock:
+            return {'backend': self.name, 'available': self.available(), **self._stats}
+    
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+    
+    def _count_lookup(self, data):
+        self._count('misses' if data is None else 'hits')
+        return data
+
+class MemoryBackend(CacheBackend):
+    """Dictionary backend with expiry (process-local; for tests)"""
+    
+    name = 'memory'
+    
+    def __init__(self):
+        super().__init__()
+        self._entries = {}  # key -> (data, expires_at)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+        return self._count_lookup(entry[0] if entry else None)
+    
+    def set(self, key, data, ttl):
+        with self._lock:
+            self._entries[key] = (data, time.monotonic() + ttl)
+        self._count('sets')
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+    
+    def available(self):
+        return True
+
+class SQLiteBackend(CacheBackend):
+    """
+    SQLite file backend shared by the worker processes on one host
+    
+    Each thread opens its own connection (and reopens it after fork). WAL
+    journaling lets readers proceed while another worker writes.
+    """
+    
+    name = 'sqlite'
+    
+    # Expired rows are purged every this many writes
+    PURGE_INTERVAL = 500
+    
+    def __init__(self, path, timeout=0.25):
+        super().__init__()
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def get(self, key):
+        try:
+            row = self._connection().execute(
+                'SELECT value FROM cache WHERE key = ? AND expires_at > ?', (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._count('errors')
+            print(f"SQLite cache read error: {str(e)}")
+            return None
+        return self._count_lookup(bytes(row[0]) if row else None)
+    
+    def set(self, key, data, ttl):
+        try:
+            conn = self._connection()
+            now = time.time()
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, sqlite3.Binary(data), now + ttl)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+        except sqlite3.Error as e:
+            self._count('errors')
+            print(f"SQLite cache write error: {str(e)}")
+            return
+        self._count('sets')
+    
+    def delete(self, key):
+        try:
+            self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            self._count('errors')
+            print(f"SQLite cache delete error: {str(e)}")
+    
+    def clear(self, prefix):
+        try:
+            self._connection().execute('DELETE FROM cache WHERE substr(key, 1, ?) = ?', (len(prefix), prefix))
+        except sqlite3.Error as e:
+            self._count('errors')
+            print(f"SQLite cache clear error: {str(e)}")
+    
+    def available(self):
+        return True
+
+class DiskBackend(CacheBackend):
+    """
+    Directory of entry files, shared by local workers
+    
+    Files are named by the SHA-256 of the key and written atomically
+    (temporary file + rename). Each starts with a header holding the expiry
+    time and the key, so expired entries and prefixes can be found by a
+    directory scan.
+    """
+    
+    name = 'disk'
+    
+    # Expired files are purged every this many writes
+    PURGE_INTERVAL = 500
+    
+    # Expiry (wall clock) and key length
+    HEADER = struct.Struct('<dH')
+    
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:])
+    
+    def _read_header(self, f):
+        expires_at, key_length = self.HEADER.unpack(f.read(self.HEADER.size))
+        return expires_at, f.read(key_length).decode('utf-8')
+    
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, stored_key = self._read_header(f)
+                if stored_key != key:
+                    return self._count_lookup(None)
+                if expires_at <= time.time():
+                    os.remove(path)
+                    return self._count_lookup(None)
+                data = f.read()
+        except FileNotFoundError:
+            return self._count_lookup(None)
+        except (OSError, struct.error, UnicodeDecodeError) as e:
+            self._count('errors')
+            print(f"Disk cache read error: {str(e)}")
+            return None
+        return self._count_lookup(data)
+    
+    def set(self, key, data, ttl):
+        path = self._path(key)
+        encoded_key = key.encode('utf-8')
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(self.HEADER.pack(time.time() + ttl, len(encoded_key)))
+                f.write(encoded_key)
+                f.write(data)  # Large values arrive already compressed (cache_utils.serialize)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._count('errors')
+            print(f"Disk cache write error: {str(e)}")
+            return
+        self._count('sets')
+        
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self._scan(lambda expires_at, stored_key: expires_at <= time.time())
+    
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+    
+    def clear(self, prefix):
+        self._scan(lambda expires_at, stored_key: stored_key.startswith(prefix))
+    
+    def _scan(self, should_remove):
+        """Remove every entry file for which should_remove(expires_at, key) is true"""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'rb') as f:
+                        expires_at, stored_key = self._read_header(f)
+                    if should_remove(expires_at, stored_key):
+                        os.remove(path)
+                except (OSError, struct.error, UnicodeDecodeError):
+                    continue
+    
+    def available(self):
+        return True
+
+class RedisBackend(CacheBackend):
+    """
+    Redis backend shared by every worker, with a circuit breaker
+    
+    Socket timeouts are short so an unreachable server costs at most one
+    timeout; after a failure the backend stays open (skipped) for
+    retry_interval seconds before trying Redis again.
+    """
+    
+    name = 'redis'
+    
+    def __init__(self, url, timeout=0.25, retry_interval=30.0):
+        super().__init__()
+        import redis  # Optional dependency (requirements.txt)
+        
+        self.url = url
+        self.retry_interval = retry_interval
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(
+            url,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+            health_check_interval=30
+        )
+        self._down_until = 0.0
+        self._stats['skipped'] = 0
+    
+    def _call(self, operation, default=None):
+        """Run a Redis command, tripping the breaker on failure"""
+        if self._down_until and time.monotonic() < self._down_until:
+            self._count('skipped')
+            return default
+        
+        try:
+            result = operation(self._client)
+        except self._errors as e:
+            self._count('errors')
+            if not self._down_until:
+                print(f"Redis cache unavailable ({str(e)}), retrying in {self.retry_interval:g}s")
+            self._down_until = time.monotonic() + self.retry_interval
+            return default
+        
+        if self._down_until:
+            print("Redis cache reconnected")
+            self._down_until = 0.0
+        return result
+    
+    def get(self, key):
+        return self._count_lookup(self._call(lambda client: client.get(key)))
+    
+    def set(self, key, data, ttl):
+        if self._call(lambda client: client.set(key, data, px=max(1, int(ttl * 1000))), False):
+            self._count('sets')
+    
+    def delete(self, key):
+        self._call(lambda client: client.delete(key))
+    
+    def clear(self, prefix):
+        def delete_prefix(client):
+            keys = list(client.scan_iter(match=prefix + '*', count=500))
+            for start in range(0, len(keys), 500):
+                client.delete(*keys[start:start + 500])
+        
+        self._call(delete_prefix)
+    
+    def available(self):
+        return not self._down_until or time.monotonic() >= self._down_until
+
+# Global state
+backend = None
+backend_lock = threading.Lock()
+
+def create_backend(kind, redis_url=None, sqlite_path=None, disk_path=None, timeout=0.25, retry_interval=30.0):
+    """
+    Build a backend by name
+    
+    Args:
+        kind: redis, sqlite, disk, memory or none
+        redis_url: Redis connection URL (redis)
+        sqlite_path: Database file (sqlite)
+        disk_path: Cache directory (disk)
+        timeout: Socket / lock timeout in seconds
+        retry_interval: Seconds to skip Redis after a failure
+    
+    Returns:
+        CacheBackend: Backend (no-op if the kind is unknown or unavailable)
+    """
+    try:
+        if kind == 'redis':
+            return RedisBackend(redis_url, timeout=timeout, retry_interval=retry_interval)
+        if kind == 'sqlite':
+            return SQLiteBackend(sqlite_path, timeout=timeout)
+        if kind == 'disk':
+            return DiskBackend(disk_path)
+        if kind == 'memory':
+            return MemoryBackend()
+        if kind not in ('none', ''):
+            print(f"Unknown cache backend '{kind}', using in-process cache only")
+    except ImportError:
+        print("redis package not installed, using in-process cache only")
+    except Exception as e:
+        print(f"Cache backend '{kind}' failed to start: {str(e)}")
+    return CacheBackend()
+
+def get_backend():
+    """Get (or create) the configured shared backend"""
+    global backend
+    
+    if backend is not None:
+        return backend
+    
+    with backend_lock:
+        if backend is None:
+            try:
+                from config import get_config
+                
+                cfg = get_config()
+                backend = create_backend(
+                    cfg.CACHE_BACKEND,
+                    redis_url=cfg.REDIS_URL,
+                    sqlite_path=cfg.CACHE_SQLITE_PATH,
+                    timeout=cfg.CACHE_BACKEND_TIMEOUT,
+                    retry_interval=cfg.CACHE_BACKEND_RETRY_INTERVAL
+                )
+            except (ImportError, AttributeError):
+                backend = CacheBackend()
+        return backend
+
+def set_backend(new_backend):
+    """Replace the shared backend (e.g. a MemoryBackend in tests)"""
+    global backend
+    with backend_lock:
+        backend = new_backend
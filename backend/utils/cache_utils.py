@@ -0,0 +1,383 @@
+"""
+In-process and shared caching for upstream lookups
+
+TTLCache is a bounded, thread-safe LRU map with per-entry expiry. Entries
+are evicted least-recently-used first once either the entry count or the
+estimated byte size exceeds its limit. Confirmed empty results (None, [],
+{}: no such page, no search hits) are cached too, with a shorter TTL, so
+repeated misses do not hit the network. Functions decorated with @cached
+return Transient(value) for failures (timeouts, 5xx, bad JSON): the caller
+gets the value, the cache stores nothing and the next call tries again.
+
+Named caches are two-tier: a TTLCache per process (L1) in front of the
+shared backend from cache_backends (L2: Redis, SQLite or none), so one
+worker's lookups warm every other worker. L2 values are compact JSON,
+zlib-compressed when large, under keys carrying CACHE_KEY_VERSION.
+"""
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from .cache_backends import get_backend
+
+MISSING = object()
+
+# Bump when the shape of a cached value changes, so workers running the new
+# code never read entries written by the old code
+CACHE_KEY_VERSION = 2
+
+# Serialized values at least this large are zlib-compressed
+COMPRESS_MIN_BYTES = 512
+
+class Transient:
+    """
+    Result of a failed lookup that must not be cached
+    
+    @cached hands value to the caller and stores nothing.
+    """
+    __slots__ = ('value',)
+    
+    def __init__(self, value=None):
+        self.value = value
+
+class TTLCache:
+    """
+    Thread-safe TTL + LRU cache bounded by entry count and byte size
+    """
+    
+    def __init__(self, max_entries=2048, max_bytes=32 * 1024 * 1024, ttl=3600, negative_ttl=120):
+        """
+        Create an empty cache
+        
+        Args:
+            max_entries: Maximum number of entries
+            max_bytes: Maximum estimated size of all values
+            ttl: Lifetime of an entry in seconds
+            negative_ttl: Lifetime of an empty result (None, [], {}) in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+    
+    def get(self, key, default=MISSING):
+        """
+        Look up a key, refreshing its LRU position
+        
+        Returns:
+            Cached value, or default (MISSING) if absent or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self._stats['negative_hits' if is_empty(value) else 'hits'] += 1
+            return value
+    
+    def set(self, key, value, ttl=None):
+        """
+        Store a value, evicting least-recently-used entries to stay in bounds
+        
+        Args:
+            key: Hashable key
+            value: Value to cache (empty results use negative_ttl)
+            ttl: Override the lifetime in seconds
+        """
+        if ttl is None:
+            ttl = self.negative_ttl if is_empty(value) else self.ttl
+        size = estimate_size(value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+    
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['negative_hits'] + self._stats['misses']
+            hits = self._stats['hits'] + self._stats['negative_hits']
+            return {
+                **self._stats,
+                'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            }
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+def is_empty(value):
+    """Whether a result counts as a miss (negative cache entry)"""
+    return value is None or (isinstance(value, (list, dict, str)) and not value)
+
+def estimate_size(value):
+    """Approximate memory footprint of a JSON-like value in bytes"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str)) + 64
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+def serialize(value, expires_at):
+    """
+    Encode a value and its wall-clock expiry for the shared tier
+    
+    Returns:
+        bytes: b"j" + JSON, or b"z" + zlib(JSON) for large values
+    """
+    data = json.dumps({'v': value, 'e': round(expires_at, 1)}, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return b'z' + zlib.compress(data, 6)
+    return b'j' + data
+
+def deserialize(data):
+    """
+    Decode bytes written by serialize
+    
+    Returns:
+        tuple: (value, expires_at)
+    """
+    body = zlib.decompress(data[1:]) if data[:1] == b'z' else data[1:]
+    payload = json.loads(body.decode('utf-8'))
+    return payload['v'], payload['e']
+
+class TieredCache:
+    """
+    Process-local TTLCache (L1) backed by a shared cache backend (L2)
+    
+    L1 misses fall through to L2; L2 hits are copied into L1 for the rest of
+    their lifetime. Writes go to both tiers. Values that cannot be encoded as
+    JSON stay in L1 only.
+    """
+    
+    def __init__(self, name, local, backend, prefix='pastportals'):
+        """
+        Args:
+            name: Cache name, part of every shared key
+            local: TTLCache used as L1
+            backend: CacheBackend used as L2
+            prefix: Key prefix shared by all caches of this app
+        """
+        self.name = name
+        self.local = local
+        self.backend = backend
+        self.key_prefix = f"{prefix}:v{CACHE_KEY_VERSION}:{name}:"
+        self._stats = {'l2_hits': 0, 'l2_misses': 0}
+    
+    def shared_key(self, key):
+        """Versioned L2 key for a cache key tuple"""
+        encoded = json.dumps(key, ensure_ascii=False, separators=(',', ':'), default=str)
+        namespace = key[0] if isinstance(key, tuple) and key else ''
+        digest = hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+        return f"{self.key_prefix}{namespace}:{digest}"
+    
+    def get(self, key, default=MISSING):
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        
+        data = self.backend.get(self.shared_key(key))
+        if data is None:
+            self._stats['l2_misses'] += 1
+            return default
+        
+        try:
+            value, expires_at = deserialize(data)
+        except (ValueError, KeyError, zlib.error) as e:
+            print(f"Discarding unreadable cache entry: {str(e)}")
+            return default
+        
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            self._stats['l2_misses'] += 1
+            return default
+        
+        self._stats['l2_hits'] += 1
+        self.local.set(key, value, ttl=remaining)
+        return value
+    
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.local.negative_ttl if is_empty(value) else self.local.ttl
+        if ttl <= 0:
+            return
+        
+        self.local.set(key, value, ttl=ttl)
+        try:
+            data = serialize(value, time.time() + ttl)
+        except (TypeError, ValueError):
+            return
+        self.backend.set(self.shared_key(key), data, ttl)
+    
+    def delete(self, key):
+        self.local.delete(key)
+        self.backend.delete(self.shared_key(key))
+    
+    def clear(self):
+        """Empty L1 and this cache's entries (current key version) in L2"""
+        self.local.clear()
+        self.backend.clear(self.key_prefix)
+    
+    def stats(self):
+        return {**self.local.stats(), **self._stats}
+    
+    def __len__(self):
+        return len(self.local)
+
+# Named caches shared across the process
+caches = {}
+caches_lock = threading.Lock()
+
+def get_cache(name, backend=None):
+    """
+    Get (or create) a named two-tier cache sized from config
+    
+    Args:
+        name: Cache name, e.g. "wikipedia"
+        backend: L2 backend used when the cache is created (default: the
+            shared backend from config)
+    
+    Returns:
+        TieredCache: Shared cache instance
+    """
+    cache = caches.get(name)
+    if cache is not None:
+        return cache
+    
+    with caches_lock:
+        if name not in caches:
+            try:
+                from config import get_config
+                
+                cfg = get_config()
+                local = TTLCache(
+                    max_entries=cfg.CACHE_MAX_ENTRIES,
+                    max_bytes=cfg.CACHE_MAX_BYTES,
+                    ttl=cfg.CACHE_TIMEOUT,
+                    negative_ttl=cfg.CACHE_NEGATIVE_TTL
+                )
+                prefix = cfg.CACHE_KEY_PREFIX
+            except (ImportError, AttributeError):
+                local = TTLCache()
+                prefix = 'pastportals'
+            caches[name] = TieredCache(name, local, backend or get_backend(), prefix=prefix)
+        return caches[name]
+
+def get_cache_stats():
+    """Stats for the shared backend and every named cache (with its own backend, if any)"""
+    shared = get_backend()
+    return {
+        'backend': shared.stats(),
+        'caches': {
+            name: {**cache.stats(), **({} if cache.backend is shared else {'backend': cache.backend.stats()})}
+            for name, cache in list(caches.items())
+        }
+    }
+
+def make_key(namespace, signature, args, kwargs, ignore=()):
+    """
+    Cache key from a namespace and call arguments
+    
+    Arguments are bound to the function's signature with defaults applied,
+    so f("x"), f("x", 3) and f(title="x", limit=3) share one key.
+    
+    Args:
+        namespace: Key prefix, unique per function
+        signature: inspect.Signature of the function
+        args: Positional arguments of the call
+        kwargs: Keyword arguments of the call
+        ignore: Parameter names left out of the key
+    
+    Returns:
+        tuple: (namespace, (name, value), ...)
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    key = [namespace]
+    for name, value in bound.arguments.items():
+        if name in ignore:
+            continue
+        if signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+            value = tuple(sorted(value.items()))
+        key.append((name, value))
+    return tuple(key)
+
+def cached(cache_name, namespace, ignore=()):
+    """
+    Decorator caching a function's results in a named TTLCache
+    
+    Callers get a copy of the cached value, so mutating a result never
+    changes what later callers see. A Transient result is unwrapped and
+    not cached.
+    
+    Args:
+        cache_name: Name passed to get_cache
+        namespace: Key prefix, unique per decorated function
+        ignore: Parameters that do not affect the result
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache(cache_name)
+            key = make_key(namespace, signature, args, kwargs, ignore)
+            
+            value = cache.get(key)
+            if value is MISSING:
+                value = func(*args, **kwargs)
+                if isinstance(value, Transient):
+                    return value.value
+                cache.set(key, value)
+            return copy.deepcopy(value)
+        
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,151 @@
+"""
+Passage chunking for full Wikipedia articles
+
+Articles are split along their section headings, then into overlapping,
+sentence-aligned windows so every passage is small enough to be a precise
+prompt context and still reads as complete sentences.
+"""
+import re
+
+# Sections that are lists of references rather than prose
+SKIPPED_SECTIONS = {
+    'references', 'external links', 'see also', 'further reading', 'notes',
+    'bibliography', 'sources', 'citations', 'footnotes', 'works cited', 'gallery'
+}
+
+HEADING_PATTERN = re.compile(r'^(={2,6})\s*(.+?)\s*\1\s*$')
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])')
+
+LEAD_SECTION = 'Introduction'
+MIN_PASSAGE_WORDS = 12
+
+def split_sections(text):
+    """
+    Split plain article text into sections
+    
+    Args:
+        text: Article text with "== Heading ==" lines (exsectionformat=wiki)
+    
+    Returns:
+        list: (section, body) tuples; nested headings are joined as "Parent > Child"
+    """
+    sections = []
+    headings = []
+    body = []
+    skipped_level = None
+    
+    def flush():
+        content = '\n'.join(body).strip()
+        if content and skipped_level is None:
+            sections.append((' > '.join(headings) or LEAD_SECTION, content))
+        body.clear()
+    
+    for line in text.splitlines():
+        match = HEADING_PATTERN.match(line.strip())
+        if not match:
+            body.append(line)
+            continue
+        
+        flush()
+        level = len(match.group(1)) - 1
+        heading = match.group(2).strip()
+        del headings[level - 1:]
+        headings.append(heading)
+        
+        # Skip reference sections together with their subsections
+        if skipped_level is not None and level <= skipped_level:
+            skipped_level = None
+        if skipped_level is None and heading.lower() in SKIPPED_SECTIONS:
+            skipped_level = level
+    
+    flush()
+    return sections
+
+def split_sentences(text):
+    """Split a section body into sentences, keeping paragraph breaks as boundaries"""
+    sentences = []
+    for paragraph in text.split('\n'):
+        paragraph = paragraph.strip()
+        if paragraph:
+            sentences.extend(s for s in SENTENCE_PATTERN.split(paragraph) if s)
+    return sentences
+
+def window_sentences(sentences, max_words, overlap_words):
+    """
+    Group sentences into overlapping windows of at most max_words words
+    
+    Each window after the first repeats trailing sentences of the previous
+    one, up to overlap_words words. Sentences longer than max_words are
+    split on word boundaries.
+    
+    Args:
+        sentences: List of sentences
+        max_words: Word budget per window
+        overlap_words: Words carried over between consecutive windows
+    
+    Returns:
+        list: Window texts
+    """
+    pieces = []
+    for sentence in sentences:
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            pieces.append(words[start:start + max_words])
+    
+    windows = []
+    current = []
+    current_words = 0
+    for piece in pieces:
+        if current and current_words + len(piece) > max_words:
+            windows.append(' '.join(' '.join(p) for p in current))
+            
+            # Carry trailing sentences into the next window
+            carried = []
+            carried_words = 0
+            for previous in reversed(current):
+                if carried_words + len(previous) > overlap_words:
+                    break
+                carried.insert(0, previous)
+                carried_words += len(previous)
+            current, current_words = carried, carried_words
+        
+        current.append(piece)
+        current_words += len(piece)
+    
+    if current:
+        windows.append(' '.join(' '.join(p) for p in current))
+    return windows
+
+def chunk_article(title, text, url=None, max_words=180, overlap_words=40):
+    """
+    Split an article into passages with metadata
+    
+    Passage texts start with "Title — Section" so the embedding and the
+    prompt both know where a passage comes from.
+    
+    Args:
+        title: Article title
+        text: Plain article text with "== Heading ==" lines
+        url: Source URL (optional)
+        max_words: Word budget per passage
+        overlap_words: Words shared by consecutive passages of a section
+    
+    Returns:
+        list: (passage_text, metadata) tuples; metadata has title, section, url and passage
+    """
+    overlap_words = min(overlap_words, max_words // 2)
+    passages = []
+    
+    for section, body in split_sections(text):
+        for window in window_sentences(split_sentences(body), max_words, overlap_words):
+            if len(window.split()) < MIN_PASSAGE_WORDS:
+                continue
+            metadata = {
+                'title': title,
+                'section': section,
+                'url': url,
+                'passage': len(passages)
+            }
+            passages.append((f"{title} — {section}\n\n{window}", metadata))
+    
+    return passages
@@ -0,0 +1,190 @@
+"""
+Category and era tags for metadata-filtered retrieval
+
+Every document gets a fixed-size tag at ingestion: a bitmask of the
+categories from get_historical_categories() whose keywords it mentions,
+and the year range its dates and centuries cover (from the gazetteer).
+The tags are stored as a compact column in the document store, so a
+filter is turned into a candidate bitmap with a few vectorised numpy
+comparisons and handed to FAISS before the ANN search.
+
+A filter keeps a document when its categories intersect the filter's, or
+its year range overlaps the filter's. An era ("medieval_period") is both
+the category and its year range, so undated documents still match by
+keyword and dated ones by period.
+"""
+import re
+
+from .doc_store import TAG_FIELDS
+from .history_utils import get_historical_categories, keyword_trie_pattern
+
+CATEGORY_NAMES = list(get_historical_categories())
+CATEGORY_BITS = {name: 1 << i for i, name in enumerate(CATEGORY_NAMES)}
+
+# Eras among the categories and the years they cover (BC negative)
+ERA_YEARS = {
+    'ancient_civilizations': (-3500, 499),
+    'medieval_period': (500, 1499),
+    'renaissance_enlightenment': (1300, 1799),
+    'modern_history': (1750, 2100)
+}
+
+# Words in a question that scope it to an era
+ERA_WORDS = {
+    'ancient': 'ancient_civilizations', 'antiquity': 'ancient_civilizations', 'classical': 'ancient_civilizations',
+    'medieval': 'medieval_period', 'middle ages': 'medieval_period', 'dark ages': 'medieval_period',
+    'renaissance': 'renaissance_enlightenment', 'enlightenment': 'renaissance_enlightenment',
+    'early modern': 'renaissance_enlightenment', 'modern history': 'modern_history',
+    'industrial': 'modern_history'
+}
+ERA_WORD_PATTERN = re.compile(r'\b(' + keyword_trie_pattern(sorted(ERA_WORDS)) + r')\b')
+
+CATEGORY_PATTERNS = {
+    name: re.compile(r'\b' + keyword_trie_pattern(sorted(keywords)) + r'(?:s|es)?\b')
+    for name, keywords in get_historical_categories().items()
+}
+
+# Year range stored for undated documents (never overlaps a filter)
+NO_YEARS = (32767, -32768)
+
+def document_tags(text, metadata=None):
+    """
+    Category bitmask and year range of a document
+    
+    Args:
+        text: Document text
+        metadata: Metadata dict; its 'entities' summary (see
+            gazetteer.entity_summary) supplies the years if present
+    
+    Returns:
+        tuple: (categories, start_year, end_year), NO_YEARS if undated
+    """
+    text_lower = ((metadata or {}).get('title', '') + '\n' + (text or '')).lower()
+    categories = 0
+    for name, pattern in CATEGORY_PATTERNS.items():
+        if pattern.search(text_lower):
+            categories |= CATEGORY_BITS[name]
+    
+    entities = (metadata or {}).get('entities')
+    if entities is None:
+        from .gazetteer import entity_summary, get_gazetteer
+        
+        entities = entity_summary(get_gazetteer().extract(text or ''))
+    years = entities.get('years')
+    if not years:
+        return categories, NO_YEARS[0], NO_YEARS[1]
+    return categories, max(-32767, years[0]), min(32767, years[1])
+
+def make_tags(texts, metadatas=None):
+    """
+    Tag rows for documents, ready for DocStore.append_tags
+    
+    Returns:
+        numpy.ndarray: Structured array of TAG_FIELDS rows
+    """
+    import numpy as np  # Lazy import
+    
+    metadatas = metadatas if metadatas is not None else [None] * len(texts)
+    return np.array(
+        [document_tags(text, metadata) for text, metadata in zip(texts, metadatas)],
+        dtype=TAG_FIELDS
+    )
+
+def make_filter(era=None, categories=None, years=None):
+    """
+    Build a search filter
+    
+    Args:
+        era: Era name from ERA_YEARS (adds its category and years)
+        categories: Category names from get_historical_categories()
+        years: (start_year, end_year), BC negative
+    
+    Returns:
+        dict: {'categories': bitmask, 'years': (start, end) or None}, or
+        None if nothing valid was given
+    """
+    mask = 0
+    for name in categories or []:
+        mask |= CATEGORY_BITS.get(name, 0)
+    
+    if era in ERA_YEARS:
+        mask |= CATEGORY_BITS[era]
+        era_years = ERA_YEARS[era]
+        years = (min(years[0], era_years[0]), max(years[1], era_years[1])) if years else era_years
+    
+    if years is not None:
+        try:
+            years = (max(-32767, int(years[0])), min(32767, int(years[1])))
+        except (TypeError, ValueError, IndexError):
+            years = None
+        if years and years[0] > years[1]:
+            years = None
+    
+    if not mask and years is None:
+        return None
+    return {'categories': mask, 'years': years}
+
+def filter_from_request(filters):
+    """
+    Search filter from a request's "filters" object
+    
+    Args:
+        filters: {"era": "medieval_period", "categories": ["wars_conflicts"],
+            "years": [1200, 1300]} (all optional)
+    
+    Returns:
+        dict: See make_filter, or None
+    """
+    if not isinstance(filters, dict):
+        return None
+    categories = filters.get('categories')
+    if not isinstance(categories, list):
+        categories = [categories] if isinstance(categories, str) else None
+    years = filters.get('years')
+    if not (isinstance(years, list) and len(years) == 2):
+        years = None
+    return make_filter(era=filters.get('era'), categories=categories, years=years)
+
+def infer_filter(question):
+    """
+    Search filter implied by a question's dates, centuries or era words
+    
+    "the Black Death in the 14th century" scopes retrieval to 1300-1399;
+    "medieval castles" to the medieval period.
+    
+    Returns:
+        dict: See make_filter, or None if the question names no period
+    """
+    from .gazetteer import get_gazetteer
+    
+    entities = get_gazetteer().extract(question)
+    spans = entities['dates'] + entities['centuries']
+    years = None
+    if spans:
+        years = (min(span['start_year'] for span in spans), max(span['end_year'] for span in spans))
+    
+    eras = {ERA_WORDS[match] for match in ERA_WORD_PATTERN.findall(question.lower())}
+    if years is None and len(eras) == 1:
+        return make_filter(era=eras.pop())
+    return make_filter(years=years)
+
+def matching_mask(tags, search_filter):
+    """
+    Boolean mask of the documents a filter keeps
+    
+    Args:
+        tags: Structured tag array (one row per document id)
+        search_filter: Filter from make_filter
+    
+    Returns:
+        numpy.ndarray: bool array, True for documents to search
+    """
+    import numpy as np  # Lazy import
+    
+    mask = np.zeros(len(tags), dtype=bool)
+    if search_filter['categories']:
+        mask |= (tags['categories'] & np.uint32(search_filter['categories'])) != 0
+    if search_filter['years']:
+        start, end = search_filter['years']
+        mask |= (tags['start_year'] <= end) & (tags['end_year'] >= start)
+    return mask
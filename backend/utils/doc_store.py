@@ -0,0 +1,549 @@
+"""
+Compact on-disk document store for vector database texts
+
+Documents are addressed by integer id (the FAISS vector id) and stored as
+two append-only files:
+
+    <path>.idx  8-byte magic followed by one little-endian uint64 end offset per document
+    <path>.dat  zlib-compressed document bodies, back to back
+
+Both files are memory-mapped, so opening a store costs O(1) regardless of
+corpus size, a lookup is two offset reads plus one decompress, and only the
+pages that are actually read become resident.
+
+Optional columns share the same id space:
+
+    <path>.meta.idx/.meta.dat  compact JSON metadata per document (title, section, url)
+    <path>.f16                 8-byte magic, uint32 dimension, then row-major float16 vectors
+    <path>.tags                8-byte magic, then one 8-byte TAG_FIELDS record per document
+
+The vector column is used to re-rank candidates from quantized indexes
+exactly and to rebuild indexes without lossy reconstruction. The tags
+column (category bitmask and year range, see doc_filters) lets filtered
+searches build their candidate set without decoding any metadata.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+STORE_MAGIC = b'PPDOCS01'
+VECTORS_MAGIC = b'PPVEC16\x00'
+TAGS_MAGIC = b'PPTAGS01'
+# Record layout of the tags column (numpy structured dtype description)
+TAG_FIELDS = [('categories', '<u4'), ('start_year', '<i2'), ('end_year', '<i2')]
+OFFSET = struct.Struct('<Q')
+DIMENSION = struct.Struct('<I')
+COMPRESSION_LEVEL = 6
+
+class RecordFile:
+    """
+    Append-only, memory-mapped sequence of compressed byte records
+    
+    Not thread-safe on its own; DocStore serialises access.
+    """
+    
+    def __init__(self, path):
+        """
+        Open a record file pair (<path>.idx / <path>.dat) if it exists
+        
+        Args:
+            path: Base path without extension
+        """
+        self.path = path
+        self.count = 0
+        self._idx_map = None
+        self._dat_map = None
+        
+        if self.exists():
+            self.open()
+    
+    def exists(self):
+        return os.path.exists(self.path + '.idx') and os.path.exists(self.path + '.dat')
+    
+    def get(self, record_id):
+        """Decompressed bytes of a committed record"""
+        start = self._offset(record_id - 1) if record_id else 0
+        end = self._offset(record_id)
+        return zlib.decompress(self._dat_map[start:end])
+    
+    def append(self, records):
+        """
+        Append compressed records and their end offsets
+        
+        Args:
+            records: Iterable of bytes
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        idx_path, dat_path = self.path + '.idx', self.path + '.dat'
+        
+        if not os.path.exists(idx_path):
+            with open(idx_path, 'wb') as f:
+                f.write(STORE_MAGIC)
+        
+        end = self._offset(self.count - 1) if self.count else 0
+        written = 0
+        with open(dat_path, 'ab') as dat:
+            # Drop bytes from an interrupted append that never got an offset
+            dat.truncate(end)
+            offsets = bytearray()
+            for record in records:
+                blob = zlib.compress(record, COMPRESSION_LEVEL)
+                dat.write(blob)
+                end += len(blob)
+                offsets += OFFSET.pack(end)
+                written += 1
+        
+        with open(idx_path, 'r+b') as idx:
+            idx.seek(len(STORE_MAGIC) + self.count * OFFSET.size)
+            idx.write(offsets)
+            idx.truncate()
+        self.count += written
+    
+    def open(self):
+        """(Re)map the index and data files"""
+        self.close()
+        with open(self.path + '.idx', 'rb') as f:
+            if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+                raise ValueError(f"Not a document store index: {self.path}.idx")
+        
+        idx_size = os.path.getsize(self.path + '.idx')
+        self.count = (idx_size - len(STORE_MAGIC)) // OFFSET.size
+        self._idx_map = map_file(self.path + '.idx')
+        self._dat_map = map_file(self.path + '.dat') or b''
+    
+    def close(self):
+        """Release the memory maps"""
+        for mapped in (self._idx_map, self._dat_map):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._idx_map = self._dat_map = None
+    
+    def remove(self):
+        """Delete both files and forget all records"""
+        self.close()
+        for suffix in ('.idx', '.dat'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        self.count = 0
+    
+    def _offset(self, record_id):
+        """End offset of a committed record in the data file"""
+        return OFFSET.unpack_from(self._idx_map, len(STORE_MAGIC) + record_id * OFFSET.size)[0]
+
+class DocStore:
+    """
+    Append-only, memory-mapped text store addressed by integer id
+    
+    New documents are buffered in memory until save() appends them to disk,
+    which lets create_vector_db build a store before it has a path.
+    """
+    
+    def __init__(self, path=None):
+        """
+        Open (or prepare) a document store
+        
+        Args:
+            path: Base path without extension, or None for an unsaved store
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._texts = RecordFile(path) if path else None
+        self._meta = RecordFile(path + '.meta') if path else None
+        self._vectors = map_vectors(path + '.f16') if path else None
+        self._tags = map_tags(path + '.tags') if path else None
+        self._pending = []
+        self._pending_meta = []
+        self._pending_vectors = []
+        self._pending_tags = []
+    
+    # Mapping-style access
+    
+    def __len__(self):
+        return self._committed() + len(self._pending)
+    
+    def __contains__(self, doc_id):
+        return isinstance(doc_id, int) and 0 <= doc_id < len(self)
+    
+    def __iter__(self):
+        return iter(range(len(self)))
+    
+    def __getitem__(self, doc_id):
+        text = self.get(doc_id)
+        if text is None:
+            raise KeyError(doc_id)
+        return text
+    
+    def get(self, doc_id, default=None):
+        """
+        Get document text by id
+        
+        Args:
+            doc_id: Integer document id
+            default: Value returned for unknown ids
+        
+        Returns:
+            str: Document text or default
+        """
+        doc_id = int(doc_id)
+        if doc_id < 0:
+            return default
+        
+        with self._lock:
+            committed = self._committed()
+            if doc_id < committed:
+                return self._texts.get(doc_id).decode('utf-8')
+            
+            pending_id = doc_id - committed
+            if pending_id < len(self._pending):
+                return self._pending[pending_id]
+        return default
+    
+    def get_metadata(self, doc_id):
+        """
+        Get document metadata by id
+        
+        Args:
+            doc_id: Integer document id
+        
+        Returns:
+            dict: Metadata such as title, section and url (empty if none was stored)
+        """
+        doc_id = int(doc_id)
+        if doc_id < 0:
+            return {}
+        
+        with self._lock:
+            if self._meta and doc_id < self._meta.count:
+                return json.loads(self._meta.get(doc_id))
+            
+            pending_id = doc_id - self._committed()
+            if 0 <= pending_id < len(self._pending_meta):
+                return dict(self._pending_meta[pending_id] or {})
+        return {}
+    
+    def texts(self):
+        """Iterate over all document texts in id order"""
+        for doc_id in range(len(self)):
+            yield self.get(doc_id)
+    
+    # Vector column
+    
+    @property
+    def vector_count(self):
+        """Number of documents with a stored float16 vector"""
+        with self._lock:
+            committed = len(self._vectors) if self._vectors is not None else 0
+            return committed + sum(len(v) for v in self._pending_vectors)
+    
+    def get_vectors(self, doc_ids):
+        """
+        Get stored vectors for documents
+        
+        Args:
+            doc_ids: Sequence of integer document ids
+        
+        Returns:
+            numpy.ndarray: float32 array (len(doc_ids), dimension) or None
+                if any id has no stored vector
+        """
+        import numpy as np  # Lazy import
+        
+        with self._lock:
+            if not self.vector_count:
+                return None
+            committed = self._vectors if self._vectors is not None else np.empty((0, 0), dtype=np.float16)
+            doc_ids = np.asarray(doc_ids, dtype=np.int64)
+            if len(doc_ids) and (doc_ids.min() < 0 or doc_ids.max() >= self.vector_count):
+                return None
+            if not self._pending_vectors:
+                return committed[doc_ids].astype(np.float32)
+            
+            rows = []
+            pending = np.concatenate(self._pending_vectors)
+            for doc_id in doc_ids:
+                rows.append(committed[doc_id] if doc_id < len(committed) else pending[doc_id - len(committed)])
+            return np.array(rows, dtype=np.float32).reshape(len(doc_ids), -1)
+    
+    def append_vectors(self, vectors):
+        """
+        Append float16 copies of document vectors (same order as the texts)
+        
+        Args:
+            vectors: float array (n, dimension)
+        """
+        import numpy as np  # Lazy import
+        
+        with self._lock:
+            self._pending_vectors.append(np.asarray(vectors, dtype=np.float16))
+    
+    # Tags column
+    
+    @property
+    def tag_count(self):
+        """Number of documents with a stored tag record"""
+        with self._lock:
+            committed = len(self._tags) if self._tags is not None else 0
+            return committed + sum(len(t) for t in self._pending_tags)
+    
+    def get_tags(self):
+        """
+        Get the tag records of all tagged documents, in id order
+        
+        Returns:
+            numpy.ndarray: Structured TAG_FIELDS array (memory-mapped when
+                nothing is pending), or None if no document is tagged
+        """
+        import numpy as np  # Lazy import
+        
+        with self._lock:
+            if not self.tag_count:
+                return None
+            if not self._pending_tags:
+                return self._tags
+            committed = [self._tags] if self._tags is not None else []
+            return np.concatenate(committed + self._pending_tags)
+    
+    def append_tags(self, tags):
+        """
+        Append tag records (same order as the texts)
+        
+        Args:
+            tags: Structured array of TAG_FIELDS rows
+        """
+        import numpy as np  # Lazy import
+        
+        with self._lock:
+            self._pending_tags.append(np.asarray(tags, dtype=TAG_FIELDS))
+    
+    # Writes
+    
+    def append(self, text, metadata=None):
+        """
+        Append a document
+        
+        Args:
+            text: Document text
+            metadata: Optional JSON-serialisable dict (title, section, url)
+        
+        Returns:
+            int: Id assigned to the document
+        """
+        with self._lock:
+            self._pending.append(text)
+            self._pending_meta.append(metadata)
+            return len(self) - 1
+    
+    def extend(self, texts, metadatas=None):
+        """
+        Append several documents
+        
+        Args:
+            texts: Iterable of document texts
+            metadatas: Optional list of metadata dicts, parallel to texts
+        
+        Returns:
+            range: Ids assigned to the documents
+        """
+        with self._lock:
+            start = len(self)
+            self._pending.extend(texts)
+            added = len(self) - start
+            self._pending_meta.extend(metadatas if metadatas is not None else [None] * added)
+            return range(start, len(self))
+    
+    def save(self, path=None):
+        """
+        Persist buffered documents
+        
+        Saving to the store's own path only appends the new documents;
+        saving to a different path writes a full copy and switches to it.
+        
+        Args:
+            path: Base path without extension (defaults to the current path)
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("DocStore.save() needs a path for an unsaved store")
+        
+        try:
+            with self._lock:
+                if path == self.path:
+                    texts = self._pending
+                    metadatas = self._pending_meta
+                    vectors = self._pending_vectors
+                    tags = self._pending_tags
+                    # Stores written before the metadata column get {} for older documents
+                    meta_backfill = self._committed() - self._meta.count
+                else:
+                    texts = list(self.texts())
+                    metadatas = [self.get_metadata(doc_id) or None for doc_id in range(len(self))]
+                    vectors = [self.get_vectors(range(self.vector_count))] if self.vector_count else []
+                    tags = [self.get_tags()] if self.tag_count else []
+                    meta_backfill = 0
+                    self._switch_path(path)
+                
+                self._texts.append(text.encode('utf-8') for text in texts)
+                if self._meta.count or any(metadatas):
+                    self._meta.append(
+                        [b'{}'] * meta_backfill + [encode_metadata(meta) for meta in metadatas]
+                    )
+                self._append_vectors_to_disk(vectors)
+                self._append_tags_to_disk(tags)
+                
+                self._pending, self._pending_meta, self._pending_vectors, self._pending_tags = [], [], [], []
+                self._texts.open()
+                if self._meta.exists():
+                    self._meta.open()
+                self._vectors = map_vectors(self.path + '.f16')
+                self._tags = map_tags(self.path + '.tags')
+            return True
+        
+        except Exception as e:
+            print(f"Error saving document store: {str(e)}")
+            return False
+    
+    def close(self):
+        """Release the memory maps"""
+        with self._lock:
+            for column in (self._texts, self._meta):
+                if column:
+                    column.close()
+            self._vectors = None
+            self._tags = None
+    
+    # Internals
+    
+    def _committed(self):
+        return self._texts.count if self._texts else 0
+    
+    def _switch_path(self, path):
+        """Point the store at a new, empty location"""
+        self.close()
+        self.path = path
+        self._texts = RecordFile(path)
+        self._meta = RecordFile(path + '.meta')
+        self._texts.remove()
+        self._meta.remove()
+        for column_path in (path + '.f16', path + '.tags'):
+            if os.path.exists(column_path):
+                os.remove(column_path)
+    
+    def _append_vectors_to_disk(self, batches):
+        """Append float16 vector rows to the vector column file"""
+        import numpy as np  # Lazy import
+        
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return
+        
+        rows = np.concatenate(batches).astype('<f2')
+        vectors_path = self.path + '.f16'
+        if not os.path.exists(vectors_path):
+            with open(vectors_path, 'wb') as f:
+                f.write(VECTORS_MAGIC + DIMENSION.pack(rows.shape[1]))
+        
+        header_size = len(VECTORS_MAGIC) + DIMENSION.size
+        committed = len(self._vectors) if self._vectors is not None else 0
+        with open(vectors_path, 'r+b') as f:
+            f.seek(header_size + committed * rows.shape[1] * rows.itemsize)
+            f.write(rows.tobytes())
+            f.truncate()
+
+    def _append_tags_to_disk(self, batches):
+        """Append tag records to the tags column file"""
+        import numpy as np  # Lazy import
+        
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return
+        
+        rows = np.concatenate(batches).astype(TAG_FIELDS)
+        tags_path = self.path + '.tags'
+        if not os.path.exists(tags_path):
+            with open(tags_path, 'wb') as f:
+                f.write(TAGS_MAGIC)
+        
+        committed = len(self._tags) if self._tags is not None else 0
+        with open(tags_path, 'r+b') as f:
+            f.seek(len(TAGS_MAGIC) + committed * rows.itemsize)
+            f.write(rows.tobytes())
+            f.truncate()
+
+def encode_metadata(metadata):
+    """Compact JSON encoding of a metadata record"""
+    return json.dumps(metadata or {}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def map_file(path):
+    """Memory-map a file read-only (None for missing or empty files)"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def map_vectors(path):
+    """Memory-map a float16 vector column as a (n, dimension) array (None if absent)"""
+    if not os.path.exists(path):
+        return None
+    
+    import numpy as np  # Lazy import
+    
+    header_size = len(VECTORS_MAGIC) + DIMENSION.size
+    with open(path, 'rb') as f:
+        header = f.read(header_size)
+    if len(header) < header_size or header[:len(VECTORS_MAGIC)] != VECTORS_MAGIC:
+        raise ValueError(f"Not a vector column: {path}")
+    
+    dimension = DIMENSION.unpack_from(header, len(VECTORS_MAGIC))[0]
+    rows = (os.path.getsize(path) - header_size) // (2 * dimension)
+    if rows == 0:
+        return None
+    return np.memmap(path, dtype='<f2', mode='r', offset=header_size, shape=(rows, dimension))
+
+def map_tags(path):
+    """Memory-map a tags column as a structured TAG_FIELDS array (None if absent)"""
+    if not os.path.exists(path):
+        return None
+    
+    import numpy as np  # Lazy import
+    
+    with open(path, 'rb') as f:
+        if f.read(len(TAGS_MAGIC)) != TAGS_MAGIC:
+            raise ValueError(f"Not a tags column: {path}")
+    
+    dtype = np.dtype(TAG_FIELDS)
+    rows = (os.path.getsize(path) - len(TAGS_MAGIC)) // dtype.itemsize
+    if rows == 0:
+        return None
+    return np.memmap(path, dtype=dtype, mode='r', offset=len(TAGS_MAGIC), shape=(rows,))
+
+def exists(path):
+    """Check whether a document store exists at a base path"""
+    return os.path.exists(path + '.idx') and os.path.exists(path + '.dat')
+
+def migrate_json_text_map(json_path, path):
+    """
+    Convert a legacy JSON text map ({"0": text, ...}) into a document store
+    
+    Args:
+        json_path: Path to the legacy JSON text map
+        path: Base path for the new document store
+    
+    Returns:
+        DocStore: Migrated store
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        text_map = json.load(f)
+    
+    store = DocStore()
+    store.extend(text_map[key] for key in sorted(text_map, key=int))
+    if not store.save(path):
+        raise IOError(f"Could not write document store at {path}")
+    
+    print(f"Migrated {len(store)} documents from {json_path} to document store")
+    return store
@@ -0,0 +1,321 @@
+"""
+Gazetteer of historical entities with single-pass extraction
+
+Known names (people, places, empires, events, periods) come from the typed
+keyword groups in history_utils, the ingestion topic list and the titles of
+ingested articles. They are stored in a token trie: each node is one
+lowercased word, so extraction walks the text's tokens once and at each
+position follows the trie for the longest known name. Dates ("1066 AD",
+"in 1453", "1960s") and centuries ("5th century BC") are recognised in the
+same pass.
+
+Ingestion tags every document with a compact entity summary (see
+tag_documents), so retrieval can filter on entities without extracting
+them per query. Titles learned at ingestion are saved to GAZETTEER_FILE
+and loaded by the server.
+"""
+import json
+import os
+import re
+import threading
+
+from .history_utils import (
+    HISTORICAL_EMPIRES, HISTORICAL_EVENTS, HISTORICAL_FIGURES,
+    HISTORICAL_PERIODS, HISTORICAL_PLACES
+)
+
+# Words joined by hyphens stay one token ("d-day", "twenty-first", "1632-1653")
+TOKEN_PATTERN = re.compile(r'[^\W_]+(?:-[^\W_]+)*')
+GLUED_DATE_PATTERN = re.compile(r'(\d{1,4})(bce|bc|ad|ce)')
+ORDINAL_PATTERN = re.compile(r'(\d{1,2})(?:st|nd|rd|th)')
+DECADE_PATTERN = re.compile(r'(\d{3})0s')
+YEAR_RANGE_PATTERN = re.compile(r'(\d{3,4})-(\d{2,4})')
+
+ORDINAL_WORDS = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5, 'sixth': 6, 'seventh': 7,
+    'eighth': 8, 'ninth': 9, 'tenth': 10, 'eleventh': 11, 'twelfth': 12, 'thirteenth': 13,
+    'fourteenth': 14, 'fifteenth': 15, 'sixteenth': 16, 'seventeenth': 17, 'eighteenth': 18,
+    'nineteenth': 19, 'twentieth': 20, 'twenty-first': 21
+}
+ERAS = {'bc': -1, 'bce': -1, 'ad': 1, 'ce': 1}
+CENTURY_WORDS = {'century', 'centuries'}
+# Words after which a bare four-digit number is read as a year
+YEAR_CUES = {'in', 'since', 'until', 'till', 'by', 'from', 'to', 'around', 'circa', 'c', 'year', 'during', 'after', 'before'}
+
+# Entity kinds in extraction results, in display order
+ENTITY_KINDS = ('people', 'places', 'empires', 'events', 'periods', 'topics')
+
+KEYWORD_KINDS = [
+    (HISTORICAL_FIGURES, 'people'),
+    (HISTORICAL_PLACES, 'places'),
+    (HISTORICAL_EMPIRES, 'empires'),
+    (HISTORICAL_EVENTS, 'events'),
+    (HISTORICAL_PERIODS, 'periods')
+]
+
+# Words that give away the kind of an article title ("Mali Empire", "Battle of X")
+TITLE_KIND_WORDS = [
+    ('empires', {'empire', 'dynasty', 'kingdom', 'sultanate', 'caliphate', 'civilization', 'civilisation'}),
+    ('events', {'war', 'wars', 'battle', 'revolution', 'restoration', 'movement', 'crusades', 'siege',
+                'mutiny', 'rebellion', 'reformation', 'exchange', 'race', 'depression', 'holocaust', 'fall'}),
+    ('periods', {'age', 'era', 'period', 'renaissance', 'enlightenment'}),
+    ('places', {'museum', 'museums', 'gallery', 'wall', 'fort', 'temple', 'caves', 'palace', 'city',
+                'pyramids', 'pyramid', 'cathedral', 'institution', 'minar', 'abbey', 'castle'})
+]
+
+def tokenize(text):
+    """Lowercased word tokens with their (start, end) offsets in text"""
+    return [(match.group(0).lower(), match.start(), match.end()) for match in TOKEN_PATTERN.finditer(text)]
+
+def title_kind(title):
+    """Entity kind for an article title, from its words ("topics" if unclear)"""
+    words = [token for token, _, _ in tokenize(title)]
+    for kind, hints in TITLE_KIND_WORDS:
+        if any(word in hints for word in words):
+            return kind
+    return 'topics'
+
+class Gazetteer:
+    """
+    Token trie of known entity names plus date and century recognition
+    """
+    
+    def __init__(self):
+        self._trie = {}
+        self._titles = {}  # Learned titles -> kind, saved with save_titles
+        self._lock = threading.Lock()
+        self.size = 0
+    
+    def __len__(self):
+        return self.size
+    
+    def add(self, name, kind):
+        """
+        Add a name; an existing name keeps its first kind
+        
+        Args:
+            name: Entity name, any case ("Battle of Plassey")
+            kind: One of ENTITY_KINDS
+        """
+        tokens = [token for token, _, _ in tokenize(name)]
+        if not tokens:
+            return
+        
+        with self._lock:
+            node = self._trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if '' not in node:
+                node[''] = (name, kind)
+                self.size += 1
+    
+    def add_titles(self, titles):
+        """Add article or topic titles, typed by title_kind"""
+        for title in titles:
+            if title and title not in self._titles:
+                kind = title_kind(title)
+                self._titles[title] = kind
+                self.add(title, kind)
+    
+    def extract(self, text):
+        """
+        Find dates, centuries and known entities in one pass over text
+        
+        Args:
+            text: Any text
+        
+        Returns:
+            dict: 'dates' and 'centuries' as {text, start, end, start_year,
+            end_year} (BC years negative) and one list per ENTITY_KINDS of
+            {text, name, start, end}, in order of appearance
+        """
+        result = {'dates': [], 'centuries': [], **{kind: [] for kind in ENTITY_KINDS}}
+        tokens = tokenize(text or '')
+        i = 0
+        while i < len(tokens):
+            found = self._match_time(tokens, i) or self._match_name(tokens, i)
+            if not found:
+                i += 1
+                continue
+            
+            kind, length, fields = found
+            start, end = tokens[i][1], tokens[i + length - 1][2]
+            result[kind].append({'text': text[start:end], 'start': start, 'end': end, **fields})
+            i += length
+        return result
+    
+    def extract_batch(self, texts):
+        """extract() for many texts (e.g. a batch of ingested documents)"""
+        return [self.extract(text) for text in texts]
+    
+    def tag_documents(self, texts, metadatas, learn_titles=True):
+        """
+        Add an 'entities' summary (see entity_summary) to each metadata dict
+        
+        Args:
+            texts: Document texts
+            metadatas: Matching metadata dicts, updated in place
+            learn_titles: First add the documents' titles to the gazetteer,
+                so documents about the same article find each other
+        """
+        if learn_titles:
+            self.add_titles(metadata.get('title') for metadata in metadatas if metadata)
+        for metadata, entities in zip(metadatas, self.extract_batch(texts)):
+            if metadata is not None:
+                summary = entity_summary(entities)
+                if summary:
+                    metadata['entities'] = summary
+    
+    def save_titles(self, path):
+        """Write the learned titles, so the server's gazetteer knows them too"""
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(sorted(self._titles), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not save gazetteer titles: {str(e)}")
+    
+    def load_titles(self, path):
+        """Add titles saved by save_titles (a missing file is not an error)"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.add_titles(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Could not load gazetteer titles: {str(e)}")
+    
+    def _match_name(self, tokens, i):
+        """Longest known name starting at token i"""
+        node, best = self._trie, None
+        for j in range(i, len(tokens)):
+            token = tokens[j][0]
+            child = node.get(token)
+            if child is None and token.endswith('s') and len(token) > 3:
+                child = node.get(token[:-1])  # Plural of a name ("Incas" -> "inca")
+            if child is None:
+                break
+            node = child
+            if '' in node:
+                best = (j - i + 1, node[''])
+        
+        if best is None:
+            return None
+        length, (name, kind) = best
+        return kind, length, {'name': name}
+    
+    def _match_time(self, tokens, i):
+        """Date or century starting at token i"""
+        token = tokens[i][0]
+        following = tokens[i + 1][0] if i + 1 < len(tokens) else ''
+        
+        number = ordinal_number(token)
+        if number:
+            last = number
+            length = 1
+            # "15th and 16th centuries", "12th to 14th century"
+            if following in ('and', 'to', 'or') and i + 2 < len(tokens) and ordinal_number(tokens[i + 2][0]):
+                last = ordinal_number(tokens[i + 2][0])
+                length = 3
+            if i + length < len(tokens) and tokens[i + length][0] in CENTURY_WORDS:
+                era = ERAS.get(tokens[i + length + 1][0]) if i + length + 1 < len(tokens) else None
+                length += 2 if era else 1
+                if era == -1:
+                    years = (-max(number, last) * 100, -(min(number, last) - 1) * 100 - 1)
+                else:
+                    years = ((min(number, last) - 1) * 100, max(number, last) * 100 - 1)
+                return 'centuries', length, {'start_year': years[0], 'end_year': years[1]}
+        
+        glued = GLUED_DATE_PATTERN.fullmatch(token)
+        if glued:
+            year = int(glued.group(1)) * ERAS[glued.group(2)]
+            return 'dates', 1, {'start_year': year, 'end_year': year}
+        
+        if token.isdigit() and len(token) <= 4:
+            if following in ERAS:
+                year = int(token) * ERAS[following]
+                return 'dates', 2, {'start_year': year, 'end_year': year}
+            if len(token) == 4 and i > 0 and tokens[i - 1][0] in YEAR_CUES:
+                return 'dates', 1, {'start_year': int(token), 'end_year': int(token)}
+        
+        if token == 'ad' and following.isdigit() and len(following) <= 4:
+            return 'dates', 2, {'start_year': int(following), 'end_year': int(following)}
+        
+        year_range = YEAR_RANGE_PATTERN.fullmatch(token)
+        if year_range:
+            start, end = year_range.group(1), year_range.group(2)
+            end = int(start[:len(start) - len(end)] + end)  # "1632-53" -> 1653
+            if end >= int(start):
+                return 'dates', 1, {'start_year': int(start), 'end_year': end}
+        
+        decade = DECADE_PATTERN.fullmatch(token)
+        if decade:
+            start = int(decade.group(1)) * 10
+            return 'dates', 1, {'start_year': start, 'end_year': start + 9}
+        return None
+
+def ordinal_number(token):
+    """1-21 for "5th" or "fifth", else None"""
+    ordinal = ORDINAL_PATTERN.fullmatch(token)
+    return int(ordinal.group(1)) if ordinal else ORDINAL_WORDS.get(token)
+
+def entity_summary(entities):
+    """
+    Compact, JSON-friendly summary of extract() results for document tags
+    
+    Returns:
+        dict: Unique names per entity kind, plus 'years' as [first, last]
+        covering every date and century (empty kinds are left out)
+    """
+    summary = {}
+    for kind in ENTITY_KINDS:
+        names = list(dict.fromkeys(entity['name'] for entity in entities[kind]))
+        if names:
+            summary[kind] = names
+    
+    spans = entities['dates'] + entities['centuries']
+    if spans:
+        summary['years'] = [min(span['start_year'] for span in spans), max(span['end_year'] for span in spans)]
+    return summary
+
+def build_gazetteer(titles=()):
+    """
+    Gazetteer of the typed history keywords plus extra titles
+    
+    Args:
+        titles: Topic or article titles to add
+    
+    Returns:
+        Gazetteer: New gazetteer
+    """
+    gazetteer = Gazetteer()
+    for keywords, kind in KEYWORD_KINDS:
+        for keyword in sorted(keywords):
+            gazetteer.add(keyword, kind)
+    gazetteer.add_titles(titles)
+    return gazetteer
+
+# Global state
+gazetteer = None
+gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """Get (or build) the process-wide gazetteer, with titles from GAZETTEER_FILE"""
+    global gazetteer
+    
+    if gazetteer is not None:
+        return gazetteer
+    
+    with gazetteer_lock:
+        if gazetteer is None:
+            built = build_gazetteer()
+            try:
+                from config import get_config
+                
+                built.load_titles(get_config().GAZETTEER_FILE)
+            except (ImportError, AttributeError):
+                pass
+            gazetteer = built
+        return gazetteer
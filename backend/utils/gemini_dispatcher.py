@@ -0,0 +1,250 @@
+"""
+Concurrency limiter and backpressure for Gemini calls
+
+Every Gemini request goes through one dispatcher per process. At most
+max_in_flight requests run at once; further callers wait in a bounded
+queue for up to queue_timeout seconds. A caller that finds the queue full,
+or is still waiting when its timeout expires, gets GeminiBusyError straight
+away, so routes can answer 503 instead of piling up threads.
+
+Requests rejected by Gemini with 429 or 503 are retried inside the slot,
+after the delay Gemini asks for (retry_delay / "retry in Ns") or a jittered
+exponential backoff. A retry delay longer than backoff_max is not waited
+for: the error is raised so the caller can fall back.
+"""
+import math
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Exception class names the Google SDKs use for throttling / overload
+THROTTLE_ERRORS = frozenset(['ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable'])
+THROTTLE_CODES = frozenset([429, 503])
+
+RETRY_DELAY_PATTERNS = [
+    re.compile(r'retry in (\d+(?:\.\d+)?)\s*s', re.IGNORECASE),
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)', re.IGNORECASE)
+]
+
+class GeminiBusyError(Exception):
+    """Raised when a Gemini request cannot be admitted (queue full or wait timed out)"""
+    
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def is_throttled(error):
+    """Whether an SDK exception is a 429 / 503 worth retrying"""
+    if type(error).__name__ in THROTTLE_ERRORS:
+        return True
+    code = getattr(error, 'code', None)
+    code = getattr(code, 'value', code)  # grpc.StatusCode or int
+    return code in THROTTLE_CODES
+
+def get_retry_after(error):
+    """
+    Delay Gemini asked for before retrying
+    
+    Returns:
+        float: Seconds, or None if the error does not say
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    header = headers.get('Retry-After') if hasattr(headers, 'get') else None
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+    
+    message = str(error)
+    for pattern in RETRY_DELAY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+class GeminiDispatcher:
+    """
+    Bounded in-flight limit with a bounded, timed wait queue
+    """
+    
+    def __init__(self, max_in_flight=8, max_queue=32, queue_timeout=10.0, max_retries=2,
+                 backoff_base=1.0, backoff_max=8.0):
+        """
+        Args:
+            max_in_flight: Concurrent Gemini requests
+            max_queue: Callers allowed to wait for a slot (0 = reject when full)
+            queue_timeout: Seconds a caller waits for a slot
+            max_retries: Retries after a 429 / 503
+            backoff_base: First backoff delay in seconds
+            backoff_max: Longest retry delay that is waited for
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._stats = {
+            'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0,
+            'throttled': 0, 'retries': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0, 'busy_ms_total': 0.0
+        }
+    
+    @contextmanager
+    def slot(self):
+        """
+        Hold one in-flight slot, waiting in the queue if needed
+        
+        Raises:
+            GeminiBusyError: Queue full, or no slot within queue_timeout
+        """
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._stats['busy_ms_total'] += (time.perf_counter() - start) * 1000
+                self._cond.notify()
+    
+    def call(self, func, *args, **kwargs):
+        """Run func in a slot, retrying 429 / 503 responses"""
+        with self.slot():
+            return self.with_retries(func, *args, **kwargs)
+    
+    def with_retries(self, func, *args, **kwargs):
+        """
+        Run func, retrying throttled requests after the requested delay
+        
+        Raises:
+            The last error once retries are exhausted or the delay is too long
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_throttled(e):
+                    raise
+                with self._cond:
+                    self._stats['throttled'] += 1
+                
+                delay = get_retry_after(e)
+                if delay is None:
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                if attempt >= self.max_retries or delay > self.backoff_max:
+                    raise
+                
+                print(f"Gemini throttled ({type(e).__name__}), retrying in {delay:.1f}s")
+                with self._cond:
+                    self._stats['retries'] += 1
+                time.sleep(delay)
+    
+    def _acquire(self):
+        start = time.perf_counter()
+        with self._cond:
+            if self._in_flight < self.max_in_flight and not self._waiting:
+                self._admit(start)
+                return
+            
+            if self._waiting >= self.max_queue:
+                self._stats['rejected_queue_full'] += 1
+                raise GeminiBusyError(
+                    f"Gemini is busy ({self._in_flight} requests running, {self._waiting} queued); "
+                    f"please retry shortly",
+                    retry_after=self._suggest_retry_after()
+                )
+            
+            self._waiting += 1
+            self._stats['queued'] += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['rejected_timeout'] += 1
+                        raise GeminiBusyError(
+                            f"Gemini is busy: no slot free after {self.queue_timeout:g}s; please retry shortly",
+                            retry_after=self._suggest_retry_after()
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._admit(start)
+    
+    def _admit(self, start):
+        wait_ms = (time.perf_counter() - start) * 1000
+        self._in_flight += 1
+        self._stats['admitted'] += 1
+        self._stats['wait_ms_total'] += wait_ms
+        self._stats['wait_ms_max'] = max(self._stats['wait_ms_max'], wait_ms)
+    
+    def _suggest_retry_after(self):
+        """Seconds until a slot is likely free (mean request time x queue turns)"""
+        admitted = self._stats['admitted']
+        mean_seconds = self._stats['busy_ms_total'] / admitted / 1000 if admitted else 1.0
+        turns = (self._waiting + 1) / max(1, self.max_in_flight)
+        return max(1, math.ceil(mean_seconds * turns))
+    
+    def stats(self):
+        """Queue depth, wait times, rejections and throttling counters"""
+        with self._cond:
+            admitted = self._stats['admitted']
+            return {
+                'in_flight': self._in_flight,
+                'queue_depth': self._waiting,
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'admitted': admitted,
+                'queued': self._stats['queued'],
+                'rejected_queue_full': self._stats['rejected_queue_full'],
+                'rejected_timeout': self._stats['rejected_timeout'],
+                'throttled': self._stats['throttled'],
+                'retries': self._stats['retries'],
+                'wait_ms_mean': round(self._stats['wait_ms_total'] / admitted, 1) if admitted else 0.0,
+                'wait_ms_max': round(self._stats['wait_ms_max'], 1),
+                'request_ms_mean': round(self._stats['busy_ms_total'] / admitted, 1) if admitted else 0.0
+            }
+
+# Global state
+dispatcher = None
+dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    """Get (or create) the process-wide Gemini dispatcher sized from config"""
+    global dispatcher
+    
+    if dispatcher is not None:
+        return dispatcher
+    
+    with dispatcher_lock:
+        if dispatcher is None:
+            try:
+                from config import get_config
+                
+                cfg = get_config()
+                dispatcher = GeminiDispatcher(
+                    max_in_flight=cfg.GEMINI_MAX_IN_FLIGHT,
+                    max_queue=cfg.GEMINI_MAX_QUEUE,
+                    queue_timeout=cfg.GEMINI_QUEUE_TIMEOUT,
+                    max_retries=cfg.GEMINI_MAX_RETRIES,
+                    backoff_max=cfg.GEMINI_BACKOFF_MAX
+                )
+            except (ImportError, AttributeError):
+                dispatcher = GeminiDispatcher()
+        return dispatcher
+
+def get_dispatcher_stats():
+    """Stats of the dispatcher, or None before the first Gemini call"""
+    return dispatcher.stats() if dispatcher is not None else None
+
+def reset_dispatcher():
+    """Drop the dispatcher in a forked worker (its lock may be held by a parent thread)"""
+    global dispatcher
+    dispatcher = None
@@ -0,0 +1,320 @@
+"""
+Pool of Gemini API keys with quota-aware routing
+
+genai.configure() sets one process-wide key, which caps throughput at that
+key's per-minute quota. The pool instead holds one GenerativeModel per key,
+each pinned to a client for its own key, and routes every request to the
+usable key with the most remaining budget.
+
+Each key has a per-minute and a per-day token bucket (RATE_LIMIT_PER_MINUTE
+/ RATE_LIMIT_PER_DAY by default). A 429 pauses the key for the delay Gemini
+asks for and the request moves to the next key; after repeated 429s the key
+is ejected for a while. Keys Gemini rejects as invalid are disabled.
+
+Budgets are kept per process. Every gunicorn worker builds its own pool,
+so each key's budget is split evenly across GEMINI_POOL_WORKERS
+(WEB_CONCURRENCY) processes: together they never exceed the key's quota,
+but one busy worker cannot borrow an idle worker's share, and a worker
+sees only its own share in /api/status. Gemini's 429s still pause a key
+in the worker that received them only.
+
+Binding a model to its own key relies on google-generativeai internals
+(client._ClientManager, GenerativeModel._client), hence the 0.8.x pin in
+requirements.txt. If another SDK version lacks them, no key is pooled and
+requests use the single key passed to genai.configure().
+"""
+import hashlib
+import math
+import threading
+import time
+
+from .gemini_dispatcher import GeminiBusyError, get_retry_after, is_throttled
+from .rate_limit import TokenBucket
+
+# Errors meaning the key itself cannot be used
+INVALID_KEY_ERRORS = frozenset(['PermissionDenied', 'Unauthenticated'])
+
+def key_fingerprint(api_key):
+    """Short, non-reversible id for showing a key in logs and /api/status"""
+    return 'key-' + hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:8]
+
+def make_model(api_key, model_name):
+    """
+    GenerativeModel that always uses api_key, whatever genai.configure() says
+    
+    Args:
+        api_key: Gemini API key
+        model_name: Model to use, e.g. "models/gemini-1.5-flash"
+    
+    Returns:
+        GenerativeModel: Model bound to its own client, or None if the
+            installed SDK has no per-client API
+    """
+    import google.generativeai as genai
+    
+    try:
+        from google.generativeai import client as genai_client
+        
+        manager = genai_client._ClientManager()
+        manager.configure(api_key=api_key)
+        model = genai.GenerativeModel(model_name)
+        if not hasattr(model, '_client'):
+            raise AttributeError("GenerativeModel has no _client")
+        model._client = manager.get_default_client('generative')
+        return model
+    except (ImportError, AttributeError, TypeError) as e:
+        print(f" Gemini key pool unavailable with google-generativeai {getattr(genai, '__version__', '?')}: {str(e)}")
+        print(" Note: requests will use the configured key only")
+        return None
+
+class PooledKey:
+    """One API key, its model and its rate budget"""
+    
+    def __init__(self, api_key, model, per_minute, per_day):
+        self.api_key = api_key
+        self.model = model
+        self.fingerprint = key_fingerprint(api_key)
+        self.minute_budget = TokenBucket(per_minute / 60.0, capacity=per_minute)
+        self.day_budget = TokenBucket(per_day / 86400.0, capacity=per_day)
+        self.consecutive_throttles = 0
+        self.paused_until = 0.0
+        self.disabled = False
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'ejections': 0}
+    
+    def usable(self, now):
+        return not self.disabled and self.paused_until <= now
+    
+    def remaining(self):
+        """Fraction of budget left (the tighter of the minute and day budgets)"""
+        return min(
+            self.minute_budget.available / self.minute_budget.capacity,
+            self.day_budget.available / self.day_budget.capacity
+        )
+    
+    def wait_for_budget(self):
+        """Seconds until both budgets hold a token"""
+        waits = [0.0]
+        for bucket in (self.minute_budget, self.day_budget):
+            if bucket.rate > 0:
+                waits.append(max(0.0, (1 - bucket.available) / bucket.rate))
+        return max(waits)
+
+class GeminiKeyPool:
+    """
+    Routes Gemini requests across keys by remaining budget
+    """
+    
+    def __init__(self, per_minute=50, per_day=1500, eject_after=3, eject_seconds=60.0, budget_wait=5.0,
+                 workers=1):
+        """
+        Args:
+            per_minute: Default requests per minute per key
+            per_day: Default requests per day per key
+            eject_after: Consecutive 429s before a key is ejected
+            eject_seconds: How long an ejected key is skipped
+            budget_wait: Longest wait for budget before raising GeminiBusyError
+            workers: Processes sharing each key; each gets 1/workers of its budget
+        """
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.workers = max(1, workers)
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.budget_wait = budget_wait
+        self.keys = []
+        self._lock = threading.Lock()
+    
+    def add(self, api_key, model_name, per_minute=None, per_day=None):
+        """
+        Register a key (or switch an already registered key to model_name)
+        
+        Returns:
+            PooledKey: The pool entry, or None if the SDK cannot pool keys
+        """
+        model = make_model(api_key, model_name)
+        if model is None:
+            return None
+        
+        with self._lock:
+            for key in self.keys:
+                if key.api_key == api_key:
+                    key.model = model
+                    key.disabled = False
+                    return key
+            
+            key = PooledKey(
+                api_key, model,
+                max(1.0, (per_minute or self.per_minute) / self.workers),
+                max(1.0, (per_day or self.per_day) / self.workers)
+            )
+            self.keys.append(key)
+            print(f" Gemini key pool: added {key.fingerprint} ({model_name}), {len(self.keys)} key(s)")
+            return key
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def acquire(self, exclude=()):
+        """
+        Take one request of budget from the usable key with the most left
+        
+        Args:
+            exclude: Keys not to use (already tried for this request)
+        
+        Returns:
+            PooledKey: Key to send the request with
+        
+        Raises:
+            GeminiBusyError: No key usable, or no budget within budget_wait
+        """
+        deadline = time.monotonic() + self.budget_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                candidates = [key for key in self.keys if key.usable(now) and key not in exclude]
+                if not candidates:
+                    paused = [key.paused_until - now for key in self.keys if not key.disabled and key not in exclude]
+                    raise GeminiBusyError(
+                        "No Gemini API key available (all keys paused, ejected or disabled)",
+                        retry_after=max(1, math.ceil(min(paused))) if paused else 60
+                    )
+                
+                candidates.sort(key=lambda key: key.remaining(), reverse=True)
+                for key in candidates:
+                    if key.day_budget.available >= 1 and key.minute_budget.try_acquire():
+                        key.day_budget.try_acquire()
+                        key.stats['requests'] += 1
+                        return key
+                
+                wait = min(key.wait_for_budget() for key in candidates)
+            
+            if now + wait > deadline:
+                raise GeminiBusyError(
+                    "All Gemini API keys are out of quota; please retry shortly",
+                    retry_after=max(1, math.ceil(wait))
+                )
+            time.sleep(min(wait, 0.5) or 0.01)
+    
+    def run(self, request):
+        """
+        Run request(model) on the best key, moving to another key on 429
+        
+        Args:
+            request: Function taking a GenerativeModel and calling Gemini
+        
+        Returns:
+            The request's result
+        
+        Raises:
+            The last Gemini error when no other key can take the request
+        """
+        tried = []
+        while True:
+            key = self.acquire(exclude=tried)
+            try:
+                result = request(key.model)
+            except Exception as e:
+                tried.append(key)
+                if is_throttled(e):
+                    self._throttled(key, e)
+                elif type(e).__name__ in INVALID_KEY_ERRORS:
+                    key.disabled = True
+                    key.stats['errors'] += 1
+                    print(f" Gemini key pool: disabled {key.fingerprint} ({type(e).__name__})")
+                else:
+                    key.stats['errors'] += 1
+                    raise
+                
+                if not self._has_usable(exclude=tried):
+                    raise
+                continue
+            
+            key.consecutive_throttles = 0
+            return result
+    
+    def _throttled(self, key, error):
+        """Pause a key after a 429; eject it after repeated 429s"""
+        retry_after = get_retry_after(error) or 0.0
+        with self._lock:
+            key.stats['throttled'] += 1
+            key.consecutive_throttles += 1
+            pause = retry_after
+            if key.consecutive_throttles >= self.eject_after:
+                pause = max(self.eject_seconds, retry_after)
+                key.consecutive_throttles = 0
+                key.stats['ejections'] += 1
+                print(f" Gemini key pool: ejected {key.fingerprint} for {pause:g}s after repeated 429s")
+            key.paused_until = max(key.paused_until, time.monotonic() + pause)
+    
+    def model_names(self):
+        """Distinct models served by the enabled keys, in key order"""
+        with self._lock:
+            return list(dict.fromkeys(key.model.model_name for key in self.keys if not key.disabled))
+    
+    def _has_usable(self, exclude=()):
+        now = time.monotonic()
+        return any(key.usable(now) and key not in exclude for key in self.keys)
+    
+    def rebuild_clients(self):
+        """Recreate every key's client (after fork)"""
+        with self._lock:
+            for key in self.keys:
+                try:
+                    key.model = make_model(key.api_key, key.model.model_name) or key.model
+                except Exception as e:
+                    print(f"Gemini key pool: could not rebuild {key.fingerprint}: {str(e)}")
+    
+    def stats(self):
+        """Per-key budget, throttling and ejection state (keys are fingerprinted)"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'keys': [{
+                    'id': key.fingerprint,
+                    'model': key.model.model_name,
+                    'minute_remaining': int(key.minute_budget.available),
+                    'day_remaining': int(key.day_budget.available),
+                    **key.stats,
+                    'consecutive_throttles': key.consecutive_throttles,
+                    'paused_for': round(max(0.0, key.paused_until - now), 1),
+                    'disabled': key.disabled
+                } for key in self.keys],
+                'usable_keys': sum(1 for key in self.keys if key.usable(now)),
+                'per_minute': self.per_minute,
+                'per_day': self.per_day,
+                'workers': self.workers,
+                'budget_scope': 'this worker process (per-key budget / workers)'
+            }
+
+# Global state
+key_pool = None
+key_pool_lock = threading.Lock()
+
+def get_key_pool():
+    """Get (or create) the process-wide key pool with budgets from config"""
+    global key_pool
+    
+    if key_pool is not None:
+        return key_pool
+    
+    with key_pool_lock:
+        if key_pool is None:
+            try:
+                from config import get_config
+                
+                cfg = get_config()
+                key_pool = GeminiKeyPool(
+                    per_minute=cfg.RATE_LIMIT_PER_MINUTE,
+                    per_day=cfg.RATE_LIMIT_PER_DAY,
+                    eject_after=cfg.GEMINI_KEY_EJECT_AFTER,
+                    eject_seconds=cfg.GEMINI_KEY_EJECT_SECONDS,
+                    budget_wait=cfg.GEMINI_QUEUE_TIMEOUT,
+                    workers=cfg.GEMINI_POOL_WORKERS
+                )
+            except (ImportError, AttributeError):
+                key_pool = GeminiKeyPool()
+        return key_pool
+
+def get_key_pool_stats():
+    """Stats of the key pool, or None if no key is registered"""
+    return key_pool.stats() if key_pool is not None and len(key_pool) else None
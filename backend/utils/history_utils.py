@@ -3,15 +3,20 @@ Historical content utilities and domain validation
 """
 import re
 
-# Comprehensive historical keywords - worldwide coverage
-HISTORY_KEYWORDS = {
-    # General historical terms
+# Historical keywords by kind - worldwide coverage. The gazetteer uses the
+# kinds to type the entities it finds
+
+# General historical terms (not entities)
+HISTORY_TERMS = {
     "museum", "monument", "artifact", "historical", "history", "heritage", "exhibit",
     "dynasty", "emperor", "king", "queen", "ruler", "reign", "kingdom", "empire",
     "battle", "war", "treaty", "conquest", "rebellion", "revolution", "civilization",
     "ancient", "medieval", "renaissance", "colonial", "pre-modern", "modern", "contemporary",
-    "archaeology", "excavation", "ruins", "palace", "temple", "cathedral", "mosque",
-    
+    "archaeology", "excavation", "ruins", "palace", "temple", "cathedral", "mosque"
+}
+
+# People
+HISTORICAL_FIGURES = {
     # World historical figures
     "alexander", "caesar", "napoleon", "churchill", "gandhi", "mandela", "lincoln",
     "cleopatra", "hannibal", "genghis khan", "charlemagne", "leonardo da vinci",
@@ -22,8 +27,11 @@ HISTORY_KEYWORDS = {
     # Indian historical figures
     "shivaji", "akbar", "ashoka", "buddha", "chandragupta", "harsha", "prithviraj",
     "tipu sultan", "rani lakshmibai", "subhas chandra bose", "bhagat singh",
-    "nehru", "patel", "bose", "tilak", "rana pratap", "krishna deva raya",
-    
+    "nehru", "patel", "bose", "tilak", "rana pratap", "krishna deva raya"
+}
+
+# Civilizations, empires and dynasties
+HISTORICAL_EMPIRES = {
     # World civilizations and empires
     "roman empire", "byzantine", "ottoman", "persian", "chinese empire", "mayan",
     "aztec", "inca", "egyptian", "mesopotamian", "indus valley", "greek",
@@ -32,8 +40,11 @@ HISTORY_KEYWORDS = {
     
     # Indian civilizations
     "maurya", "gupta", "chola", "mughal", "maratha", "vijayanagara", "delhi sultanate",
-    "pallava", "chalukya", "rashtrakuta", "hoysala", "pandya", "satavahana",
-    
+    "pallava", "chalukya", "rashtrakuta", "hoysala", "pandya", "satavahana"
+}
+
+# Events, wars and conflicts
+HISTORICAL_EVENTS = {
     # World historical events
     "world war", "french revolution", "american revolution", "industrial revolution",
     "crusades", "black death", "renaissance", "reformation", "cold war",
@@ -45,6 +56,14 @@ HISTORY_KEYWORDS = {
     "battle of panipat", "battle of plassey", "jallianwala bagh", "dandi march",
     "civil disobedience", "non-cooperation", "khilafat movement",
     
+    # Wars and conflicts
+    "hundred years war", "thirty years war", "seven years war", "napoleonic wars",
+    "american civil war", "boer war", "vietnam war", "korean war", "gulf war",
+    "crimean war", "opium wars", "russo-japanese war"
+}
+
+# Places and monuments
+HISTORICAL_PLACES = {
     # Historical places worldwide
     "colosseum", "great wall", "pyramids", "stonehenge", "machu picchu",
     "petra", "angkor wat", "acropolis", "versailles", "forbidden city",
@@ -54,23 +73,26 @@ HISTORY_KEYWORDS = {
     # Indian historical places
     "taj mahal", "red fort", "qutub minar", "hampi", "ajanta", "ellora", "khajuraho",
     "sanchi", "fatehpur sikri", "golden temple", "meenakshi temple", "konark",
-    "victoria memorial", "gateway of india", "india gate", "charminar",
-    
+    "victoria memorial", "gateway of india", "india gate", "charminar"
+}
+
+# Periods, eras and cultural movements
+HISTORICAL_PERIODS = {
     # Historical periods and eras
     "stone age", "bronze age", "iron age", "classical period", "dark ages",
     "middle ages", "age of exploration", "enlightenment", "victorian era",
     "roaring twenties", "great depression", "atomic age", "space age",
     
-    # Wars and conflicts
-    "hundred years war", "thirty years war", "seven years war", "napoleonic wars",
-    "american civil war", "boer war", "vietnam war", "korean war", "gulf war",
-    "crimean war", "opium wars", "russo-japanese war",
-    
     # Cultural movements
     "humanism", "baroque", "romanticism", "impressionism", "modernism",
     "surrealism", "cubism", "art deco", "gothic", "neoclassical"
 }
 
+HISTORY_KEYWORDS = (
+    HISTORY_TERMS | HISTORICAL_FIGURES | HISTORICAL_EMPIRES
+    | HISTORICAL_EVENTS | HISTORICAL_PLACES | HISTORICAL_PERIODS
+)
+
 # Time period patterns
 TIME_PATTERNS = [
     r'\b\d{1,4}\s*(BC|BCE|AD|CE)\b',
@@ -91,72 +113,101 @@ HISTORICAL_QUERY_PATTERNS = [
     r'\bexplain\s+the\b.+(significance|importance|impact)\s+of\b'
 ]
 
+# Endings a keyword may take and still match ("wars", "empire's",
+# "revolutionary", "colonialism")
+KEYWORD_SUFFIXES = ["s", "es", "'s", "s'", "ary", "aries", "ism"]
+
+def keyword_trie_pattern(keywords):
+    """
+    Regex alternation for keywords, factored into a prefix trie
+    
+    A flat alternation of ~300 keywords tries every branch at every position;
+    with shared prefixes folded ("ba(?:roque|ttle(?: of p(?:anipat|lassey))?)")
+    the regex engine rejects most positions after one or two characters.
+    
+    Args:
+        keywords: Lowercase keywords
+        
+    Returns:
+        str: Non-capturing regex source matching any keyword
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End of a keyword
+    
+    def build(node):
+        if list(node) == ['']:
+            return ''
+        optional = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if optional:
+            body = '(?:' + body + ')?' if len(branches) > 1 or len(branches[0]) > 1 else body + '?'
+        return body
+    
+    return build(trie)
+
+KEYWORD_PATTERN = (
+    r'\b' + keyword_trie_pattern(sorted({keyword.lower() for keyword in HISTORY_KEYWORDS}))
+    + '(?:' + '|'.join(re.escape(suffix) for suffix in KEYWORD_SUFFIXES) + r')?\b'
+)
+
+def lowercase_pattern(pattern):
+    """Lowercase a regex's literal letters, leaving escapes such as \\S alone"""
+    return re.sub(r'\\.|[A-Z]', lambda match: match.group(0) if len(match.group(0)) > 1 else match.group(0).lower(), pattern)
+
+# Keywords, time patterns and query patterns in one regex, compiled once.
+# It is matched against the lowercased question: re.IGNORECASE makes a
+# pattern of this size several times slower
+HISTORICAL_REGEX = re.compile('|'.join(
+    '(?:' + lowercase_pattern(pattern) + ')'
+    for pattern in [KEYWORD_PATTERN] + TIME_PATTERNS + HISTORICAL_QUERY_PATTERNS
+))
+
 def is_historical_question(question):
     """
     Enhanced check for historical questions
     
+    Keywords match whole words (optionally with a suffix from
+    KEYWORD_SUFFIXES), so "software" no longer matches "war".
+    
     Args:
         question: User's question string
         
     Returns:
         bool: True if question is historical, False otherwise
     """
-    question_lower = question.lower()
-    
-    # Check for history keywords
-    if any(keyword.lower() in question_lower for keyword in HISTORY_KEYWORDS):
-        return True
-    
-    # Check for time-related patterns
-    for pattern in TIME_PATTERNS:
-        if re.search(pattern, question_lower, re.IGNORECASE):
-            return True
-    
-    # Check for historical query patterns
-    for pattern in HISTORICAL_QUERY_PATTERNS:
-        if re.search(pattern, question_lower, re.IGNORECASE):
-            return True
+    return HISTORICAL_REGEX.search(question.lower()) is not None
+
+def classify_questions(questions):
+    """
+    is_historical_question for many questions
     
-    return False
+    Args:
+        questions: List of question strings
+        
+    Returns:
+        list: One bool per question
+    """
+    return [HISTORICAL_REGEX.search(question.lower()) is not None for question in questions]
 
 def extract_historical_entities(text):
     """
-    Extract potential historical entities from text
+    Extract historical entities from text
     
     Args:
         text: Input text
         
     Returns:
-        dict: Extracted entities (dates, names, places, events)
+        dict: Dates, centuries, people, places, empires, events, periods and
+        topics with their spans (see gazetteer.Gazetteer.extract)
     """
-    entities = {
-        'dates': [],
-        'centuries': [],
-        'potential_names': [],
-        'potential_places': []
-    }
-    
-    text_lower = text.lower()
-    
-    # Extract dates
-    date_pattern = r'\b\d{1,4}\s*(BC|BCE|AD|CE)\b'
-    entities['dates'] = re.findall(date_pattern, text, re.IGNORECASE)
-    
-    # Extract centuries
-    century_pattern = r'\b\d{1,2}(st|nd|rd|th)\s+century\b'
-    entities['centuries'] = re.findall(century_pattern, text, re.IGNORECASE)
-    
-    # Extract known keywords
-    for keyword in HISTORY_KEYWORDS:
-        if keyword in text_lower:
-            if keyword.replace(' ', '').isalpha():  # Names/places are alphabetic
-                if len(keyword.split()) > 1 or keyword[0].isupper():
-                    if 'empire' in keyword or 'kingdom' in keyword:
-                        entities['potential_places'].append(keyword)
-                    else:
-                        entities['potential_names'].append(keyword)
+    from .gazetteer import get_gazetteer
     
-    return entities
+    return get_gazetteer().extract(text)
 
 def generate_history_prompt(question, relevant_context=None, wikipedia_info=None, museum_data=None):
     """
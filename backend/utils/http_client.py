@@ -0,0 +1,251 @@
+"""
+Shared upstream HTTP client
+
+One pooled, keep-alive requests.Session per upstream host (en.wikipedia.org,
+api.si.edu, ...), so repeated calls reuse TCP+TLS connections instead of
+paying a new handshake each time. Idempotent requests are retried with
+jittered exponential backoff on 429/5xx, honouring Retry-After up to
+HTTP_MAX_RETRY_AFTER seconds. Callers with their own retry loop (ingestion)
+pass retries=0 and get a separate session that never retries.
+
+Request-path callers run under a deadline (see request_deadline): every
+request made in that thread uses the time left as its timeout, is not
+retried, and fails at once when the deadline has passed, so a retrieval
+stage that gave up waiting does not keep a worker busy.
+
+Pool size, timeouts and the retry policy come from config.py.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# Global state
+sessions = {}
+sessions_lock = threading.Lock()
+host_stats = {}
+host_stats_lock = threading.Lock()
+request_context = threading.local()  # deadline of the calling thread, if any
+
+def get_client_config():
+    """Pool, timeout and retry settings (defaults when config is unavailable)"""
+    try:
+        from config import get_config
+        
+        cfg = get_config()
+        return {
+            'pool_size': cfg.HTTP_POOL_SIZE,
+            'connect_timeout': cfg.HTTP_CONNECT_TIMEOUT,
+            'read_timeout': cfg.HTTP_READ_TIMEOUT,
+            'retries': cfg.HTTP_RETRIES,
+            'backoff_factor': cfg.HTTP_BACKOFF_FACTOR,
+            'max_retry_after': cfg.HTTP_MAX_RETRY_AFTER
+        }
+    except (ImportError, AttributeError):
+        return {
+            'pool_size': 16, 'connect_timeout': 3.05, 'read_timeout': 10.0,
+            'retries': 2, 'backoff_factor': 0.3, 'max_retry_after': 5.0
+        }
+
+class CappedRetry(Retry):
+    """
+    Retry that waits at most max_retry_after seconds for a Retry-After
+    
+    Without the cap, a "Retry-After: 3600" from an upstream would hold a
+    request thread (and the user's answer) for an hour.
+    """
+    
+    def __init__(self, *args, max_retry_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+    
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.max_retry_after = self.max_retry_after
+        return retry
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None or self.max_retry_after is None:
+            return retry_after
+        return min(retry_after, self.max_retry_after)
+
+def make_retry(retries, backoff_factor, max_retry_after=None):
+    """
+    Retry policy for idempotent requests on connection errors and 429/5xx
+    
+    Args:
+        retries: Attempts after the first (0 disables retrying)
+        backoff_factor: Base of the exponential backoff, in seconds
+        max_retry_after: Longest Retry-After honoured, in seconds
+    
+    Returns:
+        CappedRetry: Policy for an HTTPAdapter
+    """
+    params = {
+        'total': retries,
+        'connect': retries,
+        'read': retries,
+        'status': retries,
+        'backoff_factor': backoff_factor,
+        'status_forcelist': RETRY_STATUS_CODES,
+        'allowed_methods': IDEMPOTENT_METHODS,
+        'respect_retry_after_header': True,
+        'raise_on_status': False  # Hand the final response back to the caller
+    }
+    try:
+        return CappedRetry(backoff_jitter=backoff_factor, max_retry_after=max_retry_after, **params)
+    except TypeError:
+        return CappedRetry(max_retry_after=max_retry_after, **params)  # urllib3 < 2 has no jitter option
+
+@contextmanager
+def request_deadline(deadline):
+    """
+    Bound every request made by this thread inside the block
+    
+    Args:
+        deadline: time.monotonic() value by which requests must be done
+    """
+    previous = getattr(request_context, 'deadline', None)
+    request_context.deadline = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        request_context.deadline = previous
+
+def get_session(host, retries=None):
+    """
+    Get (or create) the pooled session for a host
+    
+    Args:
+        host: Upstream host name, e.g. "en.wikipedia.org"
+        retries: Retry count for this session (default: HTTP_RETRIES)
+    
+    Returns:
+        requests.Session: Session with a keep-alive connection pool
+    """
+    session = sessions.get((host, retries))
+    if session is not None:
+        return session
+    
+    with sessions_lock:
+        if (host, retries) not in sessions:
+            settings = get_client_config()
+            adapter = HTTPAdapter(
+                pool_connections=2,  # http and https pools for this host
+                pool_maxsize=settings['pool_size'],
+                max_retries=make_retry(
+                    settings['retries'] if retries is None else retries,
+                    settings['backoff_factor'], settings['max_retry_after']
+                )
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            sessions[(host, retries)] = session
+            with host_stats_lock:
+                host_stats.setdefault(host, {'requests': 0, 'errors': 0, 'retries': 0})
+        return sessions[(host, retries)]
+
+def request(method, url, params=None, headers=None, timeout=None, retries=None, **kwargs):
+    """
+    Send a request through the host's pooled session
+    
+    Args:
+        method: HTTP method
+        url: Absolute URL
+        params: Query parameters
+        headers: Request headers
+        timeout: (connect, read) seconds; defaults to the configured timeouts
+        retries: Retry count, e.g. 0 for callers that retry themselves
+            (default: HTTP_RETRIES)
+        **kwargs: Passed through to requests
+    
+    Returns:
+        requests.Response: Final response (after retries)
+    """
+    host = urlsplit(url).netloc
+    if timeout is None:
+        settings = get_client_config()
+        timeout = (settings['connect_timeout'], settings['read_timeout'])
+    
+    deadline = getattr(request_context, 'deadline', None)
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"Deadline passed before requesting {host}")
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        timeout = tuple(min(value, remaining) for value in timeout)
+        retries = 0  # A retry would not fit in what is left
+    
+    session = get_session(host, retries)
+    stats = host_stats[host]
+    try:
+        response = session.request(method, url, params=params, headers=headers, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        with host_stats_lock:
+            stats['errors'] += 1
+        raise
+    
+    retries = getattr(response.raw, 'retries', None)
+    with host_stats_lock:
+        stats['requests'] += 1
+        if retries is not None and retries.history:
+            stats['retries'] += len(retries.history)
+    return response
+
+def get(url, params=None, headers=None, timeout=None, retries=None, **kwargs):
+    """GET through the host's pooled session (see request)"""
+    return request('GET', url, params=params, headers=headers, timeout=timeout, retries=retries, **kwargs)
+
+def get_http_stats():
+    """
+    Per-host request and connection-reuse counters
+    
+    Returns:
+        dict: host -> requests, connections opened, reused, retries, errors
+    """
+    pool_counts = {}
+    for (host, _), session in list(sessions.items()):
+        connections, pool_requests = pool_counts.get(host, (0, 0))
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    pool_requests += pool.num_requests
+        pool_counts[host] = (connections, pool_requests)
+    
+    stats = {}
+    for host, (connections, pool_requests) in pool_counts.items():
+        counters = host_stats.get(host, {})
+        stats[host] = {
+            'requests': counters.get('requests', 0),
+            'connections_opened': connections,
+            'connections_reused': max(0, pool_requests - connections),
+            'reuse_ratio': round(1 - connections / pool_requests, 3) if pool_requests else 0.0,
+            'retries': counters.get('retries', 0),
+            'errors': counters.get('errors', 0)
+        }
+    return stats
+
+def reset_sessions():
+    """
+    Forget all sessions in a freshly forked worker
+    
+    Sockets inherited from the parent are left for the parent to use rather
+    than closed, and the child opens its own pools on first use.
+    """
+    with sessions_lock:
+        sessions.clear()
+    with host_stats_lock:
+        host_stats.clear()
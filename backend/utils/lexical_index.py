@@ -0,0 +1,199 @@
+"""
+BM25 inverted index over the document store
+
+Dense MPNet embeddings place rare proper names ("Battle of Talikota",
+"Rashtrakuta") poorly, while an exact term match finds them at once. This
+index scores documents with Okapi BM25 and is fused with the dense results
+(see vector_utils.hybrid_search).
+
+Postings are kept in CSR form: the documents containing term row r are
+doc_ids[offsets[r]:offsets[r + 1]] (ascending ids, the FAISS vector ids),
+with their term counts in term_freqs. A query touches only the postings of
+its own terms, and scoring is a few vectorised numpy operations per term.
+
+The index is saved next to the FAISS index (faiss_index.bin ->
+faiss_index.bm25) as an uncompressed .npz archive.
+"""
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+LEXICAL_MAGIC = 'PPBM2501'
+WORD_PATTERN = re.compile(r'[^\W_]+')
+# Frequent words that would only add long, useless postings
+STOP_WORDS = frozenset([
+    'a', 'about', 'after', 'all', 'also', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'been', 'before',
+    'but', 'by', 'can', 'could', 'did', 'do', 'does', 'during', 'for', 'from', 'had', 'has', 'have', 'he',
+    'her', 'his', 'how', 'i', 'if', 'in', 'into', 'is', 'it', 'its', 'me', 'more', 'most', 'my', 'no', 'not',
+    'of', 'on', 'or', 'other', 'our', 's', 'she', 'so', 'some', 'such', 't', 'tell', 'than', 'that', 'the', 'their',
+    'them', 'then', 'there', 'these', 'they', 'this', 'those', 'to', 'under', 'up', 'us', 'was', 'we',
+    'were', 'what', 'when', 'where', 'which', 'while', 'who', 'whom', 'why', 'will', 'with', 'would', 'you'
+])
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+MAX_TERM_FREQ = np.iinfo(np.uint16).max
+
+def tokenize(text):
+    """
+    Index terms of a text: lowercased words without stop words, with a
+    trailing plural "s" folded ("Rashtrakutas" -> "rashtrakuta")
+    """
+    terms = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+class LexicalIndex:
+    """
+    BM25 index addressed by document (vector) id
+    
+    Not thread-safe for add(); searches only read and may run concurrently.
+    """
+    
+    def __init__(self, k1=DEFAULT_K1, b=DEFAULT_B):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}  # Term -> row in offsets
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.term_freqs = np.zeros(0, dtype=np.uint16)
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self.average_length = 0.0
+    
+    def __len__(self):
+        return len(self.doc_lengths)
+    
+    def add(self, texts):
+        """
+        Index documents; they get the next ids (len(self), len(self) + 1, ...)
+        
+        Args:
+            texts: Document texts
+        """
+        first = len(self)
+        rows, docs, freqs, lengths = [], [], [], []
+        for offset, text in enumerate(texts):
+            counts = Counter(tokenize(text or ''))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                rows.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                docs.append(first + offset)
+                freqs.append(min(count, MAX_TERM_FREQ))
+        if not lengths:
+            return
+        
+        # Merge with the existing postings. A stable sort by term keeps each
+        # term's documents in ascending id order (old ids precede new ones)
+        old_rows = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        rows = np.concatenate([old_rows, np.asarray(rows, dtype=np.int64)])
+        order = np.argsort(rows, kind='stable')
+        self.doc_ids = np.concatenate([self.doc_ids, np.asarray(docs, dtype=np.int32)])[order]
+        self.term_freqs = np.concatenate([self.term_freqs, np.asarray(freqs, dtype=np.uint16)])[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(self.vocabulary)))])
+        self.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(lengths, dtype=np.int32)])
+        self.average_length = float(self.doc_lengths.mean())
+    
+    def search(self, query, k=10, mask=None):
+        """
+        Top documents by BM25 score
+        
+        Args:
+            query: Query text
+            k: Number of results
+            mask: Optional bool array over document ids; False ids are skipped
+        
+        Returns:
+            tuple: (scores, ids) arrays, best first (empty when no term matches)
+        """
+        rows = [self.vocabulary[term] for term in dict.fromkeys(tokenize(query)) if term in self.vocabulary]
+        if not rows or not len(self):
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        
+        doc_parts, score_parts = [], []
+        for row in rows:
+            start, end = self.offsets[row], self.offsets[row + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype(np.float32)
+            idf = math.log(1.0 + (len(self) - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / max(self.average_length, 1.0))
+            doc_parts.append(docs)
+            score_parts.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        
+        if len(rows) == 1:
+            docs, scores = doc_parts[0], score_parts[0]
+        else:
+            docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        
+        if mask is not None:
+            keep = mask[docs]
+            docs, scores = docs[keep], scores[keep]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return scores[order].astype(np.float32), docs[order].astype(np.int64)
+    
+    def save(self, path):
+        """
+        Write the index atomically
+        
+        Returns:
+            bool: True if successful
+        """
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            # Terms never contain a newline, so they are stored as one blob
+            terms = sorted(self.vocabulary, key=self.vocabulary.get)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    magic=np.array(LEXICAL_MAGIC),
+                    params=np.array([self.k1, self.b]),
+                    terms=np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8),
+                    offsets=self.offsets,
+                    doc_ids=self.doc_ids,
+                    term_freqs=self.term_freqs,
+                    doc_lengths=self.doc_lengths
+                )
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"Could not save lexical index: {str(e)}")
+            return False
+
+def load_index(path):
+    """
+    Read an index written by LexicalIndex.save
+    
+    Returns:
+        LexicalIndex: Loaded index, or None if missing or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            if str(archive['magic']) != LEXICAL_MAGIC:
+                raise ValueError("not a lexical index")
+            k1, b = archive['params']
+            index = LexicalIndex(k1=float(k1), b=float(b))
+            blob = archive['terms'].tobytes().decode('utf-8')
+            index.vocabulary = {term: row for row, term in enumerate(blob.split('\n'))} if blob else {}
+            index.offsets = archive['offsets']
+            index.doc_ids = archive['doc_ids']
+            index.term_freqs = archive['term_freqs']
+            index.doc_lengths = archive['doc_lengths']
+        index.average_length = float(index.doc_lengths.mean()) if len(index.doc_lengths) else 0.0
+        return index
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load lexical index {path}: {str(e)}")
+        return None
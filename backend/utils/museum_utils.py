@@ -1,9 +1,14 @@
 """
 Museum API integration utilities
 """
-import requests
 from datetime import datetime
 
+from . import http_client
+from .cache_utils import Transient, cached
+from .singleflight import coalesced
+
+@cached('museum', 'smithsonian_search')
+@coalesced('museum', 'smithsonian_search')
 def search_smithsonian(query, api_key=None, limit=10):
     """
     Search Smithsonian Open Access API
@@ -29,7 +34,7 @@ def search_smithsonian(query, api_key=None, limit=10):
         if api_key:
             headers['X-Api-Key'] = api_key
         
-        response = requests.get(base_url, params=params, headers=headers, timeout=15)
+        response = http_client.get(base_url, params=params, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -61,12 +66,13 @@ def search_smithsonian(query, api_key=None, limit=10):
             
             return artifacts
         
-        return []
+        return Transient([])
         
     except Exception as e:
         print(f"Smithsonian API error: {str(e)}")
-        return []
+        return Transient([])
 
+@cached('museum', 'smithsonian_object')
 def get_smithsonian_object(object_id, api_key=None):
     """
     Get detailed information about a Smithsonian object
@@ -85,16 +91,16 @@ def get_smithsonian_object(object_id, api_key=None):
         if api_key:
             headers['X-Api-Key'] = api_key
         
-        response = requests.get(base_url, headers=headers, timeout=15)
+        response = http_client.get(base_url, headers=headers)
         
         if response.status_code == 200:
             return response.json()
         
-        return None
+        return None if response.status_code == 404 else Transient(None)
         
     except Exception as e:
         print(f"Smithsonian object retrieval error: {str(e)}")
-        return None
+        return Transient(None)
 
 def search_europeana(query, limit=10):
     """
@@ -0,0 +1,84 @@
+"""
+Token-bucket rate limiting for outbound API calls
+"""
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+    
+    Tokens refill continuously at `rate` per second up to `capacity`, so
+    callers may burst up to `capacity` requests and are then held to the
+    sustained rate.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        """
+        Create a full bucket
+        
+        Args:
+            rate: Tokens added per second (<= 0 disables limiting)
+            capacity: Maximum burst size (defaults to max(1, rate))
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens if they are available right now
+        
+        Returns:
+            bool: True if the tokens were taken
+        """
+        if self.rate <= 0:
+            return True
+        
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+    
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Block until tokens are available
+        
+        Args:
+            tokens: Number of tokens to take
+            timeout: Maximum seconds to wait (None waits indefinitely)
+        
+        Returns:
+            bool: True if the tokens were taken, False on timeout
+        """
+        if self.rate <= 0:
+            return True
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+    
+    @property
+    def available(self):
+        """Tokens currently in the bucket"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
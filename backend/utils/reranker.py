@@ -0,0 +1,237 @@
+"""
+Cross-encoder re-ranking of retrieved passages under a latency budget
+
+The bi-encoder index ranks passages by embedding similarity, which is fast
+but coarse. Retrieval over-fetches RERANK_CANDIDATES passages instead, a
+small local cross-encoder (MiniLM, CPU) scores each (question, passage)
+pair jointly, and only the best CONTEXT_TOP_K reach the prompt.
+
+The re-ranker never holds up an answer:
+
+- The model is loaded in a background thread; until it is ready,
+  passages keep their index order.
+- Pairs are scored in batches of RERANK_BATCH_SIZE. A batch only starts
+  if the measured cost per pair says it finishes inside the request's
+  RERANK_BUDGET_MS, so one slow query cannot overrun the budget by more
+  than the estimate's error.
+- When the budget runs out, the scored top of the list is re-ranked and
+  the rest keeps its index order (pure index order if nothing was scored).
+
+Scores are cached per (question, passage) in the "rerank" cache, keyed by
+a digest of the passage text, so a repeated question costs no model calls.
+"""
+import hashlib
+import threading
+import time
+
+# Global state
+reranker_model = None
+reranker_setup = {'state': 'idle', 'model': None, 'error': None, 'seconds': None}
+pending_load = None  # (model_name, max_length) while a background load runs
+reranker_lock = threading.Lock()
+pair_seconds = None  # Moving average of the scoring time per pair
+
+rerank_stats = {
+    'queries': 0,
+    'reranked': 0,
+    'partial': 0,
+    'index_order': 0,
+    'unavailable': 0,
+    'pairs_scored': 0,
+    'pairs_cached': 0,
+    'budget_exhausted': 0
+}
+rerank_stats_lock = threading.Lock()
+
+# Typical passage used to warm the model up and measure its cost per pair
+WARMUP_PASSAGE = ' '.join(['The empire expanded its trade routes and built new temples.'] * 16)
+
+def load_reranker(model_name, max_length=256):
+    """
+    Load a cross-encoder on CPU
+    
+    Args:
+        model_name: Hugging Face cross-encoder, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"
+        max_length: Longest (question + passage) input in tokens
+    
+    Returns:
+        CrossEncoder or None if sentence-transformers or the model is unavailable
+    """
+    try:
+        from sentence_transformers import CrossEncoder  # Lazy import
+        
+        return CrossEncoder(model_name, max_length=max_length, device='cpu')
+    except Exception as e:
+        print(f" Re-ranker warning: {str(e)}")
+        print(" Note: passages will keep their index order")
+        return None
+
+def start_reranker_load(model_name, max_length=256):
+    """
+    Load the re-ranker in a background thread so startup does not wait for it
+    
+    Returns:
+        threading.Thread: The loading thread
+    """
+    global pending_load
+    
+    with reranker_lock:
+        pending_load = (model_name, max_length)
+        reranker_setup.update(state='pending', model=model_name, error=None)
+    thread = threading.Thread(target=run_reranker_load, args=pending_load, name='reranker-load', daemon=True)
+    thread.start()
+    return thread
+
+def run_reranker_load(model_name, max_length=256):
+    global reranker_model, pending_load, pair_seconds
+    
+    start = time.perf_counter()
+    model = load_reranker(model_name, max_length)
+    if model is not None:
+        try:
+            # The first predict is much slower than the rest; also gives the
+            # initial cost estimate for the budget
+            model.predict([('warm up', WARMUP_PASSAGE)], show_progress_bar=False)
+            pairs = [('what did the empire build', WARMUP_PASSAGE)] * 8
+            warm_start = time.perf_counter()
+            model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            pair_seconds = (time.perf_counter() - warm_start) / len(pairs)
+        except Exception as e:
+            print(f" Re-ranker warm-up failed: {str(e)}")
+            model = None
+    
+    with reranker_lock:
+        reranker_model = model
+        pending_load = None
+        reranker_setup.update(
+            state='ready' if model is not None else 'failed',
+            error=None if model is not None else 'model unavailable',
+            seconds=round(time.perf_counter() - start, 2)
+        )
+    print(f" Re-ranker: {reranker_setup['state']} ({model_name}) after {reranker_setup['seconds']}s")
+
+def get_reranker():
+    """
+    Get the re-ranker if it is loaded (starting the load on first use)
+    
+    Returns:
+        CrossEncoder or None while loading, disabled or unavailable
+    """
+    if reranker_model is not None or reranker_setup['state'] != 'idle':
+        return reranker_model
+    
+    try:
+        from config import get_config
+        
+        cfg = get_config()
+        if cfg.RERANK_ENABLED:
+            start_reranker_load(cfg.RERANK_MODEL, cfg.RERANK_MAX_LENGTH)
+    except (ImportError, AttributeError):
+        pass
+    return None
+
+def reset_after_fork():
+    """Restart a re-ranker load that was still running in the master"""
+    if pending_load and reranker_model is None:
+        start_reranker_load(*pending_load)
+
+def get_rerank_stats():
+    """Re-ranker state and counters for /api/status"""
+    with rerank_stats_lock:
+        stats = dict(rerank_stats)
+    stats.update(reranker_setup)
+    stats['ms_per_pair'] = round(pair_seconds * 1000, 2) if pair_seconds else None
+    return stats
+
+def passage_digest(text):
+    """Short digest of a passage's text for the score cache"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def record_pair_cost(seconds, pairs):
+    """Fold one batch's timing into the per-pair cost estimate"""
+    global pair_seconds
+    
+    cost = seconds / max(1, pairs)
+    pair_seconds = cost if pair_seconds is None else 0.8 * pair_seconds + 0.2 * cost
+
+def rerank(query, results, k, budget_ms=150, batch_size=16, min_score=None):
+    """
+    Re-rank retrieved passages with the cross-encoder within a time budget
+    
+    Args:
+        query: User's question
+        results: (text, score, id) tuples in index (or fused) order
+        k: Number of passages to keep
+        budget_ms: Time allowed for scoring, in milliseconds
+        batch_size: Pairs per model call
+        min_score: Drop re-ranked passages scoring below this (optional)
+    
+    Returns:
+        tuple: ((text, score, id) list of length <= k, status), status being
+            'reranked', 'partial', 'index_order' (budget spent before any
+            batch) or 'unavailable' (model not loaded)
+    """
+    from config import get_config
+    from .cache_utils import get_cache
+    
+    deadline = time.perf_counter() + budget_ms / 1000.0
+    if len(results) <= 1:
+        return results[:k], 'reranked'
+    
+    model = get_reranker()
+    if model is None:
+        with rerank_stats_lock:
+            rerank_stats['unavailable'] += 1
+        return results[:k], 'unavailable'
+    
+    cfg = get_config()
+    cache = get_cache('rerank')
+    cache_key = ('rerank', reranker_setup['model'], ' '.join(query.lower().split()))
+    cached = cache.get(cache_key, None) or {}
+    
+    digests = [passage_digest(text) for text, _, _ in results]
+    scores = [cached.get(digest) for digest in digests]
+    pending = [i for i, score in enumerate(scores) if score is None]
+    new_scores = {}
+    exhausted = False
+    
+    for batch_start in range(0, len(pending), batch_size):
+        batch = pending[batch_start:batch_start + batch_size]
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0 or (pair_seconds is not None and pair_seconds * len(batch) > remaining):
+            exhausted = True
+            break
+        
+        start = time.perf_counter()
+        try:
+            batch_scores = model.predict(
+                [(query, results[i][0]) for i in batch], batch_size=len(batch), show_progress_bar=False
+            )
+        except Exception as e:
+            print(f"Re-ranking failed: {str(e)}")
+            break
+        record_pair_cost(time.perf_counter() - start, len(batch))
+        for i, score in zip(batch, batch_scores):
+            scores[i] = new_scores[digests[i]] = float(score)
+    
+    if new_scores:
+        cache.set(cache_key, {**cached, **new_scores}, ttl=cfg.RERANK_CACHE_TTL)
+    
+    # Re-rank the scored top of the list; the rest keeps its index order
+    scored = next((i for i, score in enumerate(scores) if score is None), len(results))
+    head = sorted(
+        ((results[i][0], scores[i], results[i][2]) for i in range(scored)),
+        key=lambda result: -result[1]
+    )
+    if min_score is not None:
+        head = [result for result in head if result[1] >= min_score]
+    ranked = (head + results[scored:])[:k]
+    
+    status = 'reranked' if scored == len(results) else ('partial' if scored else 'index_order')
+    with rerank_stats_lock:
+        rerank_stats['queries'] += 1
+        rerank_stats[status] += 1
+        rerank_stats['pairs_scored'] += len(new_scores)
+        rerank_stats['pairs_cached'] += len(results) - len(pending)
+        rerank_stats['budget_exhausted'] += 1 if exhausted else 0
+    return ranked, status
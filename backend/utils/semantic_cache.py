@@ -0,0 +1,248 @@
+"""
+Semantic answer cache for near-duplicate questions
+
+"Who was Napoleon?" and "tell me about Napoleon Bonaparte" differ as
+strings but not in meaning. This cache keys generated answers by question
+embedding (the sentence-transformers model already loaded for the vector
+database) and serves a cached answer when a new question is within a cosine
+similarity threshold of a past one.
+
+Entries live in a fixed-size float32 matrix, one row per question, so a
+lookup is one matrix-vector product. Entries expire after a TTL and the
+least recently used entry is evicted once the entry or byte limit is
+reached. The cache is per process; exact repeats are also shared across
+workers by the answer cache in cache_utils.
+"""
+import functools
+import re
+import threading
+import time
+
+from .cache_utils import estimate_size
+
+# Numbers with their ordinal or decade suffix and multi-letter roman
+# numerals (e.g. "World War 1" vs "2", "the 1600s" vs "1700s", "5th century"
+# vs "15th", "Napoleon III" vs "Napoleon") must match for a hit: embeddings
+# place such questions very close together even though the answers differ.
+# Numerals are upper-case only, so words like "civil" or "ill" never count
+DISCRIMINATOR_PATTERN = re.compile(r'\b(?:\d+(?i:st|nd|rd|th|s)?|[IVXLC]{2,})\b')
+
+class SemanticCache:
+    """
+    Nearest-neighbour answer cache over question embeddings
+    """
+    
+    def __init__(self, embed, dimension=768, threshold=0.9, ttl=21600, max_entries=1000,
+                 max_bytes=16 * 1024 * 1024):
+        """
+        Args:
+            embed: Function mapping a question to its embedding
+            dimension: Embedding size
+            threshold: Minimum cosine similarity for a hit
+            ttl: Lifetime of an entry in seconds
+            max_entries: Maximum number of cached answers
+            max_bytes: Maximum estimated size of all cached answers
+        """
+        import numpy as np  # Only needed with the embeddings model (full requirements)
+        
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._vectors = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._entries = [None] * max_entries  # slot -> entry dict
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # The question is embedded for the lookup and again when its answer is
+        # stored; remember recent embeddings so that costs one model call
+        self.encode = functools.lru_cache(maxsize=256)(self._encode)
+        self._stats = {
+            'lookups': 0, 'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0,
+            'evictions': 0, 'expirations': 0, 'saved_generation_ms': 0.0, 'lookup_ms': 0.0
+        }
+    
+    def _encode(self, question):
+        """Unit-length embedding of a question"""
+        import numpy as np
+        
+        vector = np.asarray(self.embed(question), dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def get(self, question, partition=''):
+        """
+        Find the cached answer to the most similar past question
+        
+        Args:
+            question: User's question
+            partition: Only entries stored with the same partition match
+                (e.g. the request's search overrides)
+        
+        Returns:
+            tuple: (payload, similarity), or (None, best similarity)
+        """
+        import numpy as np
+        
+        start = time.perf_counter()
+        vector = self.encode(question)
+        discriminators = question_discriminators(question)
+        
+        with self._lock:
+            self._stats['lookups'] += 1
+            similarities = self._vectors @ vector
+            now = time.monotonic()
+            
+            best_slot, best_score = None, -1.0
+            for slot in np.argsort(-similarities):
+                score = float(similarities[slot])
+                if score < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry is None:
+                    continue
+                if entry['expires_at'] <= now:
+                    self._release(slot)
+                    self._stats['expirations'] += 1
+                    continue
+                if entry['partition'] == partition and entry['discriminators'] == discriminators:
+                    best_slot, best_score = slot, score
+                    break
+            
+            self._stats['lookup_ms'] += (time.perf_counter() - start) * 1000
+            if best_slot is None:
+                self._stats['misses'] += 1
+                return None, float(similarities.max()) if len(similarities) else 0.0
+            
+            entry = self._entries[best_slot]
+            entry['last_used'] = now
+            self._stats['hits'] += 1
+            self._stats['saved_generation_ms'] += entry['generation_ms']
+            return entry['payload'], best_score
+    
+    def set(self, question, payload, partition='', generation_ms=0.0):
+        """
+        Cache the answer to a question
+        
+        Args:
+            question: User's question
+            payload: Answer fields to return on a hit
+            partition: See get
+            generation_ms: Generation time the entry saves on each hit
+        """
+        size = estimate_size(payload)
+        if self.ttl <= 0 or size > self.max_bytes:
+            return
+        
+        vector = self.encode(question)
+        normalized = ' '.join(question.lower().split())
+        with self._lock:
+            for slot, entry in enumerate(self._entries):
+                if entry is not None and entry['question'] == normalized and entry['partition'] == partition:
+                    self._release(slot)  # Replace a refreshed answer
+            
+            while not self._free or self._bytes + size > self.max_bytes:
+                self._evict_lru()
+            
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = {
+                'question': normalized,
+                'payload': payload,
+                'partition': partition,
+                'discriminators': question_discriminators(question),
+                'size': size,
+                'generation_ms': generation_ms,
+                'expires_at': time.monotonic() + self.ttl,
+                'last_used': time.monotonic()
+            }
+            self._bytes += size
+            self._stats['stores'] += 1
+    
+    def record_bypass(self):
+        with self._lock:
+            self._stats['bypassed'] += 1
+    
+    def clear(self):
+        with self._lock:
+            for slot, entry in enumerate(self._entries):
+                if entry is not None:
+                    self._release(slot)
+    
+    def stats(self):
+        """Hit rate, estimated generation time saved and current size"""
+        with self._lock:
+            lookups = self._stats['lookups']
+            return {
+                **self._stats,
+                'saved_generation_ms': round(self._stats['saved_generation_ms'], 1),
+                'lookup_ms': round(self._stats['lookup_ms'] / lookups, 2) if lookups else 0.0,
+                'hit_ratio': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+                'entries': self.max_entries - len(self._free),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'ttl': self.ttl
+            }
+    
+    def _evict_lru(self):
+        used = [slot for slot, entry in enumerate(self._entries) if entry is not None]
+        oldest = min(used, key=lambda slot: self._entries[slot]['last_used'])
+        self._release(oldest)
+        self._stats['evictions'] += 1
+    
+    def _release(self, slot):
+        self._bytes -= self._entries[slot]['size']
+        self._entries[slot] = None
+        self._vectors[slot] = 0.0
+        self._free.append(slot)
+
+def question_discriminators(question):
+    """Numbers and roman numerals that must match between similar questions"""
+    return tuple(sorted(match.upper() for match in DISCRIMINATOR_PATTERN.findall(question)))
+
+# Global state
+semantic_cache = None
+semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache():
+    """
+    Get (or create) the process-wide semantic cache
+    
+    Returns:
+        SemanticCache: Shared cache, or None if disabled or the embeddings
+        model is unavailable
+    """
+    global semantic_cache
+    
+    if semantic_cache is not None:
+        return semantic_cache
+    
+    from config import get_config
+    
+    cfg = get_config()
+    if not cfg.SEMANTIC_CACHE_ENABLED:
+        return None
+    
+    with semantic_cache_lock:
+        if semantic_cache is None:
+            from .ai_utils import get_embeddings_model
+            
+            embeddings_model = get_embeddings_model()
+            if embeddings_model is None:
+                return None
+            
+            semantic_cache = SemanticCache(
+                embeddings_model.embed_query,
+                dimension=cfg.EMBEDDING_DIMENSION,
+                threshold=cfg.SEMANTIC_CACHE_THRESHOLD,
+                ttl=cfg.ANSWER_CACHE_TTL,
+                max_entries=cfg.SEMANTIC_CACHE_MAX_ENTRIES,
+                max_bytes=cfg.SEMANTIC_CACHE_MAX_BYTES
+            )
+        return semantic_cache
+
+def get_semantic_cache_stats():
+    """Stats of the semantic cache, or None if it is not in use"""
+    return semantic_cache.stats() if semantic_cache is not None else None
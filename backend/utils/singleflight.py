@@ -0,0 +1,156 @@
+"""
+Request coalescing (single-flight) for identical concurrent upstream calls
+
+When several threads make the same call at the same time, the first one
+(the leader) runs it and the others (followers) wait for its result instead
+of sending their own upstream request. The leader's exception is raised in
+every follower. A follower that waits longer than the group's timeout stops
+waiting and makes the call itself, so a stuck leader cannot hang requests.
+
+Only calls that overlap in time are shared; the cache layer (cache_utils)
+takes care of repeats.
+"""
+import copy
+import functools
+import inspect
+import threading
+
+from .cache_utils import make_key
+
+class Flight:
+    """One in-flight call shared by its leader and followers"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Group of coalesced calls with saved-call counters
+    """
+    
+    def __init__(self, name, timeout=30.0):
+        """
+        Args:
+            name: Group name, e.g. "wikipedia"
+            timeout: Seconds a follower waits for the leader (None = no limit)
+        """
+        self.name = name
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'upstream_calls': 0, 'coalesced': 0, 'errors': 0, 'timeouts': 0}
+    
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs), or wait for an identical call in flight
+        
+        Args:
+            key: Hashable key identifying identical calls
+            func: Function to call
+        
+        Returns:
+            The leader's result (a copy for followers)
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+                self._stats['upstream_calls'] += 1
+        
+        if leader:
+            return self._lead(key, flight, func, args, kwargs)
+        
+        if not flight.done.wait(self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+                self._stats['upstream_calls'] += 1
+            print(f"Single-flight ({self.name}): leader still running after {self.timeout:g}s, calling directly")
+            return func(*args, **kwargs)
+        
+        with self._lock:
+            self._stats['coalesced'] += 1
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+    
+    def _lead(self, key, flight, func, args, kwargs):
+        try:
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+    
+    def stats(self):
+        """Call counters; coalesced is the number of upstream calls saved"""
+        with self._lock:
+            return {**self._stats, 'in_flight': len(self._flights), 'timeout': self.timeout}
+
+# Named groups shared across the process
+groups = {}
+groups_lock = threading.Lock()
+
+def get_group(name):
+    """
+    Get (or create) a named single-flight group
+    
+    Args:
+        name: Group name, e.g. "gemini"
+    
+    Returns:
+        SingleFlight: Shared group
+    """
+    group = groups.get(name)
+    if group is not None:
+        return group
+    
+    with groups_lock:
+        if name not in groups:
+            try:
+                from config import get_config
+                
+                timeout = get_config().SINGLEFLIGHT_WAIT_TIMEOUT
+            except (ImportError, AttributeError):
+                timeout = 30.0
+            groups[name] = SingleFlight(name, timeout=timeout if timeout > 0 else None)
+        return groups[name]
+
+def get_singleflight_stats():
+    """Stats for every named group"""
+    return {name: group.stats() for name, group in list(groups.items())}
+
+def coalesced(group_name, namespace):
+    """
+    Decorator sharing one in-flight call among identical concurrent calls
+    
+    Apply it below @cached so only cache misses are coalesced.
+    
+    Args:
+        group_name: Name passed to get_group
+        namespace: Key prefix, unique per decorated function
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(namespace, signature, args, kwargs)
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)  # Unhashable arguments are never coalesced
+            return get_group(group_name).do(key, func, *args, **kwargs)
+        
+        wrapper.uncoalesced = func
+        return wrapper
+    return decorator
@@ -1,34 +1,107 @@
 """
 Vector database utilities for FAISS operations
 """
-import json
+import math
 import numpy as np
 import os
+import threading
+from .doc_store import DocStore, exists as doc_store_exists, migrate_json_text_map
+from .doc_filters import make_tags
 
-def load_vector_db(index_path, text_map_path):
+def read_index(index_path, mmap=False):
     """
-    Load FAISS index and text mapping
+    Read a FAISS index from disk
+    
+    With mmap=True the index is opened read-only and memory-mapped, so its
+    pages live in the OS page cache and are shared by every worker process
+    instead of being copied into each process heap.
     
     Args:
         index_path: Path to FAISS index file
-        text_map_path: Path to text mapping JSON
+        mmap: Memory-map the index instead of reading it into memory
         
     Returns:
-        tuple: (faiss_index, text_map) or (None, None) if error
+        faiss.Index: Loaded index
     """
+    import faiss  # Lazy import
+    
+    if not mmap:
+        return faiss.read_index(index_path)
+    
+    # IO_FLAG_MMAP_IFC (faiss >= 1.10) maps flat code arrays; older versions
+    # only support mapping inverted lists via IO_FLAG_MMAP
+    mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)
+    if mmap_flag is None:
+        print(f"faiss {faiss.__version__} cannot memory-map flat or HNSW indexes (needs >= 1.10); "
+              f"only IVF inverted lists will be shared")
+        mmap_flag = faiss.IO_FLAG_MMAP
     try:
-        import faiss  # Lazy import
+        return faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        print(f"Memory-mapped load not supported for this index ({str(e)}), reading into memory")
+        return faiss.read_index(index_path)
+
+def doc_store_path(text_map_path):
+    """
+    Get the document store base path that replaces a JSON text map
+    
+    Args:
+        text_map_path: Path to the (legacy) text mapping JSON
+        
+    Returns:
+        str: Base path of the document store (no extension)
+    """
+    return os.path.splitext(text_map_path)[0]
+
+def load_text_map(text_map_path):
+    """
+    Open the document store for a text map path, migrating legacy JSON
+    
+    Args:
+        text_map_path: Path to the (legacy) text mapping JSON
         
-        if not os.path.exists(index_path) or not os.path.exists(text_map_path):
+    Returns:
+        DocStore: Document store or None if neither format exists
+    """
+    store_path = doc_store_path(text_map_path)
+    
+    if doc_store_exists(store_path):
+        return DocStore(store_path)
+    
+    if os.path.exists(text_map_path):
+        return migrate_json_text_map(text_map_path, store_path)
+    
+    return None
+
+def load_vector_db(index_path, text_map_path, mmap=False):
+    """
+    Load FAISS index and document store
+    
+    Args:
+        index_path: Path to FAISS index file
+        text_map_path: Path to text mapping JSON (its document store is used;
+            a legacy JSON map is migrated automatically)
+        mmap: Memory-map the index read-only (shared across workers)
+        
+    Returns:
+        tuple: (faiss_index, text_map) or (None, None) if error
+    """
+    try:
+        if not os.path.exists(index_path):
             print(f"Vector database files not found")
             return None, None
         
-        index = faiss.read_index(index_path)
+        text_map = load_text_map(text_map_path)
+        if text_map is None:
+            print(f"Vector database files not found")
+            return None, None
         
-        with open(text_map_path, 'r', encoding='utf-8') as f:
-            text_map = json.load(f)
+        index = read_index(index_path, mmap=mmap)
+        if index.ntotal != len(text_map):
+            print(f"Warning: index has {index.ntotal} vectors but the document store has "
+                  f"{len(text_map)} documents (interrupted save?)")
         
-        print(f"Loaded vector database: {index.ntotal} vectors")
+        print(f"Loaded vector database: {index.ntotal} vectors{' (memory-mapped)' if mmap else ''}")
         return index, text_map
         
     except Exception as e:
@@ -37,13 +110,14 @@ def load_vector_db(index_path, text_map_path):
 
 def save_vector_db(index, text_map, index_path, text_map_path):
     """
-    Save FAISS index and text mapping
+    Save FAISS index, document store and BM25 index
     
     Args:
         index: FAISS index object
-        text_map: Dictionary mapping indices to text
+        text_map: DocStore (or legacy dict) mapping indices to text
         index_path: Path to save FAISS index
-        text_map_path: Path to save text mapping
+        text_map_path: Path of the text mapping; the document store is
+            written next to it and only new documents are appended
         
     Returns:
         bool: True if successful, False otherwise
@@ -54,10 +128,26 @@ def save_vector_db(index, text_map, index_path, text_map_path):
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(index_path), exist_ok=True)
         
-        faiss.write_index(index, index_path)
+        if isinstance(text_map, dict):
+            store = DocStore()
+            store.extend(text_map[key] for key in sorted(text_map, key=int))
+            text_map = store
+        
+        # Write the index first, so a failed write leaves the store untouched
+        # and vector ids keep matching document ids. Workers may have the
+        # index memory-mapped: the new file is swapped in, never truncated
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        faiss.write_index(index, tmp_path)
         
-        with open(text_map_path, 'w', encoding='utf-8') as f:
-            json.dump(text_map, f, ensure_ascii=False, indent=2)
+        # The BM25 index only needs the new documents unless the store is
+        # new or moved (then it is rebuilt)
+        same_store = getattr(text_map, 'path', None) == doc_store_path(text_map_path)
+        if not text_map.save(doc_store_path(text_map_path)):
+            os.remove(tmp_path)
+            return False
+        
+        os.replace(tmp_path, index_path)
+        save_lexical_index(text_map, index_path, rebuild=not same_store)
         
         print(f"Saved vector database: {index.ntotal} vectors")
         return True
@@ -66,36 +156,476 @@ def save_vector_db(index, text_map, index_path, text_map_path):
         print(f"Error saving vector database: {str(e)}")
         return False
 
-def create_vector_db(texts, dimension=768):
+INDEX_TYPES = ('flat', 'hnsw', 'ivf', 'sq8', 'pq', 'ivf_sq8', 'ivf_pq')
+QUANTIZED_INDEX_TYPES = ('sq8', 'pq', 'ivf_sq8', 'ivf_pq')
+# Index types whose search rejects an IDSelector (IndexPQ); filtered
+# searches on them scan the candidates exactly or post-filter instead
+NO_SELECTOR_INDEX_TYPES = ('pq',)
+METRICS = ('l2', 'ip')
+DEFAULT_RERANK_FACTOR = 4
+DEFAULT_EMBEDDING_BATCH_SIZE = 256
+# Filters keeping at most this many documents are searched exactly over
+# their stored vectors instead of through the ANN index
+DEFAULT_EXACT_FILTER_MAX = 2048
+RETRIEVERS = ('dense', 'lexical')
+# Reciprocal rank fusion constant and the ranks taken from each retriever
+DEFAULT_RRF_K = 60
+DEFAULT_FUSION_DEPTH = 20
+
+# Similarity cut-off accounting (see search_vector_db_scored)
+retrieval_stats = {
+    'queries': 0,
+    'passages_kept': 0,
+    'passages_dropped': 0,
+    'tokens_kept_est': 0,
+    'tokens_saved_est': 0,
+    'filtered_queries': 0,
+    'filtered_exact': 0,
+    'filtered_ann': 0,
+    'filtered_candidates': 0,
+    'lexical_queries': 0,
+    'fused_queries': 0,
+    'lexical_only_hits': 0
+}
+retrieval_stats_lock = threading.Lock()
+
+def default_nlist(num_vectors):
+    """
+    Pick an IVF list count for a corpus size
+    
+    Uses ~4*sqrt(n) lists while keeping at least 39 training points per list
+    (FAISS warns below that).
+    
+    Args:
+        num_vectors: Number of vectors the index will be trained on
+        
+    Returns:
+        int: Number of inverted lists
+    """
+    return max(1, min(4 * int(math.sqrt(num_vectors)), num_vectors // 39))
+
+def build_index(dimension, index_type='flat', num_vectors=0, nlist=None, hnsw_m=32, ef_construction=200, pq_m=96, metric='l2'):
+    """
+    Build an empty FAISS index of the requested type
+    
+    Quantized types store compressed codes instead of float32 vectors:
+    sq8 uses 1 byte per dimension (4x smaller), pq uses pq_m bytes per vector
+    (768 / 96 -> 32x smaller). Both need training.
+    
+    Args:
+        dimension: Embedding dimension
+        index_type: 'flat' (exact), 'hnsw' (graph), 'ivf' (inverted lists),
+            'sq8', 'pq', 'ivf_sq8' or 'ivf_pq' (quantized)
+        metric: 'l2' or 'ip' (inner product = cosine on normalized embeddings)
+        num_vectors: Expected training set size, used to size IVF lists
+        nlist: IVF list count (default from num_vectors)
+        hnsw_m: HNSW graph degree
+        ef_construction: HNSW build-time search depth
+        pq_m: Product quantizer sub-vectors (must divide dimension)
+        
+    Returns:
+        faiss.Index: Empty index
+    """
+    import faiss  # Lazy import
+    
+    index_type = (index_type or 'flat').lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+    metric_type = faiss.METRIC_INNER_PRODUCT if metric == 'ip' else faiss.METRIC_L2
+    
+    codes = {'sq8': 'SQ8', 'pq': f"PQ{pq_m}", 'ivf_sq8': 'SQ8', 'ivf_pq': f"PQ{pq_m}"}.get(index_type)
+    if 'pq' in index_type and dimension % pq_m:
+        raise ValueError(f"PQ sub-vector count {pq_m} must divide dimension {dimension}")
+    # PQ trains 256 centroids per sub-quantizer
+    if index_type == 'pq' and num_vectors and num_vectors < 256:
+        print(f"Only {num_vectors} vectors to train PQ codebooks, using sq8 index")
+        index_type, codes = 'sq8', 'SQ8'
+    
+    if index_type.startswith('ivf'):
+        nlist = nlist or default_nlist(num_vectors)
+        if num_vectors and (num_vectors < nlist or (index_type == 'ivf_pq' and num_vectors < 256)):
+            print(f"Only {num_vectors} vectors to train {index_type} index, using flat index")
+            index_type = 'flat'
+        else:
+            return faiss.index_factory(dimension, f"IVF{nlist},{codes or 'Flat'}", metric_type)
+    
+    if codes:
+        return faiss.index_factory(dimension, codes, metric_type)
+    
+    if index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, metric_type)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    
+    return faiss.IndexFlatIP(dimension) if metric == 'ip' else faiss.IndexFlatL2(dimension)
+
+def get_index_type(index):
+    """
+    Get the index type name of a FAISS index
+    
+    Args:
+        index: FAISS index object
+        
+    Returns:
+        str: 'flat', 'hnsw', 'ivf' or the FAISS class name
+    """
+    import faiss  # Lazy import
+    
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf = faiss.downcast_index(ivf)
+        if isinstance(ivf, faiss.IndexIVFScalarQuantizer):
+            return 'ivf_sq8'
+        if isinstance(ivf, faiss.IndexIVFPQ):
+            return 'ivf_pq'
+        return 'ivf'
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return 'sq8'
+    if isinstance(index, faiss.IndexPQ):
+        return 'pq'
+    if isinstance(index, faiss.IndexFlat):
+        return 'flat'
+    return type(index).__name__
+
+def get_index_metric(index):
+    """
+    Get the metric of a FAISS index
+    
+    Args:
+        index: FAISS index object
+        
+    Returns:
+        str: 'ip' for inner product, 'l2' otherwise
+    """
+    import faiss  # Lazy import
+    
+    return 'ip' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+
+def to_similarity(distances, metric):
+    """
+    Convert FAISS scores to cosine similarity for normalized embeddings
+    
+    Inner product already is the cosine; squared L2 distance d between unit
+    vectors maps to 1 - d / 2.
+    
+    Args:
+        distances: Scores returned by the index
+        metric: 'ip' or 'l2'
+        
+    Returns:
+        numpy.ndarray: Cosine similarities
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    return distances if metric == 'ip' else 1.0 - distances / 2.0
+
+def estimate_tokens(text):
+    """Rough Gemini token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def get_retrieval_stats():
+    """
+    Get similarity cut-off statistics
+    
+    Returns:
+        dict: Counters of passages kept/dropped and estimated prompt tokens saved
+    """
+    with retrieval_stats_lock:
+        stats = dict(retrieval_stats)
+    total = stats['tokens_kept_est'] + stats['tokens_saved_est']
+    stats['tokens_saved_ratio'] = round(stats['tokens_saved_est'] / total, 3) if total else 0.0
+    return stats
+
+def make_search_params(index, ef_search=None, nprobe=None, selector=None):
+    """
+    Build per-request FAISS search parameters for an index
+    
+    Args:
+        index: FAISS index object
+        ef_search: HNSW candidate list size (higher = better recall, slower)
+        nprobe: IVF lists visited per query (higher = better recall, slower)
+        selector: faiss.IDSelector restricting the ids searched (optional;
+            dropped for NO_SELECTOR_INDEX_TYPES, which reject it)
+        
+    Returns:
+        faiss.SearchParameters or None when the index takes no parameters
+    """
+    import faiss  # Lazy import
+    
+    index_type = get_index_type(index)
+    if index_type in NO_SELECTOR_INDEX_TYPES:
+        selector = None
+    extra = {'sel': selector} if selector is not None else {}
+    if index_type == 'hnsw' and ef_search:
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search), **extra)
+    if index_type.startswith('ivf') and nprobe:
+        return faiss.SearchParametersIVF(nprobe=int(nprobe), **extra)
+    return faiss.SearchParameters(**extra) if selector is not None else None
+
+def filter_candidates(text_map, filters, ntotal):
+    """
+    Document ids a search filter keeps, from the document store's tags
+    
+    Args:
+        text_map: Document store
+        filters: Filter from doc_filters.make_filter
+        ntotal: Number of vectors in the index
+        
+    Returns:
+        numpy.ndarray: bool mask over vector ids, or None when the store has
+            no (complete) tags column and the filter cannot be applied
+    """
+    from .doc_filters import matching_mask
+    
+    if getattr(text_map, 'tag_count', 0) != ntotal:
+        return None
+    return matching_mask(text_map.get_tags(), filters)
+
+def backfill_tags(text_map):
+    """
+    Tag documents stored before the tags column existed
+    
+    Args:
+        text_map: Document store (saved by the caller)
+        
+    Returns:
+        int: Number of documents tagged
+    """
+    start = text_map.tag_count
+    doc_ids = range(start, len(text_map))
+    if not doc_ids:
+        return 0
+    
+    print(f"Tagging {len(doc_ids)} documents with categories and eras...")
+    for batch_start in range(start, len(text_map), 1000):
+        batch = range(batch_start, min(batch_start + 1000, len(text_map)))
+        text_map.append_tags(make_tags(
+            [text_map.get(doc_id) for doc_id in batch],
+            [text_map.get_metadata(doc_id) for doc_id in batch]
+        ))
+    return len(doc_ids)
+
+def lexical_index_path(index_path):
+    """
+    Get the BM25 index file kept next to a FAISS index
+    
+    Args:
+        index_path: Path to FAISS index file (faiss_index.bin)
+        
+    Returns:
+        str: Path of the lexical index (faiss_index.bm25)
+    """
+    return os.path.splitext(index_path)[0] + '.bm25'
+
+def update_lexical_index(lexical_index, text_map):
+    """
+    Index the documents added to the store since the lexical index was built
+    
+    Documents are indexed with their title, so a passage deep inside an
+    article still matches the name the article is about.
+    
+    Args:
+        lexical_index: LexicalIndex covering the store's first documents
+        text_map: Document store
+        
+    Returns:
+        int: Number of documents indexed
+    """
+    start = len(lexical_index)
+    for batch_start in range(start, len(text_map), 1000):
+        batch = range(batch_start, min(batch_start + 1000, len(text_map)))
+        lexical_index.add(
+            ((text_map.get_metadata(doc_id) or {}).get('title', '') + '\n' + (text_map.get(doc_id) or ''))
+            for doc_id in batch
+        )
+    return len(text_map) - start
+
+def load_lexical_index(index_path, text_map):
+    """
+    Load the BM25 index saved next to a FAISS index
+    
+    A missing or stale index (older stores, or documents added without
+    save_vector_db) is completed in memory from the document store.
+    
+    Args:
+        index_path: Path to FAISS index file
+        text_map: Document store the index addresses
+        
+    Returns:
+        LexicalIndex: Index covering every document, or None if no store
+    """
+    from .lexical_index import LexicalIndex, load_index
+    
+    if not text_map:
+        return None
+    
+    lexical_index = load_index(lexical_index_path(index_path))
+    if lexical_index is None or len(lexical_index) > len(text_map):
+        lexical_index = LexicalIndex()
+    if len(lexical_index) < len(text_map):
+        print(f"Building lexical index for {len(text_map) - len(lexical_index)} documents...")
+        update_lexical_index(lexical_index, text_map)
+    return lexical_index
+
+def save_lexical_index(text_map, index_path, rebuild=False):
+    """
+    Bring the BM25 index next to a FAISS index up to date with the store
+    
+    Args:
+        text_map: Saved document store
+        index_path: Path to FAISS index file
+        rebuild: Index every document instead of only the new ones
+        
+    Returns:
+        bool: True if successful
+    """
+    from .lexical_index import LexicalIndex, load_index
+    
+    path = lexical_index_path(index_path)
+    lexical_index = None if rebuild else load_index(path)
+    if lexical_index is None or len(lexical_index) > len(text_map):
+        lexical_index = LexicalIndex()
+    if update_lexical_index(lexical_index, text_map) == 0 and os.path.exists(path):
+        return True
+    return lexical_index.save(path)
+
+def rerank_exact(query_embedding, candidate_ids, text_map, k, metric='l2'):
+    """
+    Re-rank quantized-index candidates with their stored float16 vectors
+    
+    Args:
+        query_embedding: float32 array (1, dimension)
+        candidate_ids: Candidate vector ids from the index (may contain -1)
+        text_map: Document store with a vector column
+        k: Number of results to keep
+        metric: 'l2' or 'ip', matching the index
+        
+    Returns:
+        tuple: (distances, ids) arrays of length <= k in the index's score
+            convention, or None if the candidates have no stored vectors
+    """
+    candidate_ids = np.asarray([i for i in candidate_ids if i != -1], dtype=np.int64)
+    vectors = text_map.get_vectors(candidate_ids) if hasattr(text_map, 'get_vectors') else None
+    if vectors is None or vectors.shape[1] != query_embedding.shape[1]:
+        return None
+    
+    if metric == 'ip':
+        distances = vectors @ query_embedding[0]
+        order = np.argsort(-distances)[:k]
+    else:
+        distances = ((vectors - query_embedding) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:k]
+    return distances[order], candidate_ids[order]
+
+def train_and_add(index, embeddings_array):
+    """Train the index on the vectors if it still needs training, then add them"""
+    if not index.is_trained:
+        print(f"Training {get_index_type(index)} index on {len(embeddings_array)} vectors...")
+        index.train(embeddings_array)
+    index.add(embeddings_array)
+
+def rebuild_index(index, index_type, text_map=None, **index_params):
+    """
+    Rebuild an index as another type, training it on its own vectors
+    
+    This is the ingestion training step: batches are appended to a flat
+    index, which is converted once the corpus is complete.
+    
+    Args:
+        index: Existing FAISS index
+        index_type: Target index type (see INDEX_TYPES)
+        text_map: Document store; its float16 vectors are used when complete,
+            so quantized indexes are not rebuilt from lossy reconstructions
+        **index_params: Extra build_index parameters (nlist, hnsw_m, ef_construction,
+            pq_m, metric - defaults to the current index's metric)
+        
+    Returns:
+        faiss.Index: New index with the same vectors in the same id order
+    """
+    import faiss  # Lazy import
+    
+    vectors = None
+    if text_map is not None and getattr(text_map, 'vector_count', 0) == index.ntotal:
+        vectors = text_map.get_vectors(np.arange(index.ntotal))
+    
+    if vectors is None:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        vectors = index.reconstruct_n(0, index.ntotal)
+    
+    index_params.setdefault('metric', get_index_metric(index))
+    new_index = build_index(index.d, index_type, num_vectors=index.ntotal, **index_params)
+    train_and_add(new_index, vectors)
+    
+    print(f"Rebuilt vector index as {get_index_type(new_index)} ({new_index.ntotal} vectors)")
+    return new_index
+
+def embed_texts(texts, batch_size=DEFAULT_EMBEDDING_BATCH_SIZE):
+    """
+    Embed texts in fixed-size batches
+    
+    Keeps peak memory bounded and reports progress when ingesting tens of
+    thousands of passages.
+    
+    Args:
+        texts: List of text strings
+        batch_size: Texts per embedding call
+        
+    Returns:
+        numpy.ndarray: float32 array (len(texts), dimension) or None if no model
+    """
+    from .ai_utils import get_embeddings_model
+    
+    embeddings_model = get_embeddings_model()
+    if not embeddings_model:
+        return None
+    
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        batches.append(np.array(embeddings_model.embed_documents(batch), dtype=np.float32))
+        if len(texts) > batch_size:
+            print(f"  Embedded {min(start + batch_size, len(texts))}/{len(texts)} texts")
+    return np.concatenate(batches) if batches else None
+
+def create_vector_db(texts, dimension=768, index_type='flat', metadatas=None,
+                     batch_size=DEFAULT_EMBEDDING_BATCH_SIZE, **index_params):
     """
     Create new FAISS index from texts
     
     Args:
         texts: List of text strings
         dimension: Embedding dimension (default 768 for MPNet)
+        index_type: Index type from INDEX_TYPES (trained on these texts)
+        metadatas: Optional list of metadata dicts (title, section, url), parallel to texts
+        batch_size: Texts per embedding call
+        **index_params: Extra build_index parameters (nlist, hnsw_m, ef_construction, pq_m, metric)
         
     Returns:
         tuple: (faiss_index, text_map) or (None, None) if error
     """
     try:
-        import faiss  # Lazy import
-        from .ai_utils import get_embeddings_model
-        
-        embeddings_model = get_embeddings_model()
-        if not embeddings_model:
-            return None, None
-        
         # Create embeddings
         print(f"Creating embeddings for {len(texts)} texts...")
-        embeddings = embeddings_model.embed_documents(texts)
-        embeddings_array = np.array(embeddings, dtype=np.float32)
+        embeddings_array = embed_texts(texts, batch_size)
+        if embeddings_array is None:
+            return None, None
         
         # Create FAISS index
-        index = faiss.IndexFlatL2(dimension)
-        index.add(embeddings_array)
+        index = build_index(dimension, index_type, num_vectors=len(texts), **index_params)
+        train_and_add(index, embeddings_array)
         
-        # Create text mapping
-        text_map = {str(i): text for i, text in enumerate(texts)}
+        # Create document store (written to disk by save_vector_db), keeping
+        # float16 vectors for exact re-ranking and rebuilds
+        text_map = DocStore()
+        text_map.extend(texts, metadatas)
+        text_map.append_vectors(embeddings_array)
+        text_map.append_tags(make_tags(texts, metadatas))
         
         print(f"Created vector database with {index.ntotal} vectors")
         return index, text_map
@@ -104,39 +634,42 @@ def create_vector_db(texts, dimension=768):
         print(f"Error creating vector database: {str(e)}")
         return None, None
 
-def add_to_vector_db(index, text_map, new_texts):
+def add_to_vector_db(index, text_map, new_texts, metadatas=None, batch_size=DEFAULT_EMBEDDING_BATCH_SIZE):
     """
     Add new texts to existing FAISS index
     
     Args:
         index: Existing FAISS index
-        text_map: Existing text mapping
+        text_map: Existing document store
         new_texts: List of new text strings
+        metadatas: Optional list of metadata dicts (title, section, url), parallel to new_texts
+        batch_size: Texts per embedding call
         
     Returns:
         tuple: (updated_index, updated_text_map)
     """
     try:
-        from .ai_utils import get_embeddings_model
-        
-        embeddings_model = get_embeddings_model()
-        if not embeddings_model:
+        if len(text_map) != index.ntotal:
+            # New vector ids would no longer match their document ids
+            print(f"Error adding to vector database: index has {index.ntotal} vectors "
+                  f"but the document store has {len(text_map)} documents; rebuild it with ingestion")
             return index, text_map
         
-        # Get starting index
-        start_idx = index.ntotal
-        
         # Create embeddings for new texts
         print(f"Adding {len(new_texts)} new texts to vector database...")
-        new_embeddings = embeddings_model.embed_documents(new_texts)
-        new_embeddings_array = np.array(new_embeddings, dtype=np.float32)
+        new_embeddings_array = embed_texts(new_texts, batch_size)
+        if new_embeddings_array is None:
+            return index, text_map
         
         # Add to index
-        index.add(new_embeddings_array)
+        train_and_add(index, new_embeddings_array)
         
-        # Update text mapping
-        for i, text in enumerate(new_texts):
-            text_map[str(start_idx + i)] = text
+        # Append to document store (ids follow the index order)
+        text_map.extend(new_texts, metadatas)
+        if text_map.vector_count == index.ntotal - len(new_texts):
+            text_map.append_vectors(new_embeddings_array)
+        if text_map.tag_count == index.ntotal - len(new_texts):
+            text_map.append_tags(make_tags(new_texts, metadatas))
         
         print(f"Vector database now has {index.ntotal} vectors")
         return index, text_map
@@ -145,18 +678,38 @@ def add_to_vector_db(index, text_map, new_texts):
         print(f"Error adding to vector database: {str(e)}")
         return index, text_map
 
-def search_vector_db(query, index, text_map, k=3):
+def search_vector_db_scored(query, index, text_map, k=3, min_score=None, ef_search=None, nprobe=None,
+                            rerank_factor=DEFAULT_RERANK_FACTOR, filters=None, exact_filter_max=DEFAULT_EXACT_FILTER_MAX,
+                            stats_k=None):
     """
-    Search FAISS index for relevant contexts
+    Search FAISS index and return scored passages
+    
+    Scores are cosine similarities whatever the index metric. Quantized
+    indexes over-fetch k * rerank_factor candidates, which are re-ranked
+    exactly against the document store's float16 vectors. Passages below
+    min_score are dropped so irrelevant context never reaches the prompt.
+    
+    A filter restricts the candidates before the search: small candidate
+    sets are scored exactly from the stored vectors, larger ones are passed
+    to FAISS as an id bitmap, so the index never returns filtered-out ids.
     
     Args:
         query: Search query string
         index: FAISS index object
-        text_map: Text mapping dictionary
+        text_map: Document store addressed by vector id
         k: Number of results to return
+        min_score: Minimum cosine similarity to keep a passage (optional)
+        ef_search: HNSW search depth for this query (optional)
+        nprobe: IVF lists to probe for this query (optional)
+        rerank_factor: Candidate multiplier for quantized indexes
+        filters: Filter from doc_filters.make_filter (optional; ignored for
+            stores without a tags column)
+        exact_filter_max: Largest candidate set searched exactly
+        stats_k: Ranks counted in the cut-off stats (default k); callers
+            fetching a candidate pool pass the number that reaches the prompt
         
     Returns:
-        list: List of relevant text contexts
+        list: (text, score, id) tuples, best first
     """
     try:
         from .ai_utils import get_embeddings_model
@@ -177,29 +730,223 @@ def search_vector_db(query, index, text_map, k=3):
             print(f"Dimension mismatch: query={query_embedding.shape[1]}, index={index.d}")
             return []
         
-        # Search
-        distances, retrieved_indices = index.search(query_embedding, min(k, index.ntotal))
-        
-        # Extract relevant contexts
-        relevant_contexts = []
-        for i in range(min(k, len(retrieved_indices[0]))):
-            idx = retrieved_indices[0][i]
-            if idx != -1 and str(idx) in text_map:
-                relevant_contexts.append(text_map[str(idx)])
+        metric = get_index_metric(index)
+        mask = filter_candidates(text_map, filters, index.ntotal) if filters else None
+        candidate_count = int(mask.sum()) if mask is not None else index.ntotal
+        if candidate_count == 0:
+            return []
         
-        return relevant_contexts
+        index_type = get_index_type(index)
+        selectable = index_type not in NO_SELECTOR_INDEX_TYPES
+        exact = None
+        if (mask is not None and (candidate_count <= exact_filter_max or not selectable)
+                and text_map.vector_count == index.ntotal):
+            exact = rerank_exact(query_embedding, np.flatnonzero(mask), text_map, k, metric)
+        
+        if exact is not None:
+            distances, retrieved_indices = exact
+        else:
+            # Search (over-fetch for exact re-ranking on quantized indexes)
+            selector = bitmap = None
+            if mask is not None and selectable:
+                import faiss  # Lazy import
+                
+                bitmap = np.packbits(mask, bitorder='little')  # Must outlive the search
+                selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+            params = make_search_params(index, ef_search=ef_search, nprobe=nprobe, selector=selector)
+            quantized = index_type in QUANTIZED_INDEX_TYPES
+            fetch_k = min(k * max(1, rerank_factor) if quantized else k, candidate_count)
+            if mask is not None and not selectable:
+                # No selector and no stored vectors: over-fetch in proportion
+                # to the filter's selectivity, then drop filtered-out ids
+                fetch_k = min(index.ntotal, fetch_k * max(1, math.ceil(index.ntotal / candidate_count)))
+            distances, retrieved_indices = index.search(query_embedding, fetch_k, params=params)
+            distances, retrieved_indices = distances[0], retrieved_indices[0]
+            if mask is not None and not selectable:
+                keep = (retrieved_indices != -1) & mask[np.maximum(retrieved_indices, 0)]
+                distances, retrieved_indices = distances[keep], retrieved_indices[keep]
+            
+            if quantized:
+                reranked = rerank_exact(query_embedding, retrieved_indices, text_map, k, metric)
+                if reranked is not None:
+                    distances, retrieved_indices = reranked
+        
+        if mask is not None:
+            with retrieval_stats_lock:
+                retrieval_stats['filtered_queries'] += 1
+                retrieval_stats['filtered_exact' if exact is not None else 'filtered_ann'] += 1
+                retrieval_stats['filtered_candidates'] += candidate_count
+        
+        # Extract relevant contexts above the similarity cut-off
+        stats_k = k if stats_k is None else min(stats_k, k)
+        results = []
+        counted = dropped_tokens = 0
+        for rank, (score, idx) in enumerate(zip(to_similarity(distances[:k], metric), retrieved_indices[:k])):
+            idx = int(idx)
+            text = text_map.get(idx) if idx != -1 else None
+            if text is None:
+                continue
+            if min_score is not None and score < min_score:
+                if rank < stats_k:
+                    dropped_tokens += estimate_tokens(text)
+                continue
+            results.append((text, float(score), idx))
+            counted += 1 if rank < stats_k else 0
+        
+        kept = results[:counted]  # Kept passages keep their rank order
+        with retrieval_stats_lock:
+            retrieval_stats['queries'] += 1
+            retrieval_stats['passages_kept'] += len(kept)
+            retrieval_stats['passages_dropped'] += min(stats_k, len(retrieved_indices)) - len(kept)
+            retrieval_stats['tokens_kept_est'] += sum(estimate_tokens(text) for text, _, _ in kept)
+            retrieval_stats['tokens_saved_est'] += dropped_tokens
+        
+        return results
         
     except Exception as e:
         print(f"Error searching vector database: {str(e)}")
         return []
 
+def search_lexical_scored(query, lexical_index, text_map, k=3, filters=None):
+    """
+    Search the BM25 index and return scored passages
+    
+    Args:
+        query: Search query string
+        lexical_index: LexicalIndex over text_map
+        text_map: Document store addressed by vector id
+        k: Number of results to return
+        filters: Filter from doc_filters.make_filter (optional)
+        
+    Returns:
+        list: (text, bm25 score, id) tuples, best first
+    """
+    try:
+        if lexical_index is None or not text_map or not len(lexical_index):
+            return []
+        
+        mask = filter_candidates(text_map, filters, len(lexical_index)) if filters else None
+        scores, doc_ids = lexical_index.search(query, k, mask=mask)
+        
+        with retrieval_stats_lock:
+            retrieval_stats['lexical_queries'] += 1
+        
+        results = []
+        for score, doc_id in zip(scores, doc_ids):
+            text = text_map.get(int(doc_id))
+            if text is not None:
+                results.append((text, float(score), int(doc_id)))
+        return results
+        
+    except Exception as e:
+        print(f"Error searching lexical index: {str(e)}")
+        return []
+
+def reciprocal_rank_fusion(ranked_lists, rrf_k=DEFAULT_RRF_K):
+    """
+    Merge ranked result lists by reciprocal rank fusion
+    
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears
+    in, so agreement between retrievers wins and raw scores on different
+    scales (cosine, BM25) never need calibrating.
+    
+    Args:
+        ranked_lists: Lists of (text, score, id) tuples, best first
+        rrf_k: Rank smoothing constant (60 in the original paper)
+        
+    Returns:
+        list: (text, fused score, id) tuples, best first
+    """
+    fused = {}
+    for results in ranked_lists:
+        for rank, (text, _, doc_id) in enumerate(results, start=1):
+            entry = fused.setdefault(doc_id, [text, 0.0])
+            entry[1] += 1.0 / (rrf_k + rank)
+    return sorted(((text, score, doc_id) for doc_id, (text, score) in fused.items()), key=lambda result: -result[1])
+
+def hybrid_search(query, index, text_map, lexical_index=None, k=3, retrievers=RETRIEVERS, min_score=None,
+                  filters=None, rrf_k=DEFAULT_RRF_K, depth=DEFAULT_FUSION_DEPTH, **search_params):
+    """
+    Dense and BM25 retrieval merged by reciprocal rank fusion
+    
+    Each enabled retriever returns its top `depth` passages and the fused
+    top k are kept. With a single retriever (or no lexical index) its own
+    ranking is returned unchanged. min_score applies to the dense results
+    only: exact name matches are kept even when the embedding scores them
+    low, which is the point of the lexical retriever.
+    
+    Args:
+        query: Search query string
+        index: FAISS index object
+        text_map: Document store addressed by vector id
+        lexical_index: LexicalIndex over text_map (optional)
+        k: Number of results to return
+        retrievers: Retriever names from RETRIEVERS to use
+        min_score: Minimum cosine similarity for dense passages (optional)
+        filters: Filter from doc_filters.make_filter (optional)
+        rrf_k: Reciprocal rank fusion constant
+        depth: Ranks taken from each retriever before fusion
+        **search_params: ef_search, nprobe, rerank_factor, exact_filter_max
+        
+    Returns:
+        list: (text, score, id) tuples, best first (fused scores when both
+            retrievers ran)
+    """
+    use_dense = 'dense' in retrievers
+    use_lexical = 'lexical' in retrievers and lexical_index is not None
+    if not use_lexical:
+        if not use_dense:
+            return []
+        return search_vector_db_scored(query, index, text_map, k=k, min_score=min_score, filters=filters, **search_params)
+    if not use_dense:
+        return search_lexical_scored(query, lexical_index, text_map, k=k, filters=filters)
+    
+    # Only the dense top k competes for the prompt; the deeper ranks are
+    # fusion candidates and stay out of the cut-off stats
+    dense = search_vector_db_scored(
+        query, index, text_map, k=max(k, depth), min_score=min_score, filters=filters, stats_k=k, **search_params
+    )
+    lexical = search_lexical_scored(query, lexical_index, text_map, k=max(k, depth), filters=filters)
+    results = reciprocal_rank_fusion([dense, lexical], rrf_k=rrf_k)[:k]
+    
+    dense_ids = {doc_id for _, _, doc_id in dense}
+    with retrieval_stats_lock:
+        retrieval_stats['fused_queries'] += 1
+        retrieval_stats['lexical_only_hits'] += sum(1 for _, _, doc_id in results if doc_id not in dense_ids)
+    return results
+
+def search_vector_db(query, index, text_map, k=3, ef_search=None, nprobe=None, rerank_factor=DEFAULT_RERANK_FACTOR,
+                     min_score=None, filters=None):
+    """
+    Search FAISS index for relevant contexts
+    
+    Args:
+        query: Search query string
+        index: FAISS index object
+        text_map: Document store addressed by vector id
+        k: Number of results to return
+        ef_search: HNSW search depth for this query (optional)
+        nprobe: IVF lists to probe for this query (optional)
+        rerank_factor: Candidate multiplier for quantized indexes
+        min_score: Minimum cosine similarity to keep a passage (optional)
+        filters: Filter from doc_filters.make_filter (optional)
+        
+    Returns:
+        list: List of relevant text contexts
+    """
+    results = search_vector_db_scored(
+        query, index, text_map, k=k, min_score=min_score,
+        ef_search=ef_search, nprobe=nprobe, rerank_factor=rerank_factor, filters=filters
+    )
+    return [text for text, _, _ in results]
+
 def get_vector_db_stats(index, text_map):
     """
     Get statistics about the vector database
     
     Args:
         index: FAISS index object
-        text_map: Text mapping dictionary
+        text_map: Document store
         
     Returns:
         dict: Statistics dictionary
@@ -215,6 +962,9 @@ def get_vector_db_stats(index, text_map):
     return {
         'total_vectors': index.ntotal,
         'dimension': index.d,
+        'index_type': get_index_type(index),
+        'metric': get_index_metric(index),
         'text_entries': len(text_map),
+        'tagged_entries': getattr(text_map, 'tag_count', 0),
         'status': 'active' if index.ntotal > 0 else 'empty'
     }
@@ -1,14 +1,66 @@
 """
 Wikipedia API integration utilities
 """
+import inspect
+import os
 import requests
 from datetime import datetime
 
+from . import http_client
+from .cache_utils import MISSING, Transient, cached, get_cache, make_key
+from .singleflight import coalesced
+
 # User-Agent header required by Wikipedia API
 HEADERS = {
     'User-Agent': 'AIMuseumGuide/1.0 (Educational Project; Python/3.x) requests/2.x'
 }
 
+# Overridable so benchmarks can point at a local stub server
+WIKIPEDIA_API_URL = os.getenv('WIKIPEDIA_API_URL', 'https://en.wikipedia.org/w/api.php')
+WIKIPEDIA_REST_URL = os.getenv('WIKIPEDIA_REST_URL', 'https://en.wikipedia.org/api/rest_v1')
+
+# Intro extracts are returned for at most 20 pages per request
+SUMMARY_BATCH_SIZE = 20
+
+# action=query properties that make up a page summary
+SUMMARY_QUERY_PARAMS = {
+    'action': 'query',
+    'format': 'json',
+    'formatversion': 2,
+    'prop': 'extracts|description|pageimages|info',
+    'exintro': 1,
+    'explaintext': 1,
+    'exlimit': 'max',
+    'piprop': 'thumbnail',
+    'pithumbsize': 320,
+    'inprop': 'url',
+    'redirects': 1
+}
+
+# Status codes worth retrying
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class WikipediaRequestError(Exception):
+    """Transient Wikipedia failure (rate limited, server error or network error)"""
+    
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def check_transient(response):
+    """Raise WikipediaRequestError for responses that are worth retrying"""
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        retry_after = response.headers.get('Retry-After')
+        raise WikipediaRequestError(
+            f"HTTP {response.status_code}",
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+        )
+
+def clean_search_query(query):
+    """Strip question phrasing that only adds noise to a Wikipedia search"""
+    return query.replace("tell me about", "").replace("what is", "").replace("who was", "").strip()
+
+@cached('wikipedia', 'search')
 def search_wikipedia(query, limit=3):
     """
     Search Wikipedia for articles
@@ -21,10 +73,9 @@ def search_wikipedia(query, limit=3):
         list: List of search results with title and snippet
     """
     try:
-        # Clean query
-        clean_query = query.replace("tell me about", "").replace("what is", "").replace("who was", "").strip()
+        clean_query = clean_search_query(query)
         
-        search_url = "https://en.wikipedia.org/w/api.php"
+        search_url = WIKIPEDIA_API_URL
         search_params = {
             'action': 'query',
             'format': 'json',
@@ -33,31 +84,38 @@ def search_wikipedia(query, limit=3):
             'srlimit': limit
         }
         
-        response = requests.get(search_url, params=search_params, headers=HEADERS, timeout=10)
+        response = http_client.get(search_url, params=search_params, headers=HEADERS)
         
         if response.status_code == 200:
             data = response.json()
             return data.get('query', {}).get('search', [])
         
-        return []
+        return Transient([])
         
     except Exception as e:
         print(f"Wikipedia search error: {str(e)}")
-        return []
+        return Transient([])
 
-def get_wikipedia_summary(title):
+@cached('wikipedia', 'summary', ignore=('raise_errors',))
+@coalesced('wikipedia', 'summary')
+def get_wikipedia_summary(title, raise_errors=False):
     """
     Get Wikipedia page summary
     
     Args:
         title: Wikipedia page title
+        raise_errors: Raise WikipediaRequestError on transient failures
+            instead of returning None, so callers can retry
         
     Returns:
         dict: Summary data or None if error
     """
     try:
-        summary_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{title.replace(' ', '_')}"
-        response = requests.get(summary_url, headers=HEADERS, timeout=10)
+        summary_url = f"{WIKIPEDIA_REST_URL}/page/summary/{title.replace(' ', '_')}"
+        # Callers that raise_errors retry (and rate limit) themselves
+        response = http_client.get(summary_url, headers=HEADERS, retries=0 if raise_errors else None)
+        if raise_errors:
+            check_transient(response)
         
         if response.status_code == 200:
             data = response.json()
@@ -70,12 +128,127 @@ def get_wikipedia_summary(title):
                 'timestamp': datetime.now().isoformat()
             }
         
-        return None
+        return None if response.status_code == 404 else Transient(None)
         
+    except WikipediaRequestError:
+        raise
     except Exception as e:
+        if raise_errors and isinstance(e, requests.RequestException):
+            raise WikipediaRequestError(str(e)) from e
         print(f"Wikipedia summary error: {str(e)}")
+        return Transient(None)
+
+def summary_cache_key(title):
+    """
+    Key of get_wikipedia_summary(title) in the "wikipedia" cache
+    
+    raise_errors is not part of the key: only confirmed results are cached,
+    and they are the same whether or not transient errors raise.
+    """
+    return make_key('summary', inspect.signature(get_wikipedia_summary), (title,), {}, ignore=('raise_errors',))
+
+def get_wikipedia_summaries(titles, batch_size=SUMMARY_BATCH_SIZE, raise_errors=False):
+    """
+    Get summaries for many pages with one action=query request per batch
+    
+    Redirects and title normalisation are followed and mapped back, so the
+    result is keyed by the titles exactly as given. Results share the
+    get_wikipedia_summary cache entries.
+    
+    Args:
+        titles: List of Wikipedia page titles
+        batch_size: Titles per request (intro extracts are capped at 20)
+        raise_errors: Raise WikipediaRequestError on transient failures
+            instead of dropping the batch, so callers can retry
+        
+    Returns:
+        dict: title -> summary data (same shape as get_wikipedia_summary) or None if not found
+    """
+    unique_titles = list(dict.fromkeys(title for title in titles if title))
+    summaries = {title: None for title in unique_titles}
+    
+    # Titles already cached by get_wikipedia_summary need no request
+    cache = get_cache('wikipedia')
+    pending = []
+    for title in unique_titles:
+        summary = cache.get(summary_cache_key(title))
+        if summary is MISSING:
+            pending.append(title)
+        else:
+            summaries[title] = dict(summary) if summary else None
+    
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            results = query_summaries(batch, raise_errors)
+        except WikipediaRequestError:
+            raise
+        except Exception as e:
+            print(f"Wikipedia bulk summary error: {str(e)}")
+            continue
+        
+        for title, summary in results.items():
+            cache.set(summary_cache_key(title), summary)
+            summaries[title] = summary
+    
+    return summaries
+
+def query_summaries(titles, raise_errors=False):
+    """Fetch one batch of summaries (see get_wikipedia_summaries)"""
+    params = {**SUMMARY_QUERY_PARAMS, 'titles': '|'.join(titles)}
+    
+    pages = {}
+    aliases = {}
+    continuation = {}
+    while True:
+        try:
+            response = http_client.get(
+                WIKIPEDIA_API_URL, params={**params, **continuation}, headers=HEADERS,
+                retries=0 if raise_errors else None
+            )
+        except requests.RequestException as e:
+            if raise_errors:
+                raise WikipediaRequestError(str(e)) from e
+            raise
+        if raise_errors:
+            check_transient(response)
+        if response.status_code != 200:
+            return {}  # Leave the batch uncached
+        
+        data = response.json()
+        query = data.get('query', {})
+        for mapping in query.get('normalized', []) + query.get('redirects', []):
+            aliases[mapping['from']] = mapping['to']
+        for page in query.get('pages', []):
+            # Continued responses add fields to pages already seen
+            pages.setdefault(page['title'], {}).update(page)
+        
+        continuation = data.get('continue')
+        if not continuation:
+            break
+    
+    summaries = {}
+    for title in titles:
+        resolved = title
+        for _ in range(3):  # normalized -> redirect -> normalized target
+            resolved = aliases.get(resolved, resolved)
+        summaries[title] = page_to_summary(pages.get(resolved))
+    return summaries
+
+def page_to_summary(page):
+    """Convert an action=query page (extracts|description|pageimages|info) to summary data"""
+    if not page or page.get('missing') or page.get('invalid') or not page.get('extract'):
         return None
+    return {
+        'title': page['title'],
+        'extract': page.get('extract', ''),
+        'description': page.get('description', ''),
+        'thumbnail': page.get('thumbnail', {}).get('source', ''),
+        'url': page.get('fullurl') or f"https://en.wikipedia.org/wiki/{page['title'].replace(' ', '_')}",
+        'timestamp': datetime.now().isoformat()
+    }
 
+@cached('wikipedia', 'page_content')
 def get_wikipedia_page_content(title, sections=None):
     """
     Get full Wikipedia page content
@@ -88,7 +261,7 @@ def get_wikipedia_page_content(title, sections=None):
         dict: Page content or None if error
     """
     try:
-        content_url = "https://en.wikipedia.org/w/api.php"
+        content_url = WIKIPEDIA_API_URL
         content_params = {
             'action': 'parse',
             'format': 'json',
@@ -99,7 +272,7 @@ def get_wikipedia_page_content(title, sections=None):
             'disabletoc': True
         }
         
-        response = requests.get(content_url, params=content_params, headers=HEADERS, timeout=15)
+        response = http_client.get(content_url, params=content_params, headers=HEADERS)
         
         if response.status_code == 200:
             data = response.json()
@@ -109,17 +282,118 @@ def get_wikipedia_page_content(title, sections=None):
                     'text': data['parse']['text']['*'],
                     'sections': data['parse'].get('sections', [])
                 }
+            return None  # No such page
         
-        return None
+        return Transient(None)
         
     except Exception as e:
         print(f"Wikipedia content error: {str(e)}")
+        return Transient(None)
+
+def get_wikipedia_plain_text(title, raise_errors=False):
+    """
+    Get the full plain text of a Wikipedia article
+    
+    Section headings are kept as "== Heading ==" lines so the text can be
+    split along section boundaries.
+    
+    Args:
+        title: Wikipedia page title
+        raise_errors: Raise WikipediaRequestError on transient failures
+            instead of returning None, so callers can retry
+        
+    Returns:
+        dict: title, text and url, or None if error
+    """
+    try:
+        content_url = WIKIPEDIA_API_URL
+        content_params = {
+            'action': 'query',
+            'format': 'json',
+            'prop': 'extracts|info',
+            'explaintext': 1,
+            'exsectionformat': 'wiki',
+            'inprop': 'url',
+            'redirects': 1,
+            'titles': title
+        }
+        
+        response = http_client.get(
+            content_url, params=content_params, headers=HEADERS, retries=0 if raise_errors else None
+        )
+        if raise_errors:
+            check_transient(response)
+        
+        if response.status_code == 200:
+            pages = response.json().get('query', {}).get('pages', {})
+            for page in pages.values():
+                if 'missing' in page or not page.get('extract'):
+                    continue
+                return {
+                    'title': page.get('title', title),
+                    'text': page['extract'],
+                    'url': page.get('fullurl') or f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+                    'timestamp': datetime.now().isoformat()
+                }
+        
+        return None
+        
+    except WikipediaRequestError:
+        raise
+    except Exception as e:
+        if raise_errors and isinstance(e, requests.RequestException):
+            raise WikipediaRequestError(str(e)) from e
+        print(f"Wikipedia plain text error: {str(e)}")
         return None
 
+@cached('wikipedia', 'search_summary')
 def search_and_summarize(query):
     """
     Search Wikipedia and get summary of top result
     
+    Uses a single generator=search query that returns the top hit's
+    extract, description, thumbnail and URL together. Falls back to a
+    search followed by a summary request if that query fails.
+    
+    Args:
+        query: Search query string
+        
+    Returns:
+        dict: Summary data or None if error
+    """
+    try:
+        search_params = {
+            **SUMMARY_QUERY_PARAMS,
+            'generator': 'search',
+            'gsrsearch': clean_search_query(query),
+            'gsrlimit': 1
+        }
+        
+        response = http_client.get(WIKIPEDIA_API_URL, params=search_params, headers=HEADERS)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if 'error' not in data:
+                pages = data.get('query', {}).get('pages', [])
+                if not pages:
+                    return None  # No search hits
+                
+                summary = page_to_summary(min(pages, key=lambda page: page.get('index', 0)))
+                if summary:
+                    return summary
+        
+    except Exception as e:
+        print(f"Wikipedia generator search error: {str(e)}")
+    
+    # The search itself failed, so an empty fallback is not a confirmed miss
+    return search_then_summarize(query) or Transient(None)
+
+def search_then_summarize(query):
+    """
+    Search Wikipedia, then fetch the REST summary of the top result
+    
+    Two sequential requests; used as the fallback for search_and_summarize.
+    
     Args:
         query: Search query string
         
@@ -143,6 +417,7 @@ def search_and_summarize(query):
         print(f"Wikipedia search and summarize error: {str(e)}")
         return None
 
+@cached('wikipedia', 'related')
 def get_related_articles(title, limit=5):
     """
     Get related Wikipedia articles
@@ -155,7 +430,7 @@ def get_related_articles(title, limit=5):
         list: List of related article titles
     """
     try:
-        related_url = "https://en.wikipedia.org/w/api.php"
+        related_url = WIKIPEDIA_API_URL
         related_params = {
             'action': 'query',
             'format': 'json',
@@ -164,7 +439,7 @@ def get_related_articles(title, limit=5):
             'pllimit': limit
         }
         
-        response = requests.get(related_url, params=related_params, headers=HEADERS, timeout=10)
+        response = http_client.get(related_url, params=related_params, headers=HEADERS)
         
         if response.status_code == 200:
             data = response.json()
@@ -177,8 +452,8 @@ def get_related_articles(title, limit=5):
             
             return related[:limit]
         
-        return []
+        return Transient([])
         
     except Exception as e:
         print(f"Wikipedia related articles error: {str(e)}")
-        return []
+        return Transient([])